@@ -0,0 +1,40 @@
+"""
+Administration routes
+"""
+
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+
+from ..core.auth import get_current_admin
+from ..core.profiling import SamplingProfiler, get_profiler
+from ..schemas import ProfiledRoute
+from ..models import User
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/profiler/routes", response_model=List[ProfiledRoute])
+def get_profiled_routes(
+    minutes: Optional[int] = Query(None, ge=1, description="Recent windows only"),
+    profiler: SamplingProfiler = Depends(get_profiler),
+    current_user: User = Depends(get_current_admin),
+) -> Any:
+    """Sampled thread time per route template, busiest first (admin only)"""
+    return profiler.routes(seconds=minutes * 60 if minutes else None)
+
+
+@router.get("/profiler/stacks", response_class=PlainTextResponse)
+def get_profiled_stacks(
+    route: Optional[str] = Query(
+        None, description="Route from /profiler/routes; all routes when omitted"
+    ),
+    minutes: Optional[int] = Query(None, ge=1, description="Recent windows only"),
+    profiler: SamplingProfiler = Depends(get_profiler),
+    current_user: User = Depends(get_current_admin),
+) -> Any:
+    """Sampled stacks in collapsed format, for flamegraph.pl or speedscope (admin only)
+
+    Without ``route`` every stack starts with the route it was sampled in.
+    """
+    return profiler.collapsed(route, seconds=minutes * 60 if minutes else None)
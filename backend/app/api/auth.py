@@ -2,23 +2,29 @@
 Authentication routes - registration, login, refresh tokens
 """
 
-from datetime import timedelta
-from typing import Any
+from typing import Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.security import HTTPAuthorizationCredentials, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
 from ..core.database import get_db
 from ..core.auth import (
     authenticate_user,
-    create_access_token,
-    create_refresh_token,
     get_password_hash,
-    verify_token,
     get_current_user,
+    security,
+)
+from ..schemas import (
+    GenericMessage,
+    Token,
+    TokenRefresh,
+    UserCreate,
+    UserLogin,
+    UserResponse,
 )
-from ..schemas import UserCreate, UserResponse, Token, TokenRefresh, UserLogin, Message
 from ..models import User
+from ..services import refresh_tokens
+from ..services.refresh_tokens import InvalidRefreshToken, RefreshTokenReused
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -79,17 +85,9 @@ def login_user(
         )
 
     # Create tokens
-    access_token = create_access_token(data={"sub": user.username, "user_id": user.id})
-    refresh_token = create_refresh_token(
-        data={"sub": user.username, "user_id": user.id}
-    )
-
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-        "expires_in": 60 * 60,  # 1 hour in seconds
-    }
+    tokens = refresh_tokens.issue_tokens(db, user)
+    db.commit()
+    return tokens
 
 
 @router.post("/login/json", response_model=Token)
@@ -109,17 +107,9 @@ def login_user_json(user_credentials: UserLogin, db: Session = Depends(get_db))
         )
 
     # Create tokens
-    access_token = create_access_token(data={"sub": user.username, "user_id": user.id})
-    refresh_token = create_refresh_token(
-        data={"sub": user.username, "user_id": user.id}
-    )
-
-    return {
-        "access_token": access_token,
-        "refresh_token": refresh_token,
-        "token_type": "bearer",
-        "expires_in": 60 * 60,
-    }
+    tokens = refresh_tokens.issue_tokens(db, user)
+    db.commit()
+    return tokens
 
 
 @router.post("/refresh", response_model=Token)
@@ -128,33 +118,21 @@ def refresh_access_token(
 ) -> Any:
     """Refresh access token using refresh token"""
 
-    # Verify refresh token
-    token_payload = verify_token(token_data.refresh_token, token_type="refresh")
-    if not token_payload:
+    try:
+        tokens = refresh_tokens.rotate_refresh_token(db, token_data.refresh_token)
+    except RefreshTokenReused:
+        # Keep the family revocation
+        db.commit()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
         )
-
-    # Get user
-    user = db.query(User).filter(User.id == token_payload.user_id).first()
-    if not user or not user.is_active:
+    except InvalidRefreshToken:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found or inactive",
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token"
         )
 
-    # Create new tokens
-    access_token = create_access_token(data={"sub": user.username, "user_id": user.id})
-    new_refresh_token = create_refresh_token(
-        data={"sub": user.username, "user_id": user.id}
-    )
-
-    return {
-        "access_token": access_token,
-        "refresh_token": new_refresh_token,
-        "token_type": "bearer",
-        "expires_in": 60 * 60,
-    }
+    db.commit()
+    return tokens
 
 
 @router.get("/me", response_model=UserResponse)
@@ -163,15 +141,25 @@ def get_current_user_info(current_user: User = Depends(get_current_user)) -> Any
     return current_user
 
 
-@router.post("/logout", response_model=Message)
-def logout_user(current_user: User = Depends(get_current_user)) -> Any:
-    """Logout user (client should delete tokens)"""
-    # In a production app, you might want to blacklist the tokens
-    # For now, we just return a success message
+@router.post("/logout", response_model=GenericMessage)
+def logout_user(
+    token_data: Optional[TokenRefresh] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> Any:
+    """Logout user: revoke the access token and the refresh token's family"""
+    refresh_tokens.logout(
+        db,
+        credentials.credentials,
+        current_user,
+        token_data.refresh_token if token_data else None,
+    )
+    db.commit()
     return {"message": "Successfully logged out"}
 
 
-@router.post("/verify-token", response_model=Message)
+@router.post("/verify-token", response_model=GenericMessage)
 def verify_token_endpoint(current_user: User = Depends(get_current_user)) -> Any:
     """Verify if current token is valid"""
     return {"message": "Token is valid"}
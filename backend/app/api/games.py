@@ -3,7 +3,17 @@ Games and categories management routes
 """
 
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+    Query,
+    File,
+    UploadFile,
+    Request,
+    Response,
+)
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 
@@ -13,6 +23,7 @@ from ..core.auth import (
     get_current_moderator,
     get_current_user_optional,
 )
+from ..core.validators import ValidationError
 from ..schemas import (
     GameResponse,
     GameCreate,
@@ -20,16 +31,28 @@ from ..schemas import (
     CategoryResponse,
     CategoryCreate,
     CategoryUpdate,
+    CategoryTree,
     PaginatedResponse,
-    Message,
+    GenericMessage,
+)
+from ..models import Game, Category, Lot, User, UserRole
+from ..services.attribute_filters import validate_attribute_schema
+from ..services.category_tree import (
+    add_category_node,
+    build_tree,
+    is_in_subtree,
+    move_category_node,
+    remove_category_node,
 )
-from ..models import Game, Category, User
+from ..services.table_versions import table_validators
 
 router = APIRouter(prefix="/games", tags=["Games"])
 
 
 @router.get("/", response_model=PaginatedResponse[GameResponse])
 def get_games(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     search: Optional[str] = Query(None),
@@ -40,6 +63,20 @@ def get_games(
 ) -> Any:
     """Get all games"""
 
+    is_moderator = current_user is not None and current_user.role in (
+        UserRole.MODERATOR,
+        UserRole.ADMIN,
+    )
+    validators = table_validators(
+        db,
+        ("games", "categories") if category_id else ("games",),
+        sorted(request.query_params.multi_items()),
+        is_moderator,
+    )
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    response.headers.update(validators.headers)
+
     query = db.query(Game)
 
     # Apply filters
@@ -53,7 +90,7 @@ def get_games(
         query = query.join(Game.categories).filter(Category.id == category_id)
 
     # Only show active games to regular users
-    if not current_user or current_user.role not in ["moderator", "admin"]:
+    if not is_moderator:
         query = query.filter(Game.is_active == True)
     elif is_active is not None:
         query = query.filter(Game.is_active == is_active)
@@ -70,6 +107,8 @@ def get_games(
 @router.get("/{game_id}", response_model=GameResponse)
 def get_game(
     game_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional),
 ) -> Any:
@@ -83,12 +122,20 @@ def get_game(
 
     # Only show active games to regular users
     if (
-        not current_user or current_user.role not in ["moderator", "admin"]
+        not current_user
+        or current_user.role not in (UserRole.MODERATOR, UserRole.ADMIN)
     ) and not game.is_active:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Game not found"
         )
 
+    validators = table_validators(
+        db, ("games",), "game", game_id, updated_at=game.updated_at or game.created_at
+    )
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    response.headers.update(validators.headers)
+
     return game
 
 
@@ -143,7 +190,7 @@ def update_game(
     return game
 
 
-@router.delete("/{game_id}", response_model=Message)
+@router.delete("/{game_id}", response_model=GenericMessage)
 def delete_game(
     game_id: int,
     db: Session = Depends(get_db),
@@ -169,10 +216,18 @@ categories_router = APIRouter(prefix="/categories", tags=["Categories"])
 
 @categories_router.get("/", response_model=List[CategoryResponse])
 def get_categories(
-    parent_id: Optional[int] = Query(None), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    parent_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
 ) -> Any:
     """Get all categories"""
 
+    validators = table_validators(db, ("categories",), "categories", parent_id)
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    response.headers.update(validators.headers)
+
     query = db.query(Category)
 
     if parent_id is not None:
@@ -185,6 +240,23 @@ def get_categories(
     return categories
 
 
+@categories_router.get("/tree", response_model=List[CategoryTree])
+def get_category_tree(
+    game_id: Optional[int] = Query(None), db: Session = Depends(get_db)
+) -> Any:
+    """Get the full category hierarchy (single query)"""
+
+    query = db.query(Category)
+
+    if game_id is not None:
+        query = query.filter(Category.game_id == game_id)
+
+    categories = query.order_by(Category.sort_order, Category.name).all()
+    return build_tree(
+        categories, lambda c: CategoryResponse.model_validate(c).model_dump()
+    )
+
+
 @categories_router.get("/{category_id}", response_model=CategoryResponse)
 def get_category(category_id: int, db: Session = Depends(get_db)) -> Any:
     """Get category by ID"""
@@ -219,6 +291,11 @@ def create_category(
                 detail="Parent category not found",
             )
 
+    try:
+        validate_attribute_schema(category_data.attribute_schema)
+    except ValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=exc.message)
+
     # Check if category already exists
     existing_category = (
         db.query(Category)
@@ -236,6 +313,8 @@ def create_category(
 
     db_category = Category(**category_data.dict())
     db.add(db_category)
+    db.flush()
+    add_category_node(db, db_category)
     db.commit()
     db.refresh(db_category)
 
@@ -260,6 +339,11 @@ def update_category(
     # Update fields
     update_data = category_update.dict(exclude_unset=True)
 
+    try:
+        validate_attribute_schema(update_data.get("attribute_schema"))
+    except ValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=exc.message)
+
     # Check if parent category exists if being updated
     if "parent_id" in update_data and update_data["parent_id"]:
         parent = (
@@ -271,6 +355,15 @@ def update_category(
                 detail="Parent category not found",
             )
 
+        if is_in_subtree(db, category_id, update_data["parent_id"]):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cannot move category under itself or its subcategories",
+            )
+
+    if "parent_id" in update_data and update_data["parent_id"] != category.parent_id:
+        move_category_node(db, category_id, update_data["parent_id"])
+
     for field, value in update_data.items():
         setattr(category, field, value)
 
@@ -280,7 +373,7 @@ def update_category(
     return category
 
 
-@categories_router.delete("/{category_id}", response_model=Message)
+@categories_router.delete("/{category_id}", response_model=GenericMessage)
 def delete_category(
     category_id: int,
     db: Session = Depends(get_db),
@@ -294,16 +387,17 @@ def delete_category(
             status_code=status.HTTP_404_NOT_FOUND, detail="Category not found"
         )
 
-    # Check if category has subcategories or games
+    # Check if category has subcategories or lots
     subcategories = db.query(Category).filter(Category.parent_id == category_id).first()
-    games = db.query(Game).filter(Game.category_id == category_id).first()
+    lots = db.query(Lot).filter(Lot.category_id == category_id).first()
 
-    if subcategories or games:
+    if subcategories or lots:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot delete category with subcategories or games",
+            detail="Cannot delete category with subcategories or lots",
         )
 
+    remove_category_node(db, category_id)
     db.delete(category)
     db.commit()
 
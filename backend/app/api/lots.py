@@ -2,10 +2,21 @@
 Lots (trading offers) management routes
 """
 
-from typing import Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Any, List, Optional
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+    Query,
+    File,
+    UploadFile,
+    Request,
+    Response,
+)
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, and_
+from sqlalchemy import Integer, any_, bindparam, or_, and_, update
+from sqlalchemy.dialects.postgresql import ARRAY
 
 from ..core.database import get_db
 from ..core.auth import (
@@ -14,28 +25,54 @@ from ..core.auth import (
     get_current_moderator,
     get_current_user_optional,
 )
-from ..schemas import LotResponse, LotCreate, LotUpdate, PaginatedResponse, Message
-from ..models import Lot, LotStatus, Game, User, Order
+from ..core.validators import ValidationError
+from ..schemas import (
+    LotResponse,
+    LotCreate,
+    LotUpdate,
+    LotFacets,
+    LotBatchRequest,
+    LotBatchResponse,
+    PaginatedResponse,
+    GenericMessage,
+)
+from ..models import (
+    Lot,
+    LotStatus,
+    Game,
+    CategoryClosure,
+    User,
+    UserRole,
+    Order,
+    OrderStatus,
+)
+from ..services.attribute_filters import (
+    compile_attribute_filters,
+    get_category_schema,
+    parse_attribute_filters,
+)
+from ..core.constants import MAX_LOT_BATCH_SIZE, MAX_LOT_IMAGES
+from ..services.media_store import register_blob
+from ..services.uploads import save_image_upload
+from ..services.table_versions import CATALOG_TABLES, table_validators
+from ..services.lot_facets import FACETS, compute_facets, facet_cache, facet_signature
 
 router = APIRouter(prefix="/lots", tags=["Lots"])
 
 
-@router.get("/", response_model=PaginatedResponse[LotResponse])
-def get_lots(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100),
-    search: Optional[str] = Query(None),
-    game_id: Optional[int] = Query(None),
-    seller_id: Optional[int] = Query(None),
-    min_price: Optional[float] = Query(None, ge=0),
-    max_price: Optional[float] = Query(None, ge=0),
-    status: Optional[str] = Query("active"),
-    sort_by: str = Query("created_at", regex="^(created_at|price|title)$"),
-    sort_order: str = Query("desc", regex="^(asc|desc)$"),
-    db: Session = Depends(get_db),
-    current_user: Optional[User] = Depends(get_current_user_optional),
-) -> Any:
-    """Get all lots with filters"""
+def _filter_lots(
+    db: Session,
+    current_user: Optional[User],
+    search: Optional[str] = None,
+    game_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    seller_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    attr: Optional[List[str]] = None,
+    lot_status: Optional[str] = "active",
+):
+    """Build the lot query shared by the listing and facet endpoints"""
 
     query = db.query(Lot)  # Убираем joinedload для тестирования
 
@@ -48,6 +85,31 @@ def get_lots(
     if game_id:
         query = query.filter(Lot.game_id == game_id)
 
+    if category_id:
+        # Category and all its subcategories through the closure table
+        query = query.join(
+            CategoryClosure, CategoryClosure.descendant_id == Lot.category_id
+        ).filter(CategoryClosure.ancestor_id == category_id)
+
+    if attr:
+        # item_details filters are typed by the category attribute schema
+        if not category_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Attribute filters require category_id",
+            )
+        try:
+            filters = parse_attribute_filters(
+                attr, get_category_schema(db, category_id)
+            )
+        except ValidationError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=exc.message
+            )
+        query = query.filter(
+            *compile_attribute_filters(filters, db.get_bind().dialect.name)
+        )
+
     if seller_id:
         query = query.filter(Lot.seller_id == seller_id)
 
@@ -58,19 +120,70 @@ def get_lots(
         query = query.filter(Lot.price <= max_price)
 
     # Only show active lots to regular users
-    if not current_user or current_user.role not in ["moderator", "admin"]:
+    if not _is_moderator(current_user):
         query = query.filter(Lot.status == LotStatus.ACTIVE)
-    elif status:
+    elif lot_status:
         # Convert string status to enum for comparison
-        if status == "active":
+        if lot_status == "active":
             query = query.filter(Lot.status == LotStatus.ACTIVE)
-        elif status == "sold":
+        elif lot_status == "sold":
             query = query.filter(Lot.status == LotStatus.SOLD)
-        elif status == "inactive":
+        elif lot_status == "inactive":
             query = query.filter(Lot.status == LotStatus.INACTIVE)
-        elif status == "moderation":
+        elif lot_status == "moderation":
             query = query.filter(Lot.status == LotStatus.MODERATION)
 
+    return query
+
+
+def _is_moderator(user: Optional[User]) -> bool:
+    return user is not None and user.role in (UserRole.MODERATOR, UserRole.ADMIN)
+
+
+@router.get("/", response_model=PaginatedResponse[LotResponse])
+def get_lots(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    search: Optional[str] = Query(None),
+    game_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    seller_id: Optional[int] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    attr: Optional[List[str]] = Query(None, description="name:op:value"),
+    status: Optional[str] = Query("active"),
+    sort_by: str = Query("created_at", regex="^(created_at|price|title)$"),
+    sort_order: str = Query("desc", regex="^(asc|desc)$"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+) -> Any:
+    """Get all lots with filters"""
+
+    validators = table_validators(
+        db,
+        CATALOG_TABLES,
+        sorted(request.query_params.multi_items()),
+        _is_moderator(current_user),
+    )
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    response.headers.update(validators.headers)
+
+    query = _filter_lots(
+        db,
+        current_user,
+        search=search,
+        game_id=game_id,
+        category_id=category_id,
+        seller_id=seller_id,
+        min_price=min_price,
+        max_price=max_price,
+        attr=attr,
+        lot_status=status,
+    )
+
     # Apply sorting
     if sort_by == "created_at":
         order_column = Lot.created_at
@@ -95,14 +208,169 @@ def get_lots(
     return {"items": lots, "total": total, "skip": skip, "limit": limit}
 
 
+@router.get("/facets", response_model=LotFacets)
+def get_lot_facets(
+    facets: str = Query(
+        ",".join(FACETS), description=f"Comma-separated subset of {', '.join(FACETS)}"
+    ),
+    search: Optional[str] = Query(None),
+    game_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    seller_id: Optional[int] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    attr: Optional[List[str]] = Query(None, description="name:op:value"),
+    status: Optional[str] = Query("active"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+) -> Any:
+    """Get facet counts for the lots matching the get_lots filters"""
+
+    requested = [name.strip() for name in facets.split(",") if name.strip()]
+    unknown = set(requested) - set(FACETS)
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown facets: {', '.join(sorted(unknown)) or '(none given)'}",
+        )
+
+    # Moderators may see other statuses, so the effective status is part
+    # of the cache key
+    is_moderator = _is_moderator(current_user)
+    signature = facet_signature(
+        requested,
+        search=search,
+        game_id=game_id,
+        category_id=category_id,
+        seller_id=seller_id,
+        min_price=min_price,
+        max_price=max_price,
+        attr=sorted(attr or []),
+        status=status if is_moderator else "active",
+    )
+
+    cached = facet_cache.get(signature)
+    if cached is not None:
+        return cached
+
+    query = _filter_lots(
+        db,
+        current_user,
+        search=search,
+        game_id=game_id,
+        category_id=category_id,
+        seller_id=seller_id,
+        min_price=min_price,
+        max_price=max_price,
+        attr=attr,
+        lot_status=status,
+    )
+    result = compute_facets(query, requested, db.get_bind().dialect.name)
+
+    facet_cache.set(signature, result)
+    return result
+
+
+def _get_lot_batch(db: Session, ids: List[int], current_user: Optional[User]) -> dict:
+    """Lots by ID in request order, with not-found markers"""
+    if not ids or len(ids) > MAX_LOT_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {MAX_LOT_BATCH_SIZE} lot ids required",
+        )
+
+    unique_ids = list(dict.fromkeys(ids))
+    if db.get_bind().dialect.name == "postgresql":
+        # One array parameter: the statement text is the same for any count
+        id_filter = Lot.id == any_(bindparam("ids", unique_ids, type_=ARRAY(Integer)))
+    else:
+        id_filter = Lot.id.in_(unique_ids)
+
+    query = db.query(Lot).options(
+        joinedload(Lot.game), joinedload(Lot.seller), joinedload(Lot.category)
+    )
+    # Same visibility as get_lot: hidden lots are reported as not found
+    if not _is_moderator(current_user):
+        query = query.filter(Lot.status == LotStatus.ACTIVE)
+    lots = {lot.id: lot for lot in query.filter(id_filter)}
+
+    return {
+        "items": [
+            {"id": lot_id, "found": lot_id in lots, "lot": lots.get(lot_id)}
+            for lot_id in ids
+        ]
+    }
+
+
+@router.get("/batch", response_model=LotBatchResponse)
+def get_lot_batch(
+    request: Request,
+    response: Response,
+    ids: str = Query(..., description="Comma-separated lot ids"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+) -> Any:
+    """Get several lots at once (carts, watchlists).
+
+    Unlike get_lot, views are not counted.
+    """
+    try:
+        lot_ids = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be comma-separated integers",
+        )
+
+    validators = table_validators(
+        db, CATALOG_TABLES, "batch", lot_ids, _is_moderator(current_user)
+    )
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    response.headers.update(validators.headers)
+
+    return _get_lot_batch(db, lot_ids, current_user)
+
+
+@router.post("/batch", response_model=LotBatchResponse)
+def post_lot_batch(
+    batch: LotBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+) -> Any:
+    """Get several lots at once, for id lists too long for a URL"""
+    return _get_lot_batch(db, batch.ids, current_user)
+
+
 @router.get("/{lot_id}", response_model=LotResponse)
 def get_lot(
     lot_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional),
 ) -> Any:
     """Get lot by ID"""
 
+    # Revalidation only needs the row timestamps, not the lot and relations
+    stamp = (
+        db.query(Lot.status, Lot.created_at, Lot.updated_at)
+        .filter(Lot.id == lot_id)
+        .first()
+    )
+    if stamp and (stamp.status == LotStatus.ACTIVE or _is_moderator(current_user)):
+        validators = table_validators(
+            db,
+            CATALOG_TABLES,
+            "lot",
+            lot_id,
+            _is_moderator(current_user),
+            updated_at=stamp.updated_at or stamp.created_at,
+        )
+        if validators.is_fresh(request):
+            return validators.not_modified()
+        response.headers.update(validators.headers)
+
     lot = (
         db.query(Lot)
         .options(joinedload(Lot.game), joinedload(Lot.seller))
@@ -116,18 +384,22 @@ def get_lot(
         )
 
     # Only show active lots to regular users
-    if (
-        not current_user or current_user.role not in ["moderator", "admin"]
-    ) and lot.status != "active":
+    if not _is_moderator(current_user) and lot.status != LotStatus.ACTIVE:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Lot not found"
         )
 
-    # Increment views count (only for active lots and not for the seller)
-    if lot.status == "active" and (
+    # Increment views count (only for active lots and not for the seller).
+    # Atomic, and updated_at is kept so the view does not change the ETag.
+    if lot.status == LotStatus.ACTIVE and (
         not current_user or current_user.id != lot.seller_id
     ):
-        lot.views += 1
+        db.execute(
+            update(Lot)
+            .where(Lot.id == lot.id)
+            .values(views=Lot.views + 1, updated_at=Lot.updated_at)
+            .execution_options(synchronize_session=False)
+        )
         db.commit()
 
     return lot
@@ -181,10 +453,10 @@ def update_lot(
         )
 
     # Only seller or moderator/admin can update lot
-    if lot.seller_id != current_user.id and current_user.role not in [
-        "moderator",
-        "admin",
-    ]:
+    if lot.seller_id != current_user.id and current_user.role not in (
+        UserRole.MODERATOR,
+        UserRole.ADMIN,
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
         )
@@ -202,7 +474,7 @@ def update_lot(
             )
 
     # Only moderators can change status directly
-    if "status" in update_data and current_user.role not in ["moderator", "admin"]:
+    if "status" in update_data and not _is_moderator(current_user):
         if lot.seller_id == current_user.id:
             # Sellers can only deactivate their own lots
             if update_data["status"] not in ["inactive", "active"]:
@@ -210,6 +482,9 @@ def update_lot(
         else:
             update_data.pop("status")
 
+    if update_data.get("status") is not None:
+        update_data["status"] = LotStatus(update_data["status"])
+
     for field, value in update_data.items():
         setattr(lot, field, value)
 
@@ -219,7 +494,47 @@ def update_lot(
     return lot
 
 
-@router.delete("/{lot_id}", response_model=Message)
+@router.post("/{lot_id}/images", response_model=LotResponse)
+def upload_lot_image(
+    lot_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """Upload lot image"""
+
+    lot = db.query(Lot).filter(Lot.id == lot_id).first()
+    if not lot:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Lot not found"
+        )
+
+    if lot.seller_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
+        )
+
+    if len(lot.images or []) >= MAX_LOT_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A lot can have at most {MAX_LOT_IMAGES} images",
+        )
+
+    try:
+        upload = save_image_upload(file, "lot_images")
+    except ValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=exc.message)
+    register_blob(db, upload.kind, upload.digest, upload.size)
+
+    # Reassign so the JSON column is marked dirty
+    lot.images = [*(lot.images or []), upload.url]
+    db.commit()
+    db.refresh(lot)
+
+    return lot
+
+
+@router.delete("/{lot_id}", response_model=GenericMessage)
 def delete_lot(
     lot_id: int,
     db: Session = Depends(get_db),
@@ -234,10 +549,10 @@ def delete_lot(
         )
 
     # Only seller or moderator/admin can delete lot
-    if lot.seller_id != current_user.id and current_user.role not in [
-        "moderator",
-        "admin",
-    ]:
+    if lot.seller_id != current_user.id and current_user.role not in (
+        UserRole.MODERATOR,
+        UserRole.ADMIN,
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
         )
@@ -248,7 +563,14 @@ def delete_lot(
         .filter(
             and_(
                 Order.lot_id == lot_id,
-                Order.status.in_(["pending", "in_progress", "in_escrow"]),
+                Order.status.in_(
+                    [
+                        OrderStatus.PENDING,
+                        OrderStatus.PAID,
+                        OrderStatus.IN_PROGRESS,
+                        OrderStatus.DISPUTED,
+                    ]
+                ),
             )
         )
         .first()
@@ -266,7 +588,7 @@ def delete_lot(
     return {"message": "Lot deleted successfully"}
 
 
-@router.post("/{lot_id}/deactivate", response_model=Message)
+@router.post("/{lot_id}/deactivate", response_model=GenericMessage)
 def deactivate_lot(
     lot_id: int,
     db: Session = Depends(get_db),
@@ -281,21 +603,21 @@ def deactivate_lot(
         )
 
     # Only seller or moderator/admin can deactivate lot
-    if lot.seller_id != current_user.id and current_user.role not in [
-        "moderator",
-        "admin",
-    ]:
+    if lot.seller_id != current_user.id and current_user.role not in (
+        UserRole.MODERATOR,
+        UserRole.ADMIN,
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
         )
 
-    lot.status = "inactive"
+    lot.status = LotStatus.INACTIVE
     db.commit()
 
     return {"message": "Lot deactivated successfully"}
 
 
-@router.post("/{lot_id}/activate", response_model=Message)
+@router.post("/{lot_id}/activate", response_model=GenericMessage)
 def activate_lot(
     lot_id: int,
     db: Session = Depends(get_db),
@@ -310,10 +632,10 @@ def activate_lot(
         )
 
     # Only seller or moderator/admin can activate lot
-    if lot.seller_id != current_user.id and current_user.role not in [
-        "moderator",
-        "admin",
-    ]:
+    if lot.seller_id != current_user.id and current_user.role not in (
+        UserRole.MODERATOR,
+        UserRole.ADMIN,
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
         )
@@ -326,7 +648,7 @@ def activate_lot(
             detail="Cannot activate lot for inactive game",
         )
 
-    lot.status = "active"
+    lot.status = LotStatus.ACTIVE
     db.commit()
 
     return {"message": "Lot activated successfully"}
@@ -354,9 +676,9 @@ def get_user_lots(
 
     # Only show active lots to other users
     if not current_user or (
-        current_user.id != user_id and current_user.role not in ["moderator", "admin"]
+        current_user.id != user_id and not _is_moderator(current_user)
     ):
-        query = query.filter(Lot.status == "active")
+        query = query.filter(Lot.status == LotStatus.ACTIVE)
     elif status:
         query = query.filter(Lot.status == status)
 
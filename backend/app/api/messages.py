@@ -0,0 +1,142 @@
+"""
+Chat messages routes - realtime socket and conversation history
+"""
+
+import json
+from typing import Any, List, Optional
+from fastapi import (
+    APIRouter,
+    Depends,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..core.auth import get_current_user, verify_token
+from ..core.config import settings
+from ..core.database import get_db
+from ..core.revocation import revoked_tokens
+from ..models import Message, User
+from ..schemas import (
+    InboxEntry,
+    MarkReadRequest,
+    MarkReadResponse,
+    MessageResponse,
+    UnreadCount,
+)
+from ..services.chat import ChatHub, get_chat_hub
+from ..services.unread_counters import get_inbox, mark_read
+
+router = APIRouter(prefix="/messages", tags=["Messages"])
+
+
+def _socket_user_id(hub: ChatHub, token: str) -> Optional[int]:
+    """Active user a socket token belongs to (runs in the threadpool)"""
+    with hub.writer.session_factory() as db:
+        revoked_tokens.sync(db, settings.TOKEN_REVOCATION_SYNC_SECONDS)
+        token_data = verify_token(token)
+        if token_data is None:
+            return None
+        user = db.get(User, token_data.user_id)
+        return user.id if user is not None and user.is_active else None
+
+
+@router.websocket("/ws")
+async def chat_socket(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    hub: ChatHub = Depends(get_chat_hub),
+) -> None:
+    """Realtime chat.
+
+    Authenticate with ``?token=<access token>`` (browsers cannot set headers
+    on sockets) or an ``Authorization: Bearer`` header. Send
+    ``{"type": "message", "receiver_id", "content", "order_id"?, "client_id"?}``;
+    saved messages arrive as ``{"type": "message", "message", "client_id"}``
+    on the sockets of both parties, rejected ones as ``{"type": "error"}``.
+    """
+    if token is None:
+        scheme, _, credentials = websocket.headers.get("authorization", "").partition(
+            " "
+        )
+        token = credentials if scheme.lower() == "bearer" else None
+
+    user_id = await run_in_threadpool(_socket_user_id, hub, token) if token else None
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    connection = await hub.connect(websocket, user_id)
+    try:
+        while True:
+            error = await hub.receive(connection, await websocket.receive_text())
+            if error is not None:
+                connection.push(json.dumps({"type": "error", "detail": error}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.disconnect(connection)
+
+
+@router.get("/conversation/{user_id}", response_model=List[MessageResponse])
+def get_conversation(
+    user_id: int,
+    before_id: Optional[int] = Query(None, description="Page older than this id"),
+    limit: int = Query(50, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """Messages between the current user and another user, newest first"""
+
+    query = db.query(Message).filter(
+        or_(
+            and_(Message.sender_id == current_user.id, Message.receiver_id == user_id),
+            and_(Message.sender_id == user_id, Message.receiver_id == current_user.id),
+        )
+    )
+    if before_id is not None:
+        query = query.filter(Message.id < before_id)
+
+    return query.order_by(Message.id.desc()).limit(limit).all()
+
+
+@router.get("/inbox", response_model=List[InboxEntry])
+def get_messages_inbox(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """Conversations of the current user with their latest message"""
+
+    return [
+        {"user": other, "last_message": message, "unread": unread}
+        for message, other, unread in get_inbox(db, current_user.id, skip, limit)
+    ]
+
+
+@router.get("/unread-count", response_model=UnreadCount)
+def get_unread_count(current_user: User = Depends(get_current_user)) -> Any:
+    """Unread messages of the current user (maintained counter, no COUNT query)"""
+
+    return {"unread": current_user.unread_messages or 0}
+
+
+@router.post("/read", response_model=MarkReadResponse)
+def mark_messages_read(
+    request: MarkReadRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """Mark received messages read, optionally one conversation up to a message"""
+
+    marked = mark_read(db, current_user.id, request.sender_id, request.up_to_id)
+    db.commit()
+    db.refresh(current_user)
+
+    return {"marked_read": marked, "unread": current_user.unread_messages or 0}
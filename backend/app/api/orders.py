@@ -2,21 +2,32 @@
 Orders management routes
 """
 
+import uuid
+from datetime import datetime
 from typing import Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_
 
 from ..core.database import get_db
-from ..core.auth import get_current_user, get_current_moderator
+from ..core.auth import (
+    get_current_user,
+    get_current_moderator,
+    get_current_user_for_stream,
+)
 from ..schemas import (
     OrderResponse,
     OrderCreate,
     OrderUpdate,
+    ReviewBase,
+    ReviewResponse,
     PaginatedResponse,
-    Message,
+    GenericMessage,
 )
-from ..models import Order, Lot, User
+from ..models import Order, OrderStatus, Lot, LotStatus, Review, User, UserRole
+from ..services.order_events import OrderEventBroadcaster, get_order_events
+from ..services.reputation import record_order_completed, record_review
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
@@ -40,7 +51,7 @@ def get_orders(
     )
 
     # Filter by user permissions
-    if current_user.role not in ["moderator", "admin"]:
+    if current_user.role not in (UserRole.MODERATOR, UserRole.ADMIN):
         # Regular users can only see their own orders
         query = query.filter(
             or_(Order.buyer_id == current_user.id, Order.seller_id == current_user.id)
@@ -65,6 +76,31 @@ def get_orders(
     return {"items": orders, "total": total, "skip": skip, "limit": limit}
 
 
+@router.get("/events")
+def stream_order_events(
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_for_stream),
+    broadcaster: OrderEventBroadcaster = Depends(get_order_events),
+) -> StreamingResponse:
+    """Server-Sent Events stream of status changes of the user's orders.
+
+    Each ``order_status`` event carries ``order_id``, ``status`` and
+    ``previous_status``. After a reconnect (``Last-Event-ID``) missed events
+    are replayed; a ``resync`` event means they are gone and the order list
+    has to be reloaded.
+    """
+    user_id = current_user.id
+    # The stream stays open for hours; don't hold a pooled connection
+    db.close()
+
+    return StreamingResponse(
+        broadcaster.stream(user_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{order_id}", response_model=OrderResponse)
 def get_order(
     order_id: int,
@@ -91,7 +127,7 @@ def get_order(
 
     # Check permissions
     if (
-        current_user.role not in ["moderator", "admin"]
+        current_user.role not in (UserRole.MODERATOR, UserRole.ADMIN)
         and order.buyer_id != current_user.id
         and order.seller_id != current_user.id
     ):
@@ -117,7 +153,7 @@ def create_order(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Lot not found"
         )
 
-    if lot.status != "active":
+    if lot.status != LotStatus.ACTIVE:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Lot is not available for purchase",
@@ -129,40 +165,17 @@ def create_order(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot buy your own lot"
         )
 
-    # Check if quantity is valid
-    if order_data.quantity <= 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be positive"
-        )
-
-    if lot.quantity is not None and order_data.quantity > lot.quantity:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Not enough quantity available",
-        )
-
-    # Calculate total price
-    total_price = lot.price * order_data.quantity
-
-    # Create order
+    # Create order at the current lot price
     db_order = Order(
-        lot_id=order_data.lot_id,
+        order_number=f"ORD-{uuid.uuid4().hex[:16].upper()}",
+        lot_id=lot.id,
         buyer_id=current_user.id,
         seller_id=lot.seller_id,
-        quantity=order_data.quantity,
-        unit_price=lot.price,
-        total_price=total_price,
+        price=lot.price,
         buyer_message=order_data.buyer_message,
     )
 
     db.add(db_order)
-
-    # Update lot quantity if applicable
-    if lot.quantity is not None:
-        lot.quantity -= order_data.quantity
-        if lot.quantity == 0:
-            lot.status = "sold_out"
-
     db.commit()
     db.refresh(db_order)
 
@@ -187,7 +200,7 @@ def update_order(
     # Check permissions
     is_buyer = order.buyer_id == current_user.id
     is_seller = order.seller_id == current_user.id
-    is_moderator = current_user.role in ["moderator", "admin"]
+    is_moderator = current_user.role in (UserRole.MODERATOR, UserRole.ADMIN)
 
     if not (is_buyer or is_seller or is_moderator):
         raise HTTPException(
@@ -198,33 +211,50 @@ def update_order(
     update_data = order_update.dict(exclude_unset=True)
 
     # Status transitions validation
+    completes_order = False
+    current_status = OrderStatus(order.status)
     if "status" in update_data:
-        new_status = update_data["status"]
-        current_status = order.status
+        new_status = OrderStatus(update_data["status"])
 
-        # Define allowed transitions
+        # Define allowed transitions: the buyer pays, the seller delivers,
+        # the buyer accepts the delivery or disputes it
+        can_deliver = is_seller or is_moderator
+        can_accept = is_buyer or is_moderator
         allowed_transitions = {
-            "pending": (
-                ["confirmed", "cancelled"]
-                if is_seller or is_moderator
-                else ["cancelled"]
+            OrderStatus.PENDING: (
+                [OrderStatus.PAID, OrderStatus.CANCELLED]
+                if can_accept
+                else [OrderStatus.CANCELLED]
+            ),
+            OrderStatus.PAID: (
+                [OrderStatus.IN_PROGRESS, OrderStatus.CANCELLED] if can_deliver else []
             ),
-            "confirmed": ["in_progress"] if is_seller or is_moderator else [],
-            "in_progress": ["in_escrow"] if is_seller or is_moderator else [],
-            "in_escrow": (
-                ["completed", "disputed"] if is_buyer or is_moderator else ["disputed"]
+            OrderStatus.IN_PROGRESS: (
+                [OrderStatus.COMPLETED, OrderStatus.DISPUTED]
+                if can_accept
+                else [OrderStatus.DISPUTED]
             ),
-            "disputed": ["completed", "cancelled"] if is_moderator else [],
-            "completed": [],
-            "cancelled": [],
+            OrderStatus.DISPUTED: (
+                [OrderStatus.COMPLETED, OrderStatus.CANCELLED] if is_moderator else []
+            ),
+            OrderStatus.COMPLETED: [],
+            OrderStatus.CANCELLED: [],
         }
 
-        if new_status not in allowed_transitions.get(current_status, []):
+        if new_status not in allowed_transitions[current_status]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid status transition from {current_status} to {new_status}",
+                detail=(
+                    f"Invalid status transition from {current_status.value} "
+                    f"to {new_status.value}"
+                ),
             )
 
+        update_data["status"] = new_status
+        if new_status == OrderStatus.COMPLETED:
+            completes_order = True
+            update_data["completed_at"] = datetime.utcnow()
+
     # Only moderators can update certain fields
     if not is_moderator:
         update_data.pop("buyer_id", None)
@@ -235,7 +265,11 @@ def update_order(
         update_data.pop("total_price", None)
 
     # Only buyer can update buyer_message initially
-    if "buyer_message" in update_data and not is_buyer and current_status == "pending":
+    if (
+        "buyer_message" in update_data
+        and not is_buyer
+        and current_status == OrderStatus.PENDING
+    ):
         update_data.pop("buyer_message")
 
     # Only seller can update seller_message
@@ -245,19 +279,23 @@ def update_order(
     for field, value in update_data.items():
         setattr(order, field, value)
 
+    # Reputation counters are updated in the same transaction as the status
+    if completes_order:
+        record_order_completed(db, order)
+
     db.commit()
     db.refresh(order)
 
     return order
 
 
-@router.post("/{order_id}/confirm", response_model=Message)
+@router.post("/{order_id}/confirm", response_model=GenericMessage)
 def confirm_order(
     order_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ) -> Any:
-    """Confirm order (seller only)"""
+    """Confirm a paid order and start delivery (seller only)"""
 
     order = db.query(Order).filter(Order.id == order_id).first()
     if not order:
@@ -266,27 +304,27 @@ def confirm_order(
         )
 
     # Check permissions
-    if order.seller_id != current_user.id and current_user.role not in [
-        "moderator",
-        "admin",
-    ]:
+    if order.seller_id != current_user.id and current_user.role not in (
+        UserRole.MODERATOR,
+        UserRole.ADMIN,
+    ):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
         )
 
-    if order.status != "pending":
+    if order.status != OrderStatus.PAID:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Can only confirm pending orders",
+            detail="Can only confirm paid orders",
         )
 
-    order.status = "confirmed"
+    order.status = OrderStatus.IN_PROGRESS
     db.commit()
 
     return {"message": "Order confirmed successfully"}
 
 
-@router.post("/{order_id}/cancel", response_model=Message)
+@router.post("/{order_id}/cancel", response_model=GenericMessage)
 def cancel_order(
     order_id: int,
     db: Session = Depends(get_db),
@@ -303,34 +341,36 @@ def cancel_order(
     # Check permissions
     is_buyer = order.buyer_id == current_user.id
     is_seller = order.seller_id == current_user.id
-    is_moderator = current_user.role in ["moderator", "admin"]
+    is_moderator = current_user.role in (UserRole.MODERATOR, UserRole.ADMIN)
 
     if not (is_buyer or is_seller or is_moderator):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions"
         )
 
-    # Check if order can be cancelled
-    if order.status not in ["pending", "confirmed"]:
+    # Anyone involved may cancel before payment; once paid, only the seller
+    # (refunding) or a moderator can, as in update_order
+    cancellable = [OrderStatus.PENDING]
+    if is_seller or is_moderator:
+        cancellable.append(OrderStatus.PAID)
+    if order.status not in cancellable:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Order cannot be cancelled at this stage",
         )
 
-    # Restore lot quantity if order is cancelled
+    # Put a lot sold through this order back on sale
     lot = db.query(Lot).filter(Lot.id == order.lot_id).first()
-    if lot and lot.quantity is not None:
-        lot.quantity += order.quantity
-        if lot.status == "sold_out":
-            lot.status = "active"
+    if lot and lot.status == LotStatus.SOLD:
+        lot.status = LotStatus.ACTIVE
 
-    order.status = "cancelled"
+    order.status = OrderStatus.CANCELLED
     db.commit()
 
     return {"message": "Order cancelled successfully"}
 
 
-@router.post("/{order_id}/dispute", response_model=Message)
+@router.post("/{order_id}/dispute", response_model=GenericMessage)
 def create_dispute(
     order_id: int,
     db: Session = Depends(get_db),
@@ -351,13 +391,71 @@ def create_dispute(
             detail="Only buyer can create dispute",
         )
 
-    if order.status != "in_escrow":
+    if order.status not in (OrderStatus.PAID, OrderStatus.IN_PROGRESS):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Can only dispute orders in escrow",
+            detail="Can only dispute paid or in-progress orders",
         )
 
-    order.status = "disputed"
+    order.status = OrderStatus.DISPUTED
     db.commit()
 
     return {"message": "Dispute created successfully"}
+
+
+@router.post(
+    "/{order_id}/review",
+    response_model=ReviewResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+def create_review(
+    order_id: int,
+    review_data: ReviewBase,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """Leave review for completed order (buyer only)"""
+
+    order = db.query(Order).filter(Order.id == order_id).first()
+    if not order:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
+        )
+
+    # Check permissions
+    if order.buyer_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only buyer can review order",
+        )
+
+    if order.status != OrderStatus.COMPLETED:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Can only review completed orders",
+        )
+
+    if db.query(Review).filter(Review.order_id == order_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Order already reviewed",
+        )
+
+    db_review = Review(
+        rating=review_data.rating,
+        comment=review_data.comment,
+        reviewer_id=current_user.id,
+        reviewed_id=order.seller_id,
+        order_id=order.id,
+        is_visible=True,
+    )
+    db.add(db_review)
+    db.flush()
+
+    # Seller rating is updated in the same transaction as the review
+    record_review(db, db_review)
+
+    db.commit()
+    db.refresh(db_review)
+
+    return db_review
@@ -14,8 +14,18 @@ from ..core.auth import (
     get_current_moderator,
     get_password_hash,
 )
-from ..schemas import UserResponse, UserUpdate, UserCreate, PaginatedResponse, Message
+from ..core.validators import ValidationError
+from ..schemas import (
+    UserResponse,
+    UserUpdate,
+    UserCreate,
+    PaginatedResponse,
+    Message,
+    GenericMessage,
+)
 from ..models import User
+from ..services.media_store import register_blob
+from ..services.uploads import save_image_upload
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
@@ -228,7 +238,7 @@ def verify_user(
     return {"message": f"User {user.username} has been verified"}
 
 
-@router.post("/upload-avatar", response_model=Message)
+@router.post("/upload-avatar", response_model=GenericMessage)
 def upload_avatar(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
@@ -236,24 +246,13 @@ def upload_avatar(
 ) -> Any:
     """Upload user avatar"""
 
-    # Check file type
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="File must be an image"
-        )
-
-    # Check file size (max 5MB)
-    if file.size > 5 * 1024 * 1024:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size must be less than 5MB",
-        )
-
-    # In a real app, you would save the file to cloud storage
-    # For now, we'll just simulate updating the avatar URL
-    avatar_url = f"/static/avatars/{current_user.id}_{file.filename}"
+    try:
+        upload = save_image_upload(file, "avatars")
+    except ValidationError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=exc.message)
+    register_blob(db, upload.kind, upload.digest, upload.size)
 
-    current_user.avatar_url = avatar_url
+    current_user.avatar_url = upload.url
     db.commit()
 
     return {"message": "Avatar uploaded successfully"}
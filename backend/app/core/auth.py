@@ -2,17 +2,20 @@
 Authentication utilities and JWT handling
 """
 
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from typing import Any, Dict, Optional
 from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Query, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from ..core.config import settings
 from ..core.database import get_db
-from ..models import User
+from ..core.jwt_keys import TokenError, get_key_ring
+from ..core.revocation import revoked_tokens
+from ..core.tracing import start_span
+from ..models import User, UserRole
 from ..schemas import TokenData
 
 # Password hashing
@@ -45,11 +48,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
-    )
-    return encoded_jwt
+    return get_key_ring().sign(to_encode)
 
 
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -59,39 +60,43 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
-    )
-    return encoded_jwt
+    return get_key_ring().sign(to_encode)
 
 
-def verify_token(token: str, token_type: str = "access") -> Optional[TokenData]:
-    """Verify JWT token and return token data"""
+def decode_token(token: str, token_type: str = "access") -> Optional[Dict[str, Any]]:
+    """Claims of a valid, unexpired and unrevoked JWT of the given type"""
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        username: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        exp: int = payload.get("exp")
-        token_type_payload: str = payload.get("type")
+        payload = get_key_ring().verify(token)
+    except TokenError:
+        return None
 
-        if username is None or user_id is None:
-            return None
+    if payload.get("type") != token_type:
+        return None
 
-        if token_type_payload != token_type:
-            return None
+    # Revoked access tokens are found in memory, without a database query
+    jti = payload.get("jti")
+    if token_type == "access" and jti and revoked_tokens.is_revoked(jti):
+        return None
 
-        # Check if token is expired
-        if exp and datetime.utcnow().timestamp() > exp:
-            return None
+    return payload
 
-        return TokenData(user_id=user_id, username=username)
 
-    except JWTError:
+def verify_token(token: str, token_type: str = "access") -> Optional[TokenData]:
+    """Verify JWT token and return token data"""
+    with start_span("jwt.decode"):
+        payload = decode_token(token, token_type)
+    if payload is None:
+        return None
+
+    username: str = payload.get("sub")
+    user_id: int = payload.get("user_id")
+    if username is None or user_id is None:
         return None
 
+    return TokenData(user_id=user_id, username=username)
+
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     """Authenticate user by username and password"""
@@ -124,6 +129,7 @@ def get_current_user(
         )
 
     token = credentials.credentials
+    revoked_tokens.sync(db, settings.TOKEN_REVOCATION_SYNC_SECONDS)
 
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -135,7 +141,8 @@ def get_current_user(
     if token_data is None:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    with start_span("auth.user_lookup"):
+        user = db.query(User).filter(User.id == token_data.user_id).first()
     if user is None:
         raise credentials_exception
 
@@ -147,6 +154,19 @@ def get_current_user(
     return user
 
 
+def get_current_user_for_stream(
+    token: Optional[str] = Query(
+        None, description="Access token, for EventSource which cannot send headers"
+    ),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    db: Session = Depends(get_db),
+) -> User:
+    """Get current authenticated user from the header or ``?token=``"""
+    if credentials is None and token:
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    return get_current_user(credentials, db)
+
+
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Get current active user"""
     if not current_user.is_active:
@@ -158,7 +178,7 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
 
 def get_current_seller(current_user: User = Depends(get_current_user)) -> User:
     """Get current user with seller privileges"""
-    if current_user.role not in ["seller", "moderator", "admin"]:
+    if current_user.role not in (UserRole.SELLER, UserRole.MODERATOR, UserRole.ADMIN):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Seller privileges required"
         )
@@ -167,7 +187,7 @@ def get_current_seller(current_user: User = Depends(get_current_user)) -> User:
 
 def get_current_moderator(current_user: User = Depends(get_current_user)) -> User:
     """Get current user with moderator privileges"""
-    if current_user.role not in ["moderator", "admin"]:
+    if current_user.role not in (UserRole.MODERATOR, UserRole.ADMIN):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Moderator privileges required",
@@ -177,7 +197,7 @@ def get_current_moderator(current_user: User = Depends(get_current_user)) -> Use
 
 def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
     """Get current user with admin privileges"""
-    if current_user.role != "admin":
+    if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required"
         )
@@ -195,6 +215,7 @@ def get_current_user_optional(
 
     try:
         token = credentials.credentials
+        revoked_tokens.sync(db, settings.TOKEN_REVOCATION_SYNC_SECONDS)
         token_data = verify_token(token)
         if token_data is None:
             return None
@@ -0,0 +1,514 @@
+"""Caching helpers.
+
+``TTLCache`` is an in-process LRU whose entries expire. ``TieredCache`` puts
+one in front of a cache shared by all worker processes, so a value computed
+by one worker serves the others and is stored once per host or cluster:
+
+- ``SharedMemoryCache``: a fixed-size table in a memory-mapped file (in
+  ``/dev/shm``) shared by the workers of one host, for ``shm://`` URLs
+- ``RedisCache``: a Redis-compatible server, for ``redis://``, ``rediss://``
+  and ``unix://`` URLs
+
+Workers keep their own copy of a shared entry for at most ``local_ttl``
+seconds. A worker that sets or deletes a key publishes an invalidation and
+the others drop their copy: through a log in the shared memory segment,
+replayed on their next lookup, or a Redis pub/sub channel. ``create_cache``
+builds the cache for ``CACHE_URL``.
+
+Shared memory entries are pickled, in a file only this user can write.
+Redis entries are stored as JSON, so whoever can write to the server can at
+worst poison cached responses, not run code in the workers; values shared
+through Redis must be JSON-compatible.
+"""
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import stat
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+from .config import settings
+from .logging import get_logger
+
+try:
+    import redis
+except ImportError:  # Optional: only needed for a Redis cache
+    redis = None
+
+logger = get_logger(__name__)
+
+DEFAULT_SHARED_PATH = "/dev/shm/game-marketplace-cache"
+
+# (expires at, as a Unix time; value) of a shared entry
+Entry = Tuple[float, Any]
+Handler = Callable[[Optional[bytes]], None]  # None: drop everything
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a live entry (marking it recently used) or default."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Drop a single entry."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _Origin:
+    """Random id of this process, so it skips its own invalidations."""
+
+    def __init__(self) -> None:
+        self._pid = -1
+        self._id = b""
+
+    @property
+    def id(self) -> bytes:
+        if self._pid != os.getpid():  # Forked workers get their own
+            self._pid = os.getpid()
+            self._id = os.urandom(8)
+        return self._id
+
+
+def _open_private(path: str) -> int:
+    """Open or create a file that only this user can have written.
+
+    Entries are unpickled, so a file others can write would let them run
+    code in the workers.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+    file_stat = os.fstat(fd)
+    if (
+        not stat.S_ISREG(file_stat.st_mode)
+        or file_stat.st_uid != os.getuid()
+        or file_stat.st_mode & 0o077
+    ):
+        os.close(fd)
+        raise RuntimeError(
+            f"Shared cache file {path} must be a regular file that only "
+            f"this user can access (mode 0600)"
+        )
+    return fd
+
+
+def _inode(path: str) -> int:
+    try:
+        return os.stat(path, follow_symlinks=False).st_ino
+    except FileNotFoundError:
+        return -1
+
+
+class SharedMemoryCache:
+    """Entries in a memory-mapped file shared by the processes of one host.
+
+    The file holds a header, a ring of the last ``log_size`` invalidated
+    digests and ``slots`` fixed-size slots; a key lives in the slot its
+    digest maps to and replaces whatever was there. Values that do not fit
+    in a slot are not stored. Slots are guarded by striped ``fcntl`` locks
+    (shared for reads) plus a thread lock per stripe, since fcntl locks
+    belong to the process. The file must belong to this user and be
+    private to it; one of another geometry is replaced by a new file.
+    """
+
+    MAGIC = b"GMCACHE1"
+    HEADER = struct.Struct("<8sIII4xQ")  # magic, slots, slot size, log size, seq
+    SEQUENCE_OFFSET = 24
+    SLOT_HEADER = struct.Struct("<16sdI4x")  # digest, expires at, length
+    LOG_ENTRY = struct.Struct("<8s16s")  # origin, digest
+    STRIPES = 64
+
+    def __init__(
+        self,
+        path: str = DEFAULT_SHARED_PATH,
+        slots: int = 16384,
+        slot_size: int = 4096,
+        log_size: int = 4096,
+    ):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.log_size = log_size
+        self._log_offset = 64
+        header_size = self._log_offset + log_size * self.LOG_ENTRY.size
+        self._slots_offset = -(-header_size // mmap.PAGESIZE) * mmap.PAGESIZE
+        self._size = self._slots_offset + slots * slot_size
+        self._log_lock = self.STRIPES  # Lock byte of the invalidation log
+
+        self._fd = self._open()
+        self._map = mmap.mmap(self._fd, self._size)
+        self._thread_locks = [threading.Lock() for _ in range(self.STRIPES + 1)]
+        self._origin = _Origin()
+        self._handlers: List[Handler] = []
+        self._seen = self._sequence()
+
+    def _open(self) -> int:
+        """Descriptor of the segment file, created or replaced as needed"""
+        init_lock = self.STRIPES + 1
+        while True:
+            fd = _open_private(self.path)
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, init_lock)
+            try:
+                ready = self._prepare(fd)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, init_lock)
+            if ready:
+                return fd
+            os.close(fd)
+
+    def _prepare(self, fd: int) -> bool:
+        """Whether fd is the segment; False once the file has been replaced"""
+        if os.fstat(fd).st_ino != _inode(self.path):
+            return False  # Replaced by another process meanwhile
+
+        expected = (self.MAGIC, self.slots, self.slot_size, self.log_size)
+        header = os.pread(fd, self.HEADER.size, 0)
+        if not header:  # New file
+            os.ftruncate(fd, self._size)
+            os.pwrite(fd, self.HEADER.pack(*expected, 0), 0)
+            return True
+        if (
+            len(header) == self.HEADER.size
+            and self.HEADER.unpack(header)[:4] == expected
+        ):
+            return True
+
+        # Another geometry: processes may still map the old file (rolling
+        # restart) and fault on a shrunk one, so it is replaced, not resized
+        new_fd, new_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path) or ".",
+            prefix=os.path.basename(self.path) + ".",
+        )
+        try:
+            os.ftruncate(new_fd, self._size)
+            os.pwrite(new_fd, self.HEADER.pack(*expected, 0), 0)
+            os.replace(new_path, self.path)
+        finally:
+            os.close(new_fd)
+        return False
+
+    def _locked(self, stripe: int, exclusive: bool) -> "_StripeLock":
+        return _StripeLock(self, stripe, exclusive)
+
+    def _slot(self, digest: bytes) -> Tuple[int, int]:
+        index = int.from_bytes(digest[:8], "little") % self.slots
+        return self._slots_offset + index * self.slot_size, index % self.STRIPES
+
+    def get(self, digest: bytes) -> Optional[Entry]:
+        offset, stripe = self._slot(digest)
+        with self._locked(stripe, exclusive=False):
+            stored, expires_at, length = self.SLOT_HEADER.unpack_from(self._map, offset)
+            if stored != digest or expires_at <= time.time():
+                return None
+            start = offset + self.SLOT_HEADER.size
+            data = self._map[start : start + length]
+        return expires_at, pickle.loads(data)
+
+    def set(self, digest: bytes, value: Any, expires_at: float) -> bool:
+        """Store an entry; False when it does not fit in a slot."""
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.slot_size - self.SLOT_HEADER.size:
+            return False
+        offset, stripe = self._slot(digest)
+        with self._locked(stripe, exclusive=True):
+            self.SLOT_HEADER.pack_into(self._map, offset, digest, expires_at, len(data))
+            start = offset + self.SLOT_HEADER.size
+            self._map[start : start + len(data)] = data
+        return True
+
+    def delete(self, digest: bytes) -> None:
+        offset, stripe = self._slot(digest)
+        with self._locked(stripe, exclusive=True):
+            if self.SLOT_HEADER.unpack_from(self._map, offset)[0] == digest:
+                self.SLOT_HEADER.pack_into(self._map, offset, bytes(16), 0.0, 0)
+
+    def _sequence(self) -> int:
+        return struct.unpack_from("<Q", self._map, self.SEQUENCE_OFFSET)[0]
+
+    def publish(self, digest: bytes) -> None:
+        """Tell the other processes to drop their copy of an entry."""
+        with self._locked(self._log_lock, exclusive=True):
+            sequence = self._sequence() + 1
+            self.LOG_ENTRY.pack_into(
+                self._map,
+                self._log_offset + sequence % self.log_size * self.LOG_ENTRY.size,
+                self._origin.id,
+                digest,
+            )
+            struct.pack_into("<Q", self._map, self.SEQUENCE_OFFSET, sequence)
+
+    def subscribe(self, handler: Handler) -> None:
+        """Call handler(digest) for entries invalidated by other processes."""
+        self._handlers.append(handler)
+
+    def poll(self) -> None:
+        """Replay the invalidations published since the last poll."""
+        if self._sequence() == self._seen:  # No lock for the common case
+            return
+        with self._locked(self._log_lock, exclusive=False):
+            sequence = self._sequence()
+            seen, self._seen = self._seen, sequence
+            if sequence - seen > self.log_size:
+                digests = None  # Overrun: some were overwritten
+            else:
+                digests = []
+                for number in range(seen + 1, sequence + 1):
+                    origin, digest = self.LOG_ENTRY.unpack_from(
+                        self._map,
+                        self._log_offset + number % self.log_size * self.LOG_ENTRY.size,
+                    )
+                    if origin != self._origin.id:
+                        digests.append(digest)
+
+        for handler in self._handlers:
+            if digests is None:
+                handler(None)
+            else:
+                for digest in digests:
+                    handler(digest)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+class _StripeLock:
+    """A stripe of a SharedMemoryCache, locked across threads and processes."""
+
+    __slots__ = ("cache", "stripe", "exclusive")
+
+    def __init__(self, cache: SharedMemoryCache, stripe: int, exclusive: bool):
+        self.cache = cache
+        self.stripe = stripe
+        self.exclusive = exclusive
+
+    def __enter__(self) -> None:
+        self.cache._thread_locks[self.stripe].acquire()
+        mode = fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH
+        fcntl.lockf(self.cache._fd, mode, 1, self.stripe)
+
+    def __exit__(self, *exc_info: Any) -> None:
+        fcntl.lockf(self.cache._fd, fcntl.LOCK_UN, 1, self.stripe)
+        self.cache._thread_locks[self.stripe].release()
+
+
+class RedisCache:
+    """Entries on a Redis-compatible server, invalidations over pub/sub."""
+
+    def __init__(
+        self, url: str, prefix: str = "cache:", channel: str = "cache_invalidation"
+    ):
+        if redis is None:
+            raise RuntimeError(
+                "A Redis cache needs the redis package (pip install redis)"
+            )
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix.encode()
+        self.channel = channel
+        self._origin = _Origin()
+        self._handlers: List[Handler] = []
+        self._listener: Any = None
+        self._listener_pid = -1
+
+    def get(self, digest: bytes) -> Optional[Entry]:
+        data = self._client.get(self.prefix + digest)
+        if data is None:
+            return None
+        # JSON, not pickle: the server may be writable by other clients
+        expires_at, value = json.loads(data)
+        return expires_at, value
+
+    def set(self, digest: bytes, value: Any, expires_at: float) -> bool:
+        milliseconds = int((expires_at - time.time()) * 1000)
+        if milliseconds > 0:
+            self._client.set(
+                self.prefix + digest,
+                json.dumps([expires_at, value], separators=(",", ":")),
+                px=milliseconds,
+            )
+        return True
+
+    def delete(self, digest: bytes) -> None:
+        self._client.delete(self.prefix + digest)
+
+    def publish(self, digest: bytes) -> None:
+        self._client.publish(self.channel, self._origin.id + digest)
+
+    def subscribe(self, handler: Handler) -> None:
+        self._handlers.append(handler)
+
+    def poll(self) -> None:
+        # Listen from the process that serves, not the one that imported
+        # the app before forking workers (threads do not survive a fork)
+        if self._handlers and self._listener_pid != os.getpid():
+            self._listener_pid = os.getpid()
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._deliver})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _deliver(self, message: dict) -> None:
+        data = message["data"]
+        if data[:8] != self._origin.id:
+            for handler in self._handlers:
+                handler(data[8:])
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+        self._client.close()
+
+
+class TieredCache:
+    """An in-process LRU in front of a cache shared by the worker processes.
+
+    Keys are strings; values must pickle, and be JSON-compatible for a Redis
+    cache. Without a shared cache this is a ``TTLCache``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        shared: Any = None,
+        maxsize: int = 1024,
+        ttl: float = 30.0,
+        local_ttl: float = 5.0,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.shared = shared
+        self.local_ttl = ttl if shared is None else min(local_ttl, ttl)
+        self.local = TTLCache(maxsize=maxsize, ttl=self.local_ttl)
+        if shared is not None:
+            shared.subscribe(self._invalidated)
+
+    def _digest(self, key: str) -> bytes:
+        return hashlib.blake2b(f"{self.name}\0{key}".encode(), digest_size=16).digest()
+
+    def _invalidated(self, digest: Optional[bytes]) -> None:
+        if digest is None:  # Lost track of what changed
+            self.local.clear()
+        else:
+            self.local.delete(digest)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a live entry from this worker or the shared cache, or default."""
+        digest = self._digest(key)
+        if self.shared is None:
+            return self.local.get(digest, default)
+
+        self.shared.poll()
+        value = self.local.get(digest, _MISSING)
+        if value is not _MISSING:
+            return value
+        entry = self.shared.get(digest)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        self._keep(digest, value, expires_at - time.time())
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value for all workers, replacing their copies."""
+        ttl = self.ttl if ttl is None else ttl
+        digest = self._digest(key)
+        if self.shared is not None:
+            self.shared.set(digest, value, time.time() + ttl)
+            self.shared.publish(digest)
+        self._keep(digest, value, ttl)
+
+    def _keep(self, digest: bytes, value: Any, ttl: float) -> None:
+        ttl = min(ttl, self.local_ttl)
+        if ttl > 0:
+            self.local.set(digest, value, ttl=ttl)
+
+    def delete(self, key: str) -> None:
+        """Drop an entry everywhere."""
+        digest = self._digest(key)
+        if self.shared is not None:
+            self.shared.delete(digest)
+            self.shared.publish(digest)
+        self.local.delete(digest)
+
+    def clear(self) -> None:
+        """Drop this worker's copies (shared entries expire on their own)."""
+        self.local.clear()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+
+_shared_caches: dict = {}
+
+
+def create_shared_cache(url: Optional[str] = None) -> Any:
+    """Shared cache for a CACHE_URL (None for in-process caching only)"""
+    if not url:
+        return None
+    if url not in _shared_caches:
+        if url.startswith("shm://"):
+            _shared_caches[url] = SharedMemoryCache(
+                url[len("shm://") :] or DEFAULT_SHARED_PATH,
+                slots=settings.CACHE_SHARED_SLOTS,
+                slot_size=settings.CACHE_SHARED_SLOT_SIZE,
+            )
+        elif url.startswith(("redis://", "rediss://", "unix://")):
+            _shared_caches[url] = RedisCache(url)
+        else:
+            raise ValueError(f"Unsupported cache URL: {url}")
+    return _shared_caches[url]
+
+
+def create_cache(name: str, maxsize: int = 1024, ttl: float = 30.0) -> TieredCache:
+    """A cache of this worker, shared with the others when CACHE_URL is set"""
+    return TieredCache(
+        name,
+        create_shared_cache(settings.CACHE_URL),
+        maxsize=maxsize,
+        ttl=ttl,
+        local_ttl=settings.CACHE_LOCAL_TTL,
+    )
@@ -25,9 +25,15 @@ class Settings(BaseSettings):
         "SECRET_KEY", 
         "your-super-secret-key-change-in-production"
     )
-    ALGORITHM: str = "HS256"
+    ALGORITHM: str = "HS256"  # HS256 (SECRET_KEY), RS256 or EdDSA
+    # PEM private key for RS256/EdDSA. Keys listed in JWT_VERIFY_KEY_FILES
+    # (private or public PEM) are still accepted, for key rotation.
+    JWT_PRIVATE_KEY_FILE: Optional[str] = None
+    JWT_VERIFY_KEY_FILES: List[str] = []
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # How stale another worker's view of revoked access tokens may be
+    TOKEN_REVOCATION_SYNC_SECONDS: int = 5
 
     # CORS
     ALLOWED_ORIGINS: List[str] = [
@@ -43,6 +49,17 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "static/uploads"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_EXTENSIONS: List[str] = [".jpg", ".jpeg", ".png", ".gif", ".webp"]
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    IMAGE_WORKERS: int = 2  # Thumbnail processes, 0 renders in the request thread
+    IMAGE_MAX_PIXELS: int = 40_000_000
+    IMAGE_PROCESSING_TIMEOUT: int = 30  # seconds
+    MEDIA_GC_GRACE_HOURS: int = 24
+    STATIC_MAX_AGE: int = 3600  # seconds, names without a content hash
+
+    # Response compression
+    COMPRESSION_MIN_SIZE: int = 1024  # bytes
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
 
     # Email (для уведомлений)
     EMAIL_HOST: Optional[str] = None
@@ -56,7 +73,63 @@ class Settings(BaseSettings):
     MAX_PAGE_SIZE: int = 100
 
     # Rate limiting
-    RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_PER_MINUTE: int = 60  # Bucket size, refilled over a minute
+    RATE_LIMIT_ENABLED: bool = True
+    # None keeps buckets in process memory (one per worker); redis://host/db
+    # shares them between workers and hosts
+    RATE_LIMIT_STORAGE_URL: Optional[str] = None
+    RATE_LIMIT_SHARDS: int = 16
+
+    # Chat
+    CHAT_PUBSUB_URL: Optional[str] = None  # redis://... for multi-worker fan-out
+    CHAT_SEND_QUEUE_SIZE: int = 256  # Frames a slow client may fall behind
+    CHAT_WRITE_BATCH_SIZE: int = 200
+    CHAT_WRITE_INTERVAL_MS: int = 20
+    CHAT_WRITE_QUEUE_SIZE: int = 10_000
+    CHAT_MAX_MESSAGE_LENGTH: int = 4000
+
+    # Order status event streams (Server-Sent Events)
+    ORDER_EVENTS_PUBSUB_URL: Optional[str] = None  # redis://... for multi-worker
+    ORDER_EVENTS_BUFFER_SIZE: int = 1000  # Recent events kept for Last-Event-ID
+    ORDER_EVENTS_QUEUE_SIZE: int = 100  # Events a slow stream may fall behind
+    ORDER_EVENTS_HEARTBEAT_SECONDS: int = 15
+
+    # Sampling profiler (admin endpoints and the X-Profile request header)
+    PROFILER_ENABLED: bool = True
+    PROFILER_INTERVAL_MS: int = 10  # Always-on sampling of request threads
+    PROFILER_WINDOW_SECONDS: int = 60
+    PROFILER_WINDOWS: int = 15  # Windows kept: 15 minutes at the default size
+    PROFILER_REQUEST_INTERVAL_MS: int = 1  # Requests sent with X-Profile
+
+    # Request tracing (OpenTelemetry-compatible spans, W3C traceparent)
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 0.01  # New traces
+    TRACING_MAX_FORCED_PER_SECOND: float = 10  # Traces sampled by callers, per worker
+    TRACING_EXPORT_PATH: str = "logs/traces.jsonl"  # OTLP/JSON, one batch a line
+    TRACING_EXPORT_MAX_BYTES: int = 100 * 1024 * 1024  # Then rotated to .1, .2, ...
+    TRACING_EXPORT_BACKUPS: int = 5
+    TRACING_COLLECTOR_URL: Optional[str] = None  # http://localhost:4318/v1/traces
+    TRACING_SERVICE_NAME: str = "game-marketplace-api"
+
+    # Production server (serve.py)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = int(os.getenv("PORT", "8000"))
+    SERVER_WORKERS: int = 0  # 0: one per CPU
+    SERVER_LOOP: str = "auto"  # uvloop when installed
+    SERVER_HTTP: str = "auto"  # httptools when installed
+    SERVER_BACKLOG: int = 2048  # Connections queued by the kernel before accept
+    SERVER_KEEPALIVE_SECONDS: int = 5  # Idle keep-alive connections are closed
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = 30  # For in-flight requests on SIGTERM
+    SERVER_FORWARDED_ALLOW_IPS: str = "127.0.0.1"  # Proxies trusted for X-Forwarded-*
+    SERVER_PRELOAD: bool = True  # Import the app before forking workers
+
+    # Caching
+    FACETS_CACHE_TTL: int = 30  # seconds
+    # shm:// (one host) or redis:// (entries stored as JSON); unset: per worker
+    CACHE_URL: Optional[str] = None
+    CACHE_LOCAL_TTL: int = 5  # Seconds a worker keeps its copy of a shared entry
+    CACHE_SHARED_SLOTS: int = 16384  # shm:// entries
+    CACHE_SHARED_SLOT_SIZE: int = 4096  # Bytes; larger values are not shared
 
     model_config = ConfigDict(
         env_file=".env",
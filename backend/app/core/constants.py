@@ -1,6 +1,6 @@
 """Application constants."""
 
-from typing import Final
+from typing import Final, Optional
 
 # API Configuration
 API_V1_PREFIX: Final[str] = "/api/v1"
@@ -10,9 +10,40 @@ STATIC_DIRS: Final[dict[str, str]] = {
     "avatars": "avatars",
     "game_images": "game_images",
     "lot_images": "lot_images",
-}  # Response Messages
+}
+
+# Longest-edge thumbnail sizes (px) rendered for uploaded images
+THUMBNAIL_SIZES: Final[dict[str, tuple[int, ...]]] = {
+    "avatars": (64, 128, 256),
+    "lot_images": (320, 640, 1280),
+}
+MAX_LOT_IMAGES: Final[int] = 10
+# Lot IDs per /lots/batch request
+MAX_LOT_BATCH_SIZE: Final[int] = 200
+
+# Response Messages
 HEALTH_STATUS: Final[str] = "healthy"
 
+# Lower edges of the catalog price facet buckets (last bucket is open-ended)
+PRICE_FACET_BUCKETS: Final[tuple[int, ...]] = (0, 100, 500, 1000, 5000, 10000)
+
+# Rate limiting: tokens charged per request, first matching rule wins.
+# (method, path, query parameter that must be present or None, cost)
+RATE_LIMIT_ROUTE_COSTS: Final[tuple[tuple[str, str, Optional[str], int], ...]] = (
+    ("GET", f"{API_V1_PREFIX}/lots", "search", 5),
+    ("GET", f"{API_V1_PREFIX}/lots/facets", None, 5),
+    ("POST", f"{API_V1_PREFIX}/auth/login", None, 5),
+    ("POST", f"{API_V1_PREFIX}/auth/login/json", None, 5),
+    ("POST", f"{API_V1_PREFIX}/auth/register", None, 5),
+)
+RATE_LIMIT_EXEMPT_PATHS: Final[tuple[str, ...]] = (
+    "/health",
+    "/docs",
+    "/redoc",
+    "/openapi.json",
+    "/.well-known/jwks.json",
+)
+
 # Error Messages
 ERROR_MESSAGES: Final[dict[str, str]] = {
     "UNAUTHORIZED": "Authentication required",
@@ -20,6 +51,7 @@ ERROR_MESSAGES: Final[dict[str, str]] = {
     "NOT_FOUND": "Resource not found",
     "VALIDATION_ERROR": "Invalid input data",
     "INTERNAL_ERROR": "Internal server error",
+    "RATE_LIMITED": "Too many requests",
 }
 
 # Success Messages
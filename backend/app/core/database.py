@@ -1,10 +1,11 @@
 """Database configuration and session management."""
 
 import logging
-from typing import Generator, AsyncGenerator
+from typing import Any, AsyncGenerator, Generator, Optional
 from sqlalchemy import create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     create_async_engine,
     async_sessionmaker
@@ -38,16 +39,33 @@ async_engine_kwargs = {
     "max_overflow": 10,
 }
 
-async_engine = create_async_engine(
-    settings.database_url_async,
-    **async_engine_kwargs
-)
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Async engine, created on first use.
+
+    Sync-only users (seed_data.py, SQLite) never need an async driver.
+    """
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            settings.database_url_async,
+            **async_engine_kwargs
+        )
+    return _async_engine
+
+
+def __getattr__(name: str) -> Any:
+    # ``async_engine`` stays importable as before
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-AsyncSessionLocal = async_sessionmaker(
-    async_engine, class_=AsyncSession, expire_on_commit=False
-)
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, expire_on_commit=False)
 
 # Base class for models - updated for SQLAlchemy 2.0
 Base = declarative_base()
@@ -71,7 +89,7 @@ def get_db() -> Generator[Session, None, None]:
 
 async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
     """Get async database session"""
-    async with AsyncSessionLocal() as session:
+    async with AsyncSessionLocal(bind=get_async_engine()) as session:
         try:
             logger.debug("Creating async database session")
             yield session
@@ -89,7 +107,9 @@ def init_db():
 
         # Import all models to ensure they are registered with Base
         from ..models import (
-            User, Game, Category, Lot, Order, Message, Review  # noqa: F401
+            User, Game, Category, CategoryClosure, Lot,  # noqa: F401
+            Order, Message, Review, MediaBlob, TableVersion,  # noqa: F401
+            RefreshToken, RevokedToken  # noqa: F401
         )
 
         logger.info("Creating database tables...")
@@ -0,0 +1,64 @@
+"""HTTP conditional request helpers."""
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+
+def weak_etag(*parts: Any) -> str:
+    """Weak entity tag over the values a representation is derived from."""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def as_utc(value: datetime) -> datetime:
+    """Aware UTC datetime (SQLite returns naive timestamps stored as UTC)."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+@dataclass
+class CacheValidators:
+    """ETag and Last-Modified of a response."""
+
+    etag: str
+    last_modified: Optional[datetime] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(
+                as_utc(self.last_modified), usegmt=True
+            )
+        return headers
+
+    def is_fresh(self, request: Request) -> bool:
+        """Whether the client's cached copy is still valid."""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # Weak comparison (RFC 9110 8.8.3.2)
+            ours = self.etag.removeprefix("W/")
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or ours in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and self.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                return False
+            # HTTP dates have one second resolution
+            return as_utc(self.last_modified).replace(microsecond=0) <= since
+        return False
+
+    def not_modified(self) -> Response:
+        """304 response carrying the validators."""
+        return Response(status_code=304, headers=self.headers)
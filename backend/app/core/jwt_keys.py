@@ -0,0 +1,245 @@
+"""JWT signing keys.
+
+Tokens are signed and verified with key objects parsed once per process
+(``get_key_ring``) instead of per call. Supported algorithms:
+
+- ``HS256``: shared ``SECRET_KEY`` (default, for single-service deployments)
+- ``RS256`` / ``EdDSA`` (Ed25519): private key in ``JWT_PRIVATE_KEY_FILE``;
+  other services verify tokens with the public keys from the JWKS endpoint
+  and never see anything that can sign
+
+Every asymmetric key has a ``kid`` (its RFC 7638 JWK thumbprint) written to
+the token header. To rotate, generate a new key and list the old key file in
+``JWT_VERIFY_KEY_FILES``: tokens it signed stay valid until they expire.
+"""
+
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa
+
+from .config import settings
+
+ASYMMETRIC_ALGORITHMS = ("RS256", "EdDSA")
+
+
+class TokenError(Exception):
+    """Token is malformed, has a bad signature or is expired"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _int_b64(value: int) -> str:
+    return _b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+@dataclass
+class SigningKey:
+    """Parsed key for one algorithm; ``private`` is None for verify-only keys"""
+
+    algorithm: str
+    kid: Optional[str]
+    private: Any = None
+    public: Any = None
+    secret: Optional[bytes] = None  # HS256
+
+    @classmethod
+    def from_secret(cls, secret: str) -> "SigningKey":
+        return cls(algorithm="HS256", kid=None, secret=secret.encode())
+
+    @classmethod
+    def from_pem(cls, pem: bytes) -> "SigningKey":
+        """Private or public PEM key; the algorithm follows from the key type"""
+        private = None
+        try:
+            private = serialization.load_pem_private_key(pem, password=None)
+            public = private.public_key()
+        except ValueError:
+            public = serialization.load_pem_public_key(pem)
+
+        if isinstance(public, rsa.RSAPublicKey):
+            algorithm = "RS256"
+        elif isinstance(public, ed25519.Ed25519PublicKey):
+            algorithm = "EdDSA"
+        else:
+            raise ValueError(f"Unsupported JWT key type: {type(public).__name__}")
+
+        key = cls(algorithm=algorithm, kid=None, private=private, public=public)
+        key.kid = key.thumbprint()
+        return key
+
+    @property
+    def jwk(self) -> Dict[str, str]:
+        """Public JWK (RFC 7517) of an asymmetric key"""
+        if self.algorithm == "RS256":
+            numbers = self.public.public_numbers()
+            jwk = {"kty": "RSA", "e": _int_b64(numbers.e), "n": _int_b64(numbers.n)}
+        else:
+            raw = self.public.public_bytes(
+                serialization.Encoding.Raw, serialization.PublicFormat.Raw
+            )
+            jwk = {"kty": "OKP", "crv": "Ed25519", "x": _b64encode(raw)}
+        return jwk
+
+    def thumbprint(self) -> str:
+        """RFC 7638 thumbprint: sha256 over the required members, sorted"""
+        canonical = json.dumps(self.jwk, sort_keys=True, separators=(",", ":"))
+        return _b64encode(hashlib.sha256(canonical.encode()).digest())
+
+    def sign(self, data: bytes) -> bytes:
+        if self.algorithm == "HS256":
+            return hmac.new(self.secret, data, hashlib.sha256).digest()
+        if self.private is None:
+            raise TokenError(f"Key {self.kid} can only verify")
+        if self.algorithm == "RS256":
+            return self.private.sign(data, padding.PKCS1v15(), hashes.SHA256())
+        return self.private.sign(data)
+
+    def verify(self, data: bytes, signature: bytes) -> bool:
+        if self.algorithm == "HS256":
+            expected = hmac.new(self.secret, data, hashlib.sha256).digest()
+            return hmac.compare_digest(expected, signature)
+        try:
+            if self.algorithm == "RS256":
+                self.public.verify(signature, data, padding.PKCS1v15(), hashes.SHA256())
+            else:
+                self.public.verify(signature, data)
+        except InvalidSignature:
+            return False
+        return True
+
+
+class KeyRing:
+    """The signing key plus older keys still accepted for verification"""
+
+    def __init__(self, signing_key: SigningKey, verify_keys: List[SigningKey] = ()):
+        self.signing_key = signing_key
+        self._keys = {key.kid: key for key in [*verify_keys, signing_key]}
+
+        header = {"alg": signing_key.algorithm, "typ": "JWT"}
+        if signing_key.kid:
+            header["kid"] = signing_key.kid
+        # Identical for every token, so encoded once
+        self._header = _b64encode(json.dumps(header, separators=(",", ":")).encode())
+
+    def sign(self, claims: Dict[str, Any]) -> str:
+        """Compact JWS of the claims; datetimes become NumericDate"""
+        payload = {
+            name: calendar.timegm(value.utctimetuple())
+            if isinstance(value, datetime)
+            else value
+            for name, value in claims.items()
+        }
+        signing_input = (
+            f"{self._header}."
+            f"{_b64encode(json.dumps(payload, separators=(',', ':')).encode())}"
+        )
+        signature = self.signing_key.sign(signing_input.encode())
+        return f"{signing_input}.{_b64encode(signature)}"
+
+    def verify(self, token: str, now: Optional[float] = None) -> Dict[str, Any]:
+        """Claims of a token signed by a known key, checking exp and nbf.
+
+        Raises:
+            TokenError: Malformed, unknown key, bad signature or expired
+        """
+        try:
+            header_segment, payload_segment, signature_segment = token.split(".")
+            header = json.loads(_b64decode(header_segment))
+            signature = _b64decode(signature_segment)
+        except (ValueError, TypeError) as exc:
+            raise TokenError("Malformed token") from exc
+        if not isinstance(header, dict):
+            raise TokenError("Malformed token")
+
+        key = self._keys.get(header.get("kid"))
+        # The key decides the algorithm, never the token (alg confusion)
+        if key is None or header.get("alg") != key.algorithm:
+            raise TokenError("Unknown signing key")
+
+        signing_input = f"{header_segment}.{payload_segment}".encode()
+        if not key.verify(signing_input, signature):
+            raise TokenError("Signature verification failed")
+
+        try:
+            claims = json.loads(_b64decode(payload_segment))
+        except ValueError as exc:
+            raise TokenError("Malformed claims") from exc
+        if not isinstance(claims, dict):
+            raise TokenError("Malformed claims")
+
+        now = time.time() if now is None else now
+        try:
+            if "exp" in claims and now >= claims["exp"]:
+                raise TokenError("Token expired")
+            if "nbf" in claims and now < claims["nbf"]:
+                raise TokenError("Token not yet valid")
+        except TypeError as exc:
+            raise TokenError("Malformed claims") from exc
+        return claims
+
+    def jwks(self) -> Dict[str, List[Dict[str, str]]]:
+        """Public keys as a JWK Set (symmetric keys are never published)"""
+        return {
+            "keys": [
+                {**key.jwk, "kid": key.kid, "alg": key.algorithm, "use": "sig"}
+                for key in self._keys.values()
+                if key.algorithm in ASYMMETRIC_ALGORITHMS
+            ]
+        }
+
+
+def generate_private_key_pem(algorithm: str) -> bytes:
+    """New unencrypted PKCS#8 private key for RS256 or EdDSA"""
+    if algorithm == "RS256":
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == "EdDSA":
+        key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def _read_key(path: str) -> SigningKey:
+    with open(path, "rb") as key_file:
+        return SigningKey.from_pem(key_file.read())
+
+
+@lru_cache(maxsize=1)
+def get_key_ring() -> KeyRing:
+    """Key ring from settings, parsed on first use"""
+    if settings.ALGORITHM == "HS256":
+        return KeyRing(SigningKey.from_secret(settings.SECRET_KEY))
+
+    if settings.ALGORITHM not in ASYMMETRIC_ALGORITHMS:
+        raise ValueError(f"Unsupported JWT algorithm: {settings.ALGORITHM}")
+    if not settings.JWT_PRIVATE_KEY_FILE:
+        raise ValueError(f"{settings.ALGORITHM} needs JWT_PRIVATE_KEY_FILE")
+
+    signing_key = _read_key(settings.JWT_PRIVATE_KEY_FILE)
+    if signing_key.algorithm != settings.ALGORITHM or signing_key.private is None:
+        raise ValueError(
+            f"JWT_PRIVATE_KEY_FILE is not a {settings.ALGORITHM} private key"
+        )
+    verify_keys = [_read_key(path) for path in settings.JWT_VERIFY_KEY_FILES]
+    return KeyRing(signing_key, verify_keys)
@@ -2,18 +2,58 @@
 
 import time
 import uuid
-from typing import Callable
+import zlib
+from typing import Any, Callable, Dict, Optional
 
 from fastapi import Request, Response, HTTPException
 from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import HTTPConnection
 
 from .logging import log_api_request, get_logger
 from .constants import ERROR_MESSAGES
 from .exceptions import GameMarketplaceException
 
+try:
+    import brotli
+except ImportError:  # Optional: responses fall back to gzip
+    brotli = None
+
 logger = get_logger(__name__)
 
+# Route path templates by endpoint, per application
+_route_templates: Dict[int, Dict[Any, str]] = {}
+
+
+def get_client_ip(connection: HTTPConnection) -> str:
+    """Client address of a connection.
+
+    X-Forwarded-For is not read here: anyone can send it. uvicorn (and
+    serve.py) already replace the peer address with the forwarded one when
+    the peer is a trusted proxy (SERVER_FORWARDED_ALLOW_IPS).
+    """
+    return connection.client.host if connection.client else "unknown"
+
+
+def route_template(scope: Dict[str, Any]) -> Optional[str]:
+    """Path template of the route that served a request, if any"""
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is None or app is None:
+        return None
+
+    templates = _route_templates.get(id(app))
+    if templates is None or endpoint not in templates:
+        # Built on first use and again when routes were added since
+        templates = {
+            route.endpoint: route.path
+            for route in app.routes
+            if getattr(route, "endpoint", None) is not None
+        }
+        _route_templates[id(app)] = templates
+    return templates.get(endpoint)
+
 
 class RequestLoggingMiddleware(BaseHTTPMiddleware):
     """Middleware for logging API requests and responses."""
@@ -27,9 +67,7 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
         request.state.request_id = request_id
 
         # Get client IP
-        client_ip = request.client.host if request.client else "unknown"
-        if "x-forwarded-for" in request.headers:
-            client_ip = request.headers["x-forwarded-for"].split(",")[0].strip()
+        client_ip = get_client_ip(request)
 
         # Log request start
         logger.info(f"Request {request_id} started: {request.method} {request.url}")
@@ -149,3 +187,156 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
         )
 
         return response
+
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+def negotiate_encoding(accept_encoding: str, brotli_available: bool) -> Optional[str]:
+    """Preferred supported content coding ("br" or "gzip") for a request"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding] = quality
+
+    candidates = [("br", brotli_available), ("gzip", True)]
+    best, best_quality = None, 0.0
+    for coding, available in candidates:
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if available and quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class ResponseEncoder:
+    """Incremental gzip or brotli encoder"""
+
+    def __init__(self, coding: str, gzip_level: int, brotli_quality: int):
+        if coding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._brotli = None
+            # wbits 31: zlib stream with a gzip header and trailer
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + self._brotli.flush() if flush else out
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """Negotiated gzip/brotli compression of API responses.
+
+    Plain ASGI middleware, so streaming responses are compressed chunk by
+    chunk instead of being buffered. Bodies below ``minimum_size``,
+    already encoded responses and non-text content types pass through.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        coding = negotiate_encoding(
+            Headers(scope=scope).get("accept-encoding", ""), brotli is not None
+        )
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Dict] = None
+        encoder: Optional[ResponseEncoder] = None
+        passthrough = False
+
+        async def send_compressed(message: Dict) -> None:
+            nonlocal start_message, encoder, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    "content-encoding" in headers
+                    or message["status"] in (204, 304)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    # Held until the first body chunk shows the size
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                encoder = ResponseEncoder(coding, self.gzip_level, self.brotli_quality)
+                headers["content-encoding"] = coding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    # Length unknown up front: chunked transfer
+                    del headers["content-length"]
+                else:
+                    body = encoder.compress(body) + encoder.finish()
+                    headers["content-length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                await send(start_message)
+                start_message = None
+
+            # Streaming: flush every chunk so clients see data as it is produced
+            chunk = encoder.compress(body, flush=more_body)
+            if not more_body:
+                chunk += encoder.finish()
+            await send(
+                {"type": "http.response.body", "body": chunk, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_compressed)
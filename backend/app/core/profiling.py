@@ -0,0 +1,349 @@
+"""Sampling profiler.
+
+Stacks of the threads serving requests are read with
+``sys._current_frames()`` and counted as collapsed stacks, one
+``frame;frame;...;frame count`` line per distinct stack: the input of
+flamegraph.pl, speedscope and inferno.
+
+- ``SamplingProfiler`` runs all the time (``PROFILER_ENABLED``): every
+  ``PROFILER_INTERVAL_MS`` it counts one sample per busy thread under the
+  route template of the request the thread serves, in windows of
+  ``PROFILER_WINDOW_SECONDS`` of which the last ``PROFILER_WINDOWS`` are kept.
+  Admins read them from ``/api/v1/admin/profiler``.
+- ``ProfilingMiddleware`` profiles a single request when an admin sends an
+  ``X-Profile`` header: its threads are sampled every
+  ``PROFILER_REQUEST_INTERVAL_MS`` and the collapsed stacks replace the
+  response body.
+
+A sample belongs to a request when the thread is running it under
+``ProfilingMiddleware``: on the event loop thread its frame is in the stack,
+on threadpool workers the request is in the context the work item runs in.
+Idle threads belong to no request and are skipped. Every worker process
+profiles only itself.
+"""
+
+import os
+import queue
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter, deque
+from contextvars import Context, ContextVar
+from types import CodeType, FrameType
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from .auth import get_current_admin, get_current_user
+from .config import settings
+from .database import get_db
+from .logging import get_logger
+from .middleware import route_template
+
+logger = get_logger(__name__)
+
+PROFILE_HEADER = "x-profile"
+UNROUTED = "<unrouted>"
+
+# Request scope of the current task, copied into threadpool work items
+_request_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar(
+    "profiled_request", default=None
+)
+
+# A threadpool worker waiting for work still holds its last item's context
+_IDLE_WORKER = queue.Queue.get.__code__
+
+_SITE_PACKAGES = "site-packages" + os.sep
+_STDLIB = sysconfig.get_paths()["stdlib"] + os.sep
+_CWD = os.getcwd() + os.sep
+
+Stack = Tuple[CodeType, ...]
+
+_labels: Dict[CodeType, str] = {}
+
+
+def frame_label(code: CodeType) -> str:
+    """``function (path/to/module.py)``, the name of a flamegraph frame"""
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        if _SITE_PACKAGES in filename:
+            filename = filename.rsplit(_SITE_PACKAGES, 1)[1]
+        elif filename.startswith(_STDLIB):
+            filename = filename[len(_STDLIB) :]
+        elif filename.startswith(_CWD):
+            filename = filename[len(_CWD) :]
+        name = getattr(code, "co_qualname", code.co_name)
+        # ";" separates the frames of a collapsed stack
+        label = f"{name} ({filename})".replace(";", ":")
+        _labels[code] = label
+    return label
+
+
+def collapse(counts: "Counter[Stack]", root: Optional[str] = None) -> List[str]:
+    """Collapsed stack lines, optionally under a common root frame"""
+    prefix = [root] if root else []
+    return [
+        ";".join(prefix + [frame_label(code) for code in stack]) + f" {count}"
+        for stack, count in counts.items()
+    ]
+
+
+def route_of(scope: Dict[str, Any]) -> str:
+    """``METHOD /path/{template}`` of a routed request"""
+    template = route_template(scope)
+    return f"{scope['method']} {template}" if template else UNROUTED
+
+
+def sample_requests(skip: int) -> Iterator[Tuple[Dict[str, Any], Stack]]:
+    """(request scope, stack from the request down) of each busy thread"""
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id == skip:
+            continue
+        scope, stack = _request_of(frame)
+        if scope is not None and stack:
+            stack.reverse()
+            yield scope, tuple(stack)
+
+
+def _request_of(
+    frame: Optional[FrameType],
+) -> Tuple[Optional[Dict[str, Any]], List[CodeType]]:
+    stack: List[CodeType] = []
+    while frame is not None:
+        code = frame.f_code
+        if code in _SCOPE_CODES:  # Event loop thread
+            return frame.f_locals.get("scope"), stack
+        if "context" in code.co_varnames:  # Maybe the frame of a worker thread
+            context = frame.f_locals.get("context")
+            if isinstance(context, Context):
+                if stack and stack[-1] is _IDLE_WORKER:
+                    return None, stack
+                return context.get(_request_scope), stack
+        stack.append(code)
+        frame = frame.f_back
+    return None, stack
+
+
+class SamplingProfiler:
+    """Stacks of the requests served, per route template and time window"""
+
+    def __init__(
+        self, interval: float = 0.01, window_seconds: float = 60, windows: int = 15
+    ):
+        self.interval = interval
+        self.window_seconds = window_seconds
+        # (start, {route: {stack: samples}}), oldest first
+        self._windows: Deque[Tuple[float, Dict[str, Counter]]] = deque(maxlen=windows)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="sampling-profiler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:  # Never stop profiling on one odd stack
+                logger.warning(f"Profiler sample failed: {e}")
+
+    def sample(self, now: Optional[float] = None) -> int:
+        """Count the stacks of the threads serving requests right now"""
+        samples = [
+            (route_of(scope), stack)
+            for scope, stack in sample_requests(threading.get_ident())
+        ]
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self._windows or now - self._windows[-1][0] >= self.window_seconds:
+                self._windows.append((now, {}))
+            routes = self._windows[-1][1]
+            for route, stack in samples:
+                routes.setdefault(route, Counter())[stack] += 1
+        return len(samples)
+
+    def _counts(self, seconds: Optional[float]) -> Dict[str, Counter]:
+        since = time.time() - seconds if seconds else None
+        totals: Dict[str, Counter] = {}
+        with self._lock:
+            for started, routes in self._windows:
+                if since is not None and started + self.window_seconds <= since:
+                    continue
+                for route, counts in routes.items():
+                    totals.setdefault(route, Counter()).update(counts)
+        return totals
+
+    def routes(self, seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Samples per route, busiest first (whole windows within ``seconds``)"""
+        totals = [
+            (route, sum(counts.values()))
+            for route, counts in self._counts(seconds).items()
+        ]
+        totals.sort(key=lambda total: (-total[1], total[0]))
+        return [
+            {
+                "route": route,
+                "samples": samples,
+                "seconds": round(samples * self.interval, 3),
+            }
+            for route, samples in totals
+        ]
+
+    def collapsed(
+        self, route: Optional[str] = None, seconds: Optional[float] = None
+    ) -> str:
+        """Collapsed stacks of one route, or of all under their route"""
+        totals = self._counts(seconds)
+        if route is not None:
+            lines = collapse(totals.get(route, Counter()))
+        else:
+            lines = [
+                line
+                for name, counts in totals.items()
+                for line in collapse(counts, name)
+            ]
+        lines.sort()
+        return "".join(line + "\n" for line in lines)
+
+
+def _authorize(scope: Dict[str, Any]) -> None:
+    """Raise unless the request comes from an admin (in a worker thread)"""
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    credentials = (
+        HTTPAuthorizationCredentials(scheme=scheme, credentials=token.strip())
+        if scheme.lower() == "bearer" and token.strip()
+        else None
+    )
+    # The session the endpoints would get, test overrides included
+    session_factory = scope["app"].dependency_overrides.get(get_db, get_db)
+    sessions = session_factory()
+    db = next(sessions)
+    try:
+        get_current_admin(get_current_user(credentials, db))
+    finally:
+        sessions.close()
+
+
+class ProfilingMiddleware:
+    """Marks the request each task serves, and profiles ``X-Profile`` requests.
+
+    Add it innermost: it must run in the task that runs the endpoint.
+    """
+
+    def __init__(self, app: Any, interval: float = 0.001):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if PROFILE_HEADER in Headers(scope=scope):
+            await self._profile(scope, receive, send)
+            return
+
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
+
+    async def _profile(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        try:
+            await run_in_threadpool(_authorize, scope)
+        except HTTPException as exc:
+            response = JSONResponse(
+                {"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers
+            )
+            await response(scope, receive, send)
+            return
+
+        counts: Counter = Counter()
+        done = threading.Event()
+
+        def sample() -> None:
+            me = threading.get_ident()
+            while not done.wait(self.interval):
+                for sampled, stack in sample_requests(me):
+                    if sampled is scope:
+                        counts[stack] += 1
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def discard(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        sampler = threading.Thread(target=sample, name="request-profiler", daemon=True)
+        token = _request_scope.set(scope)
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            _request_scope.reset(token)
+            done.set()
+            sampler.join()
+
+        duration_ms = (time.perf_counter() - started) * 1000
+        lines = collapse(counts, route_of(scope))
+        lines.sort()
+        body = "".join(line + "\n" for line in lines).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"cache-control", b"no-store"),
+                    (b"x-profile-status", str(status_code).encode()),
+                    (b"x-profile-samples", str(sum(counts.values())).encode()),
+                    (b"x-profile-duration-ms", f"{duration_ms:.1f}".encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+# Frames that hold the scope of the request their task serves
+_SCOPE_CODES = frozenset(
+    {ProfilingMiddleware.__call__.__code__, ProfilingMiddleware._profile.__code__}
+)
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def get_profiler() -> SamplingProfiler:
+    """The worker's sampling profiler (FastAPI dependency)"""
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler(
+            interval=settings.PROFILER_INTERVAL_MS / 1000,
+            window_seconds=settings.PROFILER_WINDOW_SECONDS,
+            windows=settings.PROFILER_WINDOWS,
+        )
+    return _profiler
@@ -0,0 +1,285 @@
+"""Token bucket rate limiting.
+
+``RateLimitMiddleware`` charges every API request to a token bucket: one per
+user for requests with a valid access token, one per client IP otherwise.
+A bucket holds ``RATE_LIMIT_PER_MINUTE`` tokens and refills at that rate
+over a minute, so clients may burst up to the limit and then continue at the
+sustained rate. Expensive routes (searches, facets, login) cost more than one
+token, see ``RATE_LIMIT_ROUTE_COSTS``.
+
+Responses carry the ``RateLimit-Limit``, ``RateLimit-Remaining``,
+``RateLimit-Reset`` and ``RateLimit-Policy`` headers of the IETF
+ratelimit-headers draft; rejected requests get ``429`` with ``Retry-After``.
+
+Buckets live in a ``MemoryBucketStore`` (per worker process) or, with
+``RATE_LIMIT_STORAGE_URL`` set to a Redis URL, in a ``RedisBucketStore``
+shared by all workers.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+from starlette.requests import HTTPConnection
+
+from .auth import verify_token
+from .constants import ERROR_MESSAGES
+from .logging import get_logger
+from .middleware import get_client_ip
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional: only needed for a shared store
+    aioredis = None
+
+logger = get_logger(__name__)
+
+RouteCost = Tuple[str, str, Optional[str], int]
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of charging a bucket"""
+
+    allowed: bool
+    limit: int
+    remaining: int  # Whole tokens left after this request
+    reset: float  # Seconds until the bucket is full again
+    retry_after: float = 0.0  # Seconds until the request would be allowed
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": f"{self.limit};w=60",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+def _charge(
+    tokens: float, elapsed: float, cost: int, capacity: int, rate: float
+) -> Tuple[bool, float, float]:
+    """(allowed, tokens left, retry after) for a bucket last seen elapsed ago"""
+    tokens = min(capacity, tokens + elapsed * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Buckets in process memory, split into independently locked shards.
+
+    Each shard is an LRU of at most ``max_keys`` buckets. Evicting a bucket
+    only forgets tokens a client has already spent, so the limit stays
+    approximate under key floods instead of growing memory without bound.
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 10_000):
+        self._shards: List[OrderedDict] = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self.max_keys = max_keys
+
+    async def take(
+        self, key: str, cost: int, capacity: int, rate: float
+    ) -> RateLimitResult:
+        index = hash(key) % len(self._shards)
+        shard = self._shards[index]
+        now = time.monotonic()
+        with self._locks[index]:
+            tokens, stamp = shard.get(key, (capacity, now))
+            allowed, tokens, retry_after = _charge(
+                tokens, now - stamp, cost, capacity, rate
+            )
+            shard[key] = (tokens, now)
+            shard.move_to_end(key)
+            if len(shard) > self.max_keys:
+                shard.popitem(last=False)
+
+        return RateLimitResult(
+            allowed=allowed,
+            limit=capacity,
+            remaining=int(tokens),
+            reset=(capacity - tokens) / rate,
+            retry_after=retry_after,
+        )
+
+    def clear(self) -> None:
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                shard.clear()
+
+
+# Runs atomically on the Redis server, using its clock so that workers with
+# skewed clocks agree. Numbers are returned as strings: Lua numbers would be
+# truncated to integers.
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = tonumber(state[1]) or capacity
+local stamp = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - stamp) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    allowed = 1
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+class RedisBucketStore:
+    """Buckets in Redis, shared by every worker and host using the URL.
+
+    Requests are allowed when Redis cannot be reached: an outage of the
+    limiter should not take the API down with it.
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        if aioredis is None:
+            raise RuntimeError(
+                "RATE_LIMIT_STORAGE_URL needs the redis package (pip install redis)"
+            )
+        self._client = aioredis.from_url(url)
+        self._script = self._client.register_script(_TOKEN_BUCKET_SCRIPT)
+        self.prefix = prefix
+
+    async def take(
+        self, key: str, cost: int, capacity: int, rate: float
+    ) -> RateLimitResult:
+        try:
+            allowed, tokens, retry_after = await self._script(
+                keys=[self.prefix + key], args=[capacity, rate, cost]
+            )
+        except Exception as exc:
+            logger.warning(f"Rate limit store unavailable: {exc}")
+            return RateLimitResult(
+                allowed=True, limit=capacity, remaining=capacity, reset=0
+            )
+
+        tokens = float(tokens)
+        return RateLimitResult(
+            allowed=bool(allowed),
+            limit=capacity,
+            remaining=int(tokens),
+            reset=(capacity - tokens) / rate,
+            retry_after=float(retry_after),
+        )
+
+
+def create_bucket_store(url: Optional[str] = None, shards: int = 16) -> Any:
+    """Bucket store for a RATE_LIMIT_STORAGE_URL (None or memory:// for local)"""
+    if not url or url.startswith("memory://"):
+        return MemoryBucketStore(shards=shards)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBucketStore(url)
+    raise ValueError(f"Unsupported rate limit storage URL: {url}")
+
+
+def route_cost(
+    method: str, path: str, query_string: bytes, costs: Sequence[RouteCost]
+) -> int:
+    """Tokens charged for a request"""
+    path = path.rstrip("/") or "/"
+    query: Optional[Dict[str, List[str]]] = None
+    for rule_method, rule_path, param, cost in costs:
+        if rule_method != method or rule_path != path:
+            continue
+        if param is not None:
+            if query is None:
+                query = parse_qs(query_string.decode("latin-1"))
+            if not any(value.strip() for value in query.get(param, [])):
+                continue
+        return cost
+    return 1
+
+
+def client_key(connection: HTTPConnection) -> str:
+    """Bucket key: the user for a valid access token, else the client IP"""
+    authorization = connection.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        token_data = verify_token(token.strip())
+        if token_data is not None:
+            return f"user:{token_data.user_id}"
+    return f"ip:{get_client_ip(connection)}"
+
+
+class RateLimitMiddleware:
+    """Enforce per-user and per-IP token buckets on HTTP requests.
+
+    Plain ASGI middleware: rejected requests are answered before any inner
+    middleware or endpoint runs.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        limit_per_minute: int = 60,
+        store: Any = None,
+        costs: Sequence[RouteCost] = (),
+        exempt_paths: Sequence[str] = (),
+    ):
+        self.app = app
+        self.capacity = limit_per_minute
+        self.rate = limit_per_minute / 60
+        self.store = store if store is not None else MemoryBucketStore()
+        self.costs = costs
+        self.exempt_paths = tuple(exempt_paths)
+
+    async def __call__(self, scope: Dict, receive: Callable, send: Callable) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        cost = min(
+            route_cost(scope["method"], path, scope["query_string"], self.costs),
+            self.capacity,
+        )
+        result = await self.store.take(
+            client_key(connection), cost, self.capacity, self.rate
+        )
+
+        if not result.allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"error": ERROR_MESSAGES["RATE_LIMITED"]},
+                headers=result.headers,
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Dict) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    *(
+                        (name.lower().encode(), value.encode())
+                        for name, value in result.headers.items()
+                    ),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
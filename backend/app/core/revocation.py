@@ -0,0 +1,138 @@
+"""In-memory access token revocation list.
+
+Revoked access token IDs (``jti``) are stored in the ``revoked_tokens`` table
+and mirrored in every worker by ``revoked_tokens``, so ``verify_token``
+checks revocation without a database query:
+
+- a Bloom filter answers "not revoked" for almost every token with a few
+  bit lookups and no false negatives
+- an exact ``jti -> expiry`` map confirms the rare hits, so false positives
+  never reject a valid token
+
+Entries are kept until the token itself expires. Revocations made in this
+process apply on commit; those made by other workers arrive with ``sync``,
+at most ``TOKEN_REVOCATION_SYNC_SECONDS`` later.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator
+
+from sqlalchemy.orm import Session
+
+from ..models import RevokedToken
+from .http_cache import as_utc
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationList:
+    """Revoked token IDs until their expiry"""
+
+    def __init__(self, capacity: int = 10_000, error_rate: float = 0.001):
+        self.error_rate = error_rate
+        self._expires: Dict[str, float] = {}  # jti -> expiry (unix time)
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._next_expiry = math.inf
+        self._lock = threading.Lock()
+        self._synced_at = -math.inf
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def add(self, jti: str, expires_at: float) -> None:
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._expires[jti] = expires_at
+            self._next_expiry = min(self._next_expiry, expires_at)
+            if len(self._expires) > self._bloom.capacity:
+                self._rebuild(len(self._expires) * 2)
+            else:
+                self._bloom.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti not in self._bloom:
+            return False
+        expires_at = self._expires.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def purge(self) -> int:
+        """Forget expired entries (a Bloom filter cannot delete, so it is rebuilt)"""
+        now = time.time()
+        if self._next_expiry > now:
+            return 0
+        with self._lock:
+            before = len(self._expires)
+            self._expires = {
+                jti: expires_at
+                for jti, expires_at in self._expires.items()
+                if expires_at > now
+            }
+            self._rebuild(self._bloom.capacity)
+            return before - len(self._expires)
+
+    def _rebuild(self, capacity: int) -> None:
+        bloom = BloomFilter(max(capacity, len(self._expires)), self.error_rate)
+        for jti in self._expires:
+            bloom.add(jti)
+        self._bloom = bloom
+        self._next_expiry = min(self._expires.values(), default=math.inf)
+
+    def sync(self, db: Session, interval: float = 0) -> None:
+        """Load revocations committed by other workers.
+
+        Rows only live until their token expires, so reading every live row
+        stays cheap and cannot miss rows committed out of insert order.
+        """
+        now = time.monotonic()
+        if now - self._synced_at < interval:
+            return
+        self._synced_at = now
+
+        rows = db.query(RevokedToken.jti, RevokedToken.expires_at).filter(
+            RevokedToken.expires_at > datetime.now(timezone.utc)
+        )
+        for jti, expires_at in rows:
+            if jti not in self._expires:
+                self.add(jti, as_utc(expires_at).timestamp())
+        self.purge()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires = {}
+            self._rebuild(self._bloom.capacity)
+            self._synced_at = -math.inf
+
+
+revoked_tokens = RevocationList()
@@ -0,0 +1,339 @@
+"""Static file serving.
+
+``StaticFilesMiddleware`` answers requests under a path prefix before they
+reach the rest of the middleware stack, so image and asset requests skip the
+``BaseHTTPMiddleware`` layers (request logging, error handling, security
+headers) entirely. ``StaticAssets`` serves the files with:
+
+- precompressed ``.br`` / ``.gz`` siblings chosen by ``Accept-Encoding``
+- strong ETags and ``Last-Modified`` with ``304 Not Modified`` revalidation
+- ``Cache-Control: immutable`` for content-addressed media store names
+- single ``Range`` requests (``206``/``416``) and ``If-Range``
+- ``http.response.zerocopysend`` (sendfile) when the server supports it
+
+``precompress_directory`` writes the compressed siblings ahead of time.
+"""
+
+import gzip
+import mimetypes
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip siblings are written without it
+    brotli = None
+
+# Encodings with a precompressed sibling suffix, in order of preference
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+CHUNK_SIZE = 64 * 1024
+
+# Names written by the media store: <sha256 hex>_<size>.webp
+_HASHED_NAME = re.compile(r"^[0-9a-f]{64}_\d+\.webp$")
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single byte range; None if unsupported.
+
+    Raises:
+        ValueError: The range cannot be satisfied
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise ValueError(header)
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        if first or last:
+            raise
+        return None
+
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    accepted = []
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.append(coding.strip().lower())
+    return accepted
+
+
+class StaticAssets:
+    """ASGI app serving files below a directory."""
+
+    def __init__(self, directory: str, max_age: int = 3600):
+        self.directory = os.path.realpath(directory)
+        self.max_age = max_age
+
+    def _resolve(self, path: str) -> Optional[str]:
+        full = os.path.realpath(os.path.join(self.directory, path.lstrip("/")))
+        if os.path.commonpath([full, self.directory]) != self.directory:
+            return None
+        return full
+
+    def _select_variant(
+        self, full: str, headers: Dict[str, str]
+    ) -> Tuple[str, os.stat_result, Optional[str]]:
+        """Best precompressed sibling for the request, or the file itself"""
+        file_stat = os.stat(full)
+        # Ranges address the identity representation only
+        if "range" not in headers:
+            accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+            for encoding, suffix in PRECOMPRESSED:
+                if encoding not in accepted:
+                    continue
+                try:
+                    variant_stat = os.stat(full + suffix)
+                except OSError:
+                    continue
+                # Siblings older than the file are stale until precompressed again
+                if (
+                    stat.S_ISREG(variant_stat.st_mode)
+                    and variant_stat.st_mtime >= file_stat.st_mtime
+                ):
+                    return full + suffix, variant_stat, encoding
+
+        return full, file_stat, None
+
+    def _cache_control(self, path: str) -> str:
+        if _HASHED_NAME.search(os.path.basename(path)):
+            return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        return f"public, max-age={self.max_age}"
+
+    async def __call__(self, scope: Dict, receive: Any, send: Any) -> None:
+        if scope["method"] not in ("GET", "HEAD"):
+            await self._respond(send, 405, [(b"allow", b"GET, HEAD")])
+            return
+
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope["headers"]
+        }
+        full = self._resolve(scope["path"])
+        try:
+            if full is None:
+                raise FileNotFoundError(scope["path"])
+            if not stat.S_ISREG(os.stat(full).st_mode):
+                raise FileNotFoundError(scope["path"])
+            file_path, file_stat, encoding = self._select_variant(full, headers)
+        except OSError:
+            await self._respond(send, 404, body=b"Not Found")
+            return
+
+        etag = f'"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}'
+        etag += f'-{encoding}"' if encoding else '"'
+        last_modified = formatdate(file_stat.st_mtime, usegmt=True)
+        content_type, _ = mimetypes.guess_type(full)
+
+        response_headers = [
+            (b"content-type", (content_type or "application/octet-stream").encode()),
+            (b"etag", etag.encode()),
+            (b"last-modified", last_modified.encode()),
+            (b"cache-control", self._cache_control(full).encode()),
+            (b"accept-ranges", b"bytes"),
+            (b"vary", b"Accept-Encoding"),
+            (b"x-content-type-options", b"nosniff"),
+        ]
+        if encoding:
+            response_headers.append((b"content-encoding", encoding.encode()))
+
+        if self._not_modified(headers, etag, file_stat.st_mtime):
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": response_headers[1:],
+                }
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        size = file_stat.st_size
+        start, end, status = 0, size - 1, 200
+        range_header = headers.get("range")
+        if range_header and self._if_range_matches(headers, etag, last_modified):
+            try:
+                byte_range = _parse_range(range_header, size)
+            except ValueError:
+                response_headers.append((b"content-range", f"bytes */{size}".encode()))
+                await self._respond(send, 416, response_headers)
+                return
+            if byte_range is not None:
+                start, end = byte_range
+                status = 206
+                response_headers.append(
+                    (b"content-range", f"bytes {start}-{end}/{size}".encode())
+                )
+
+        count = end - start + 1 if size else 0
+        response_headers.append((b"content-length", str(count).encode()))
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": response_headers,
+            }
+        )
+        if scope["method"] == "HEAD" or not count:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await self._send_file(scope, send, file_path, start, count)
+
+    @staticmethod
+    def _not_modified(headers: Dict[str, str], etag: str, mtime: float) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+        return False
+
+    @staticmethod
+    def _if_range_matches(headers: Dict[str, str], etag: str, modified: str) -> bool:
+        if_range = headers.get("if-range")
+        return if_range is None or if_range in (etag, modified)
+
+    @staticmethod
+    async def _send_file(
+        scope: Dict, send: Any, path: str, start: int, count: int
+    ) -> None:
+        zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        async with await anyio.open_file(path, "rb") as file:
+            if zerocopy:
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": file.wrapped.fileno(),
+                        "offset": start,
+                        "count": count,
+                    }
+                )
+                return
+
+            await file.seek(start)
+            remaining = count
+            while remaining:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": chunk,
+                        "more_body": remaining > 0,
+                    }
+                )
+            if remaining:
+                # File shrank while sending
+                await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _respond(
+        send: Any, status: int, headers: List = None, body: bytes = b""
+    ) -> None:
+        headers = [
+            *(headers or []),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def _compressible(path: str) -> bool:
+    content_type, encoding = mimetypes.guess_type(path)
+    if not content_type or encoding:
+        return False
+    return content_type.startswith("text/") or content_type in (
+        "application/javascript",
+        "application/json",
+        "application/xml",
+        "image/svg+xml",
+    )
+
+
+def precompress_directory(directory: str, min_size: int = 1024) -> Dict[str, int]:
+    """Write .gz (and .br with the brotli package) next to compressible files.
+
+    Siblings that are up to date, or would not be smaller, are skipped.
+    """
+    report = {"files": 0, "written": 0, "bytes_saved": 0}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if not _compressible(path) or os.path.getsize(path) < min_size:
+                continue
+            report["files"] += 1
+
+            with open(path, "rb") as source:
+                data = source.read()
+            mtime = os.path.getmtime(path)
+            encoders = [(".gz", lambda d: gzip.compress(d, 9, mtime=0))]
+            if brotli is not None:
+                encoders.append((".br", lambda d: brotli.compress(d, quality=11)))
+
+            for suffix, compress in encoders:
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                    continue
+                compressed = compress(data)
+                if len(compressed) >= len(data):
+                    continue
+                with open(target, "wb") as sibling:
+                    sibling.write(compressed)
+                report["written"] += 1
+                report["bytes_saved"] += len(data) - len(compressed)
+
+    return report
+
+
+class StaticFilesMiddleware:
+    """Serve a path prefix from StaticAssets ahead of the middleware stack.
+
+    Add it last so it is the outermost user middleware.
+    """
+
+    def __init__(self, app: Any, prefix: str, directory: str, max_age: int = 3600):
+        self.app = app
+        self.prefix = prefix.rstrip("/")
+        self.assets = StaticAssets(directory, max_age=max_age)
+
+    async def __call__(self, scope: Dict, receive: Any, send: Any) -> None:
+        path = scope.get("path", "")
+        if scope["type"] == "http" and path.startswith(self.prefix + "/"):
+            await self.assets(
+                {**scope, "path": path[len(self.prefix) :]}, receive, send
+            )
+            return
+        await self.app(scope, receive, send)
@@ -0,0 +1,518 @@
+"""Request tracing with OpenTelemetry-compatible spans.
+
+``TracingMiddleware`` opens a server span per request, named after the route
+template. It continues the trace of a W3C ``traceparent`` header and starts
+a new trace for a ``TRACING_SAMPLE_RATE`` share of the other requests.
+Callers' decisions to sample are followed for at most
+``TRACING_MAX_FORCED_PER_SECOND`` requests a second, since any client can
+send the header. Every response names its trace in a ``traceresponse``
+header. Inside a sampled request there are spans for:
+
+- each middleware layer (``install_tracing`` wraps them)
+- JWT decoding (``verify_token``) and the user lookup (``get_current_user``)
+- each SQL statement, from SQLAlchemy engine events
+- response model validation and encoding, and rendering of the body
+
+A background thread batches finished spans into OTLP/JSON
+``ExportTraceServiceRequest`` documents: one line each appended to
+``TRACING_EXPORT_PATH`` (the format of the collector's otlpjsonfile
+receiver), rotated at ``TRACING_EXPORT_MAX_BYTES`` like the log files, or
+POSTed to the OTLP/HTTP endpoint ``TRACING_COLLECTOR_URL``.
+
+Outside a sampled request ``start_span`` is a ContextVar lookup returning a
+shared no-op; with ``TRACING_ENABLED`` off nothing is installed.
+"""
+
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import fastapi.routing
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse
+
+from .config import settings
+from .logging import get_logger
+from .middleware import route_template
+
+logger = get_logger(__name__)
+
+# OTLP span kinds and status code
+INTERNAL, SERVER = 1, 2
+STATUS_ERROR = 2
+
+MAX_STATEMENT_LENGTH = 2000
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits) or 1:0{bits // 4}x}"
+
+
+def parse_traceparent(header: str) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) of a ``traceparent`` header"""
+    match = _TRACEPARENT.match(header.strip())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == "ff" or not int(trace_id, 16) or not int(parent_id, 16):
+        return None
+    # Later versions may append fields; version 00 must end here
+    if version == "00" and len(header.strip()) != 55:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+class Span:
+    """A timed operation of a trace; the current span while entered"""
+
+    __slots__ = (
+        "tracer",
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "sampled",
+        "kind",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        sampled: bool = True,
+        kind: int = INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = attributes if attributes is not None else {}
+        self.start_ns = self.end_ns = 0
+        self.error: Optional[str] = None
+
+    @property
+    def traceparent(self) -> str:
+        """``traceparent`` header value for calls made inside this span"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Optional[BaseException], tb: Any) -> bool:
+        self.end(exc)
+        return False
+
+    def end(self, exc: Optional[BaseException] = None) -> None:
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{type(exc).__name__}: {exc}"
+        if self.sampled:
+            self.tracer.exporter.export(self)
+
+
+class _NoSpan:
+    """Stands in for spans outside sampled requests"""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Any:
+    """Child span of the current one, to use with ``with``.
+
+    ``NO_SPAN`` (entered as None) when the current request is not sampled.
+    """
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        return NO_SPAN
+    return Span(
+        parent.tracer, name, parent.trace_id, parent.span_id, attributes=attributes
+    )
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    encoded = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [
+            _attribute(key, value) for key, value in span.attributes.items()
+        ],
+        "status": {"code": STATUS_ERROR, "message": span.error} if span.error else {},
+    }
+    if span.parent_id:
+        encoded["parentSpanId"] = span.parent_id
+    return encoded
+
+
+def otlp_document(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """OTLP/JSON ``ExportTraceServiceRequest`` holding the spans"""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_attribute("service.name", service_name)]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": __name__},
+                        "spans": [_otlp_span(span) for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """Batches finished spans to a file or collector, off the request path"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        url: Optional[str] = None,
+        service_name: str = "game-marketplace-api",
+        batch_size: int = 512,
+        interval: float = 1.0,
+        queue_size: int = 8192,
+        max_bytes: int = 100 * 1024 * 1024,
+        backups: int = 5,
+    ):
+        self.path = path
+        self.url = url
+        self.service_name = service_name
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:  # Spans are dropped rather than slowing requests
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="span-exporter", daemon=True
+                )
+                self._thread.start()
+
+    def flush(self) -> None:
+        """Wait until the spans exported so far are written"""
+        self._queue.join()
+
+    def shutdown(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.interval)]
+            except queue.Empty:
+                continue
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            spans = [span for span in batch if span is not None]
+            try:
+                if spans:
+                    self.write(spans)
+            except Exception as e:  # Tracing never takes the API down
+                logger.warning(f"Could not export {len(spans)} spans: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def write(self, spans: List[Span]) -> None:
+        document = json.dumps(
+            otlp_document(spans, self.service_name), separators=(",", ":")
+        )
+        if self.url:
+            request = urllib.request.Request(
+                self.url,
+                data=document.encode(),
+                headers={"Content-Type": "application/json"},
+            )
+            urllib.request.urlopen(request, timeout=5).close()
+        else:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._rotate()
+            # One write per line, so workers appending to one file do not mix
+            with open(self.path, "a", encoding="utf-8") as trace_file:
+                trace_file.write(document + "\n")
+
+    def _rotate(self) -> None:
+        """Move a full file to .1 (.1 to .2 and so on), like RotatingFileHandler"""
+        try:
+            if not self.max_bytes or os.path.getsize(self.path) < self.max_bytes:
+                return
+        except FileNotFoundError:
+            return
+        for number in range(self.backups, 0, -1):
+            source = f"{self.path}.{number - 1}" if number > 1 else self.path
+            try:
+                os.replace(source, f"{self.path}.{number}")
+            except FileNotFoundError:  # Not there yet, or another worker rotated
+                pass
+        if not self.backups:
+            os.remove(self.path)
+
+
+class Tracer:
+    """Sampling decisions and the exporter of finished spans"""
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        sample_rate: float = 1.0,
+        max_forced_per_second: float = 10.0,
+    ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        # Token bucket for traces sampled by the caller
+        self.max_forced_per_second = max_forced_per_second
+        self._forced_tokens = max_forced_per_second
+        self._forced_at = time.monotonic()
+
+    def _allow_forced(self) -> bool:
+        now = time.monotonic()
+        self._forced_tokens = min(
+            self.max_forced_per_second,
+            self._forced_tokens + (now - self._forced_at) * self.max_forced_per_second,
+        )
+        self._forced_at = now
+        if self._forced_tokens >= 1:
+            self._forced_tokens -= 1
+            return True
+        return False
+
+    def start_request(self, method: str, traceparent: Optional[str]) -> Span:
+        parent = parse_traceparent(traceparent) if traceparent else None
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+            # The trace id still propagates when over the limit
+            sampled = sampled and self._allow_forced()
+        else:
+            trace_id, parent_id = _new_id(128), None
+            sampled = random.random() < self.sample_rate
+        return Span(self, method, trace_id, parent_id, sampled, SERVER)
+
+
+class TracingMiddleware:
+    """Server span of each request; the parent of all its other spans"""
+
+    def __init__(self, app: Any, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        span = self.tracer.start_request(
+            scope["method"], Headers(scope=scope).get("traceparent")
+        )
+
+        async def send_with_trace(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                # W3C traceresponse: the trace (and whether it was sampled)
+                # the caller can quote when reporting a problem
+                MutableHeaders(scope=message).append("traceresponse", span.traceparent)
+                if span.sampled:
+                    span.attributes["http.response.status_code"] = message["status"]
+                    if message["status"] >= 500:
+                        span.error = f"HTTP {message['status']}"
+            await send(message)
+
+        if not span.sampled:
+            # Still current, so the trace id propagates
+            token = _current_span.set(span)
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                _current_span.reset(token)
+            return
+
+        span.attributes.update(
+            {"http.request.method": scope["method"], "url.path": scope["path"]}
+        )
+
+        with span:
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                template = route_template(scope)
+                if template:
+                    span.name = f"{scope['method']} {template}"
+                    span.attributes["http.route"] = template
+
+
+class TracedMiddleware:
+    """A middleware layer timed as a span of its own"""
+
+    def __init__(self, app: Any, middleware_class: type, **options: Any):
+        self.app = middleware_class(app=app, **options)
+        self.name = f"middleware {middleware_class.__name__}"
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        with start_span(self.name):
+            await self.app(scope, receive, send)
+
+
+def _start_query_span(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    span = start_span(
+        f"SQL {statement.lstrip().split(None, 1)[0].upper()}",
+        {
+            "db.system": conn.dialect.name,
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+        },
+    )
+    if span is not NO_SPAN:
+        span.__enter__()
+        context._trace_span = span
+
+
+def _end_query_span(
+    conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, many: bool
+) -> None:
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        context._trace_span = None
+        span.end()
+
+
+def _fail_query_span(exception_context: Any) -> None:
+    context = exception_context.execution_context
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        context._trace_span = None
+        span.end(exception_context.original_exception)
+
+
+_serialize_response = fastapi.routing.serialize_response
+_render_json = JSONResponse.render
+
+
+async def _traced_serialize_response(**kwargs: Any) -> Any:
+    with start_span("response.validate"):
+        return await _serialize_response(**kwargs)
+
+
+def _traced_render_json(self: JSONResponse, content: Any) -> bytes:
+    with start_span("response.render"):
+        return _render_json(self, content)
+
+
+_instrumented = False
+
+
+def _instrument_libraries() -> None:
+    """SQL statements and FastAPI response handling (process-wide, once)"""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    event.listen(Engine, "before_cursor_execute", _start_query_span)
+    event.listen(Engine, "after_cursor_execute", _end_query_span)
+    event.listen(Engine, "handle_error", _fail_query_span)
+    # FastAPI has no hooks around these; called through the module at runtime
+    fastapi.routing.serialize_response = _traced_serialize_response
+    JSONResponse.render = _traced_render_json
+
+
+def install_tracing(app: Any, tracer: Tracer) -> None:
+    """Trace the app's requests through the middleware added so far"""
+    app.user_middleware[:] = [
+        Middleware(TracedMiddleware, middleware_class=layer.cls, **layer.options)
+        for layer in app.user_middleware
+    ]
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+    _instrument_libraries()
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """The worker's tracer"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(
+            SpanExporter(
+                path=settings.TRACING_EXPORT_PATH,
+                url=settings.TRACING_COLLECTOR_URL,
+                service_name=settings.TRACING_SERVICE_NAME,
+                max_bytes=settings.TRACING_EXPORT_MAX_BYTES,
+                backups=settings.TRACING_EXPORT_BACKUPS,
+            ),
+            sample_rate=settings.TRACING_SAMPLE_RATE,
+            max_forced_per_second=settings.TRACING_MAX_FORCED_PER_SECOND,
+        )
+    return _tracer
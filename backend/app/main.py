@@ -4,19 +4,35 @@ import os
 from typing import Dict, List
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from .api import auth, users, games, lots, orders
+from .api import admin, auth, users, games, lots, messages, orders
 from .core.config import settings
-from .core.constants import API_V1_PREFIX, STATIC_DIRS, HEALTH_STATUS
+from .core.constants import (
+    API_V1_PREFIX,
+    HEALTH_STATUS,
+    RATE_LIMIT_EXEMPT_PATHS,
+    RATE_LIMIT_ROUTE_COSTS,
+    STATIC_DIRS,
+)
 from .core.database import engine, Base
+from .core.jwt_keys import get_key_ring
+from .core.static_files import StaticFilesMiddleware
 from .core.logging import setup_logging, get_logger
+from .core.profiling import ProfilingMiddleware, get_profiler
+from .core.tracing import get_tracer, install_tracing
 from .core.middleware import (
+    CompressionMiddleware,
     RequestLoggingMiddleware,
     ErrorHandlingMiddleware,
     SecurityHeadersMiddleware,
 )
+from .core.rate_limit import RateLimitMiddleware, create_bucket_store
+from .services import lot_counters  # noqa: F401  (registers session listeners)
+from .services.chat import shutdown_chat_hub
+from .services.order_events import get_order_events
+from .services.uploads import shutdown_image_executor
 
 # Initialize logging
 setup_logging()
@@ -36,11 +52,28 @@ app = FastAPI(
     redoc_url=getattr(settings, "REDOC_URL", "/redoc"),
 )
 
+# Innermost, so it runs in the task that runs the endpoint
+app.add_middleware(
+    ProfilingMiddleware, interval=settings.PROFILER_REQUEST_INTERVAL_MS / 1000
+)
+
 # Add custom middleware
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(ErrorHandlingMiddleware)
 app.add_middleware(RequestLoggingMiddleware)
 
+# Inside CORS, so preflights are not charged and 429s carry CORS headers
+if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_PER_MINUTE > 0:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limit_per_minute=settings.RATE_LIMIT_PER_MINUTE,
+        store=create_bucket_store(
+            settings.RATE_LIMIT_STORAGE_URL, shards=settings.RATE_LIMIT_SHARDS
+        ),
+        costs=RATE_LIMIT_ROUTE_COSTS,
+        exempt_paths=RATE_LIMIT_EXEMPT_PATHS,
+    )
+
 # CORS middleware
 allowed_origins: List[str] = getattr(settings, "CORS_ORIGINS", ["*"])
 # Настройка CORS для production и development
@@ -56,6 +89,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresses the final response bytes, so it wraps the middleware above
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+# Spans for every layer above; static files below stay untraced
+if settings.TRACING_ENABLED:
+    install_tracing(app, get_tracer())
+
 # Static directory setup
 static_dir = getattr(settings, "UPLOAD_DIR", "static")
 os.makedirs(static_dir, exist_ok=True)
@@ -64,8 +109,57 @@ os.makedirs(static_dir, exist_ok=True)
 for subdir in STATIC_DIRS.values():
     os.makedirs(os.path.join(static_dir, subdir), exist_ok=True)
 
-# Mount static files
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+# Static files are served ahead of every middleware above (added last, so
+# outermost)
+app.add_middleware(
+    StaticFilesMiddleware,
+    prefix="/static",
+    directory=static_dir,
+    max_age=getattr(settings, "STATIC_MAX_AGE", 3600),
+)
+
+
+@app.on_event("shutdown")
+def stop_image_workers() -> None:
+    """Stop the thumbnail process pool"""
+    shutdown_image_executor()
+
+
+@app.on_event("shutdown")
+async def stop_chat_hub() -> None:
+    """Stop the chat message writer and pub/sub subscription"""
+    await shutdown_chat_hub()
+
+
+@app.on_event("startup")
+async def start_order_events() -> None:
+    """Start numbering and buffering order events for SSE streams"""
+    await get_order_events().start()
+
+
+@app.on_event("shutdown")
+async def stop_order_events() -> None:
+    """End open order event streams"""
+    await get_order_events().stop()
+
+
+@app.on_event("startup")
+def start_profiler() -> None:
+    """Sample the stacks of request threads in the background"""
+    if settings.PROFILER_ENABLED:
+        get_profiler().start()
+
+
+@app.on_event("shutdown")
+def stop_profiler() -> None:
+    get_profiler().stop()
+
+
+@app.on_event("shutdown")
+def stop_tracing() -> None:
+    """Write the spans still queued"""
+    if settings.TRACING_ENABLED:
+        get_tracer().exporter.shutdown()
 
 
 @app.get("/")
@@ -85,20 +179,26 @@ async def health_check() -> Dict[str, str]:
     return {"status": HEALTH_STATUS}
 
 
+@app.get("/.well-known/jwks.json")
+async def jwks() -> JSONResponse:
+    """Public keys that verify access tokens (RS256/EdDSA deployments)"""
+    return JSONResponse(
+        get_key_ring().jwks(), headers={"Cache-Control": "public, max-age=300"}
+    )
+
+
 # Include API routers
 app.include_router(auth.router, prefix=API_V1_PREFIX)
 app.include_router(users.router, prefix=API_V1_PREFIX)
 app.include_router(games.router, prefix=API_V1_PREFIX)
 app.include_router(lots.router, prefix=API_V1_PREFIX)
 app.include_router(orders.router, prefix=API_V1_PREFIX)
+app.include_router(messages.router, prefix=API_V1_PREFIX)
+app.include_router(admin.router, prefix=API_V1_PREFIX)
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(
-        "backend/app/main.py",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-    )
+    # Development server with reload; production runs serve.py
+    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
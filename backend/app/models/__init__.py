@@ -11,9 +11,12 @@ from sqlalchemy import (
     DateTime,
     Numeric,
     ForeignKey,
+    Index,
     JSON,
     Enum as SQLEnum,
+    false,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from enum import Enum as PyEnum
@@ -72,9 +75,11 @@ class User(Base):
 
     # Stats
     rating = Column(Numeric(3, 2), default=0.0)
+    rating_sum = Column(Integer, default=0)  # Running sum of visible review ratings
     total_reviews = Column(Integer, default=0)
     total_sales = Column(Integer, default=0)
     total_purchases = Column(Integer, default=0)
+    unread_messages = Column(Integer, default=0)  # services/unread_counters.py
 
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -146,6 +151,8 @@ class Category(Base):
     slug = Column(String(100), index=True)
     description = Column(Text)
     icon = Column(String(50))  # Icon class or emoji
+    # Filterable item_details attributes of lots, e.g. {"level": "integer"}
+    attribute_schema = Column(JSON)
 
     # Foreign keys
     game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
@@ -166,6 +173,23 @@ class Category(Base):
     lots = relationship("Lot", back_populates="category")
 
 
+class CategoryClosure(Base):
+    """Closure table of the category hierarchy (every ancestor/descendant pair)"""
+
+    __tablename__ = "category_closure"
+
+    ancestor_id = Column(
+        Integer, ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True
+    )
+    descendant_id = Column(
+        Integer,
+        ForeignKey("categories.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+    depth = Column(Integer, nullable=False, default=0)  # 0 = the category itself
+
+
 class Lot(Base):
     """Lot model (item for sale)"""
 
@@ -179,10 +203,14 @@ class Lot(Base):
     # Foreign keys
     seller_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    category_id = Column(
+        Integer, ForeignKey("categories.id"), nullable=False, index=True
+    )
 
     # Item details
-    item_details = Column(JSON)  # Flexible field for game-specific data
+    item_details = Column(
+        JSON().with_variant(JSONB(), "postgresql")
+    )  # Flexible field for game-specific data
     images = Column(JSON)  # List of image URLs
 
     # Lot settings
@@ -205,6 +233,21 @@ class Lot(Base):
     category = relationship("Category", back_populates="lots")
     orders = relationship("Order", back_populates="lot")
 
+    __table_args__ = (
+        # Catalog pages: active lots of a game or seller, newest or cheapest first
+        Index("ix_lots_status_created_at", status, created_at),
+        Index("ix_lots_game_id_status_created_at", game_id, status, created_at),
+        Index("ix_lots_game_id_status_price", game_id, status, price),
+        Index("ix_lots_seller_id_status_created_at", seller_id, status, created_at),
+        # Serves item_details @> containment filters (services/attribute_filters.py)
+        Index(
+            "ix_lots_item_details",
+            item_details,
+            postgresql_using="gin",
+            postgresql_ops={"item_details": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class Order(Base):
     """Order model"""
@@ -243,6 +286,12 @@ class Order(Base):
     messages = relationship("Message", back_populates="order")
     review = relationship("Review", back_populates="order", uselist=False)
 
+    __table_args__ = (
+        # Order lists of a buyer or seller, newest first
+        Index("ix_orders_buyer_id_created_at", buyer_id, created_at),
+        Index("ix_orders_seller_id_created_at", seller_id, created_at),
+    )
+
 
 class Message(Base):
     """Message model for chat"""
@@ -276,6 +325,20 @@ class Message(Base):
     )
     order = relationship("Order", back_populates="messages")
 
+    __table_args__ = (
+        # Inbox and conversation pages of either party, newest first
+        Index("ix_messages_sender_id_id", sender_id, id),
+        Index("ix_messages_receiver_id_id", receiver_id, id),
+        # Unread messages only: stays small however long the history gets
+        Index(
+            "ix_messages_unread",
+            receiver_id,
+            created_at,
+            postgresql_where=is_read == false(),
+            sqlite_where=is_read == false(),
+        ),
+    )
+
 
 class Review(Base):
     """Review model"""
@@ -291,7 +354,7 @@ class Review(Base):
         Integer, ForeignKey("users.id"), nullable=False
     )  # Who left review
     reviewed_id = Column(
-        Integer, ForeignKey("users.id"), nullable=False
+        Integer, ForeignKey("users.id"), nullable=False, index=True
     )  # Who was reviewed
     order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
 
@@ -309,3 +372,60 @@ class Review(Base):
         "User", foreign_keys=[reviewed_id], back_populates="reviews_received"
     )
     order = relationship("Order", back_populates="review")
+
+
+class MediaBlob(Base):
+    """Content-addressed uploaded image, shared by every lot/user using it"""
+
+    __tablename__ = "media_blobs"
+
+    # Thumbnails differ per kind, so the same bytes may be stored once per kind
+    kind = Column(String(20), primary_key=True)  # STATIC_DIRS key
+    digest = Column(String(64), primary_key=True)  # sha256 of the uploaded bytes
+    size = Column(Integer, nullable=False)  # Bytes uploaded
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    # Refreshed on every upload of the same content; garbage collection only
+    # removes unreferenced blobs older than its grace period
+    uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (Index("ix_media_blobs_gc", ref_count, uploaded_at),)
+
+
+class TableVersion(Base):
+    """Change counter of a table, bumped once per committing transaction"""
+
+    __tablename__ = "table_versions"
+
+    name = Column(String(50), primary_key=True)  # Table name
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class RefreshToken(Base):
+    """Issued refresh token; each refresh rotates it within its family"""
+
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    # Every token rotated from one login shares the family of its first token
+    family_id = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Access token issued together with this refresh token
+    access_jti = Column(String(32), nullable=False)
+    access_expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    used_at = Column(DateTime(timezone=True))  # Rotated: presenting it again is reuse
+    revoked_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (Index("ix_refresh_tokens_expires_at", expires_at),)
+
+
+class RevokedToken(Base):
+    """Access token revoked before it expires, mirrored in every worker's memory"""
+
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
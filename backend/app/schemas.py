@@ -208,12 +208,15 @@ class CategoryCreate(CategoryBase):
     game_id: int
     parent_id: Optional[int] = None
     slug: str
+    attribute_schema: Optional[Dict[str, str]] = None
 
 
 class CategoryUpdate(BaseSchema):
     name: Optional[str] = None
     description: Optional[str] = None
     icon: Optional[str] = None
+    parent_id: Optional[int] = None
+    attribute_schema: Optional[Dict[str, str]] = None
     is_active: Optional[bool] = None
     sort_order: Optional[int] = None
 
@@ -223,6 +226,7 @@ class Category(CategoryBase):
     slug: str
     game_id: int
     parent_id: Optional[int] = None
+    attribute_schema: Optional[Dict[str, str]] = None
     total_lots: int
     is_active: bool
     sort_order: int
@@ -238,6 +242,12 @@ class CategoryResponse(Category):
     pass
 
 
+class CategoryTree(Category):
+    """Category with its nested subcategories"""
+
+    children: List["CategoryTree"] = []
+
+
 # Lot schemas
 class LotBase(BaseSchema):
     title: str
@@ -305,6 +315,22 @@ class LotList(BaseSchema):
     category_name: Optional[str] = None
 
 
+class FacetBucket(BaseSchema):
+    """Number of matching lots for one facet value"""
+
+    value: Any
+    count: int
+    min: Optional[int] = None  # Price buckets only
+    max: Optional[int] = None
+
+
+class LotFacets(BaseSchema):
+    """Facet counts for a lot search"""
+
+    total: int
+    facets: Dict[str, List[FacetBucket]]
+
+
 # Order schemas
 class OrderBase(BaseSchema):
     buyer_message: Optional[str] = None
@@ -446,6 +472,26 @@ class LotResponse(Lot):
     class Config:
         from_attributes = True
 
+
+class LotBatchRequest(BaseSchema):
+    """Lot IDs to fetch in one request"""
+
+    ids: List[int]
+
+
+class LotBatchItem(BaseSchema):
+    """One requested lot; ``lot`` is null when it is missing or hidden"""
+
+    id: int
+    found: bool
+    lot: Optional[LotResponse] = None
+
+
+class LotBatchResponse(BaseSchema):
+    """Requested lots in request order"""
+
+    items: List[LotBatchItem]
+
 class OrderResponse(Order):
     """Schema for order response"""  
     class Config:
@@ -460,3 +506,37 @@ class MessageResponse(Message):
     """Schema for message response"""
     class Config:
         from_attributes = True
+
+
+class UnreadCount(BaseSchema):
+    """Unread messages of the current user"""
+
+    unread: int
+
+
+class MarkReadRequest(BaseSchema):
+    """Messages to mark read; all unread messages when both are omitted"""
+
+    sender_id: Optional[int] = Field(None, description="Only this conversation")
+    up_to_id: Optional[int] = Field(None, description="Only messages up to this id")
+
+
+class MarkReadResponse(BaseSchema):
+    marked_read: int
+    unread: int
+
+
+class InboxEntry(BaseSchema):
+    """Latest message of a conversation"""
+
+    user: UserPublic
+    last_message: MessageResponse
+    unread: int
+
+
+class ProfiledRoute(BaseSchema):
+    """Profiler samples of one route template"""
+
+    route: str = Field(..., description='e.g. "GET /api/v1/lots/{lot_id}"')
+    samples: int
+    seconds: float = Field(..., description="Thread time the samples represent")
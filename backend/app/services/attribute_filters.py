@@ -0,0 +1,176 @@
+"""
+Typed filters on lot item_details
+
+Filters are passed to ``get_lots`` as repeated ``attr`` query parameters of
+the form ``name:op:value``::
+
+    attr=server:eq:EU-West
+    attr=level:gte:60
+    attr=rank:in:gold,platinum
+
+Attribute names and types come from the category's ``attribute_schema``
+(merged with its ancestors'). On PostgreSQL equality and ``in`` compile to
+JSONB containment (``item_details @> '{"server": "EU-West"}'``), which the GIN
+``jsonb_path_ops`` index on ``lots.item_details`` serves; ranges compile to
+``(item_details ->> 'level')::float`` comparisons, guarded by
+``jsonb_typeof`` since item_details is not checked against the schema. Other
+databases use their JSON path functions.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, func, or_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from ..core.validators import ValidationError
+from ..models import Category, CategoryClosure, Lot
+
+ATTRIBUTE_TYPES = ("string", "integer", "number", "boolean")
+OPERATORS = ("eq", "in", "gt", "gte", "lt", "lte")
+RANGE_OPERATORS = {
+    "gt": "__gt__",
+    "gte": "__ge__",
+    "lt": "__lt__",
+    "lte": "__le__",
+}
+
+MAX_FILTERS = 10
+MAX_IN_VALUES = 50
+
+
+@dataclass
+class AttributeFilter:
+    """Parsed and type-checked item_details filter"""
+
+    name: str
+    type: str
+    op: str
+    values: List[Any]
+
+
+def validate_attribute_schema(schema: Optional[Dict[str, Any]]) -> None:
+    """Check a category attribute schema ({name: type})"""
+    for name, attr_type in (schema or {}).items():
+        if not name or not name.replace("_", "").isalnum():
+            raise ValidationError("attribute_schema", f"Invalid attribute '{name}'")
+        if attr_type not in ATTRIBUTE_TYPES:
+            raise ValidationError(
+                "attribute_schema",
+                f"Attribute '{name}' type must be one of: {', '.join(ATTRIBUTE_TYPES)}",
+            )
+
+
+def get_category_schema(db: Session, category_id: int) -> Dict[str, str]:
+    """Attribute schema of a category merged with its ancestors' schemas"""
+    rows = (
+        db.query(Category.attribute_schema)
+        .join(CategoryClosure, CategoryClosure.ancestor_id == Category.id)
+        .filter(CategoryClosure.descendant_id == category_id)
+        .order_by(CategoryClosure.depth.desc())
+        .all()
+    )
+
+    schema: Dict[str, str] = {}
+    for (attribute_schema,) in rows:
+        # Nearer categories override their ancestors
+        schema.update(attribute_schema or {})
+    return schema
+
+
+def _coerce(name: str, attr_type: str, raw: str) -> Any:
+    try:
+        if attr_type == "integer":
+            return int(raw)
+        if attr_type == "number":
+            return float(raw)
+        if attr_type == "boolean":
+            if raw.lower() not in ("true", "false"):
+                raise ValueError(raw)
+            return raw.lower() == "true"
+    except ValueError:
+        raise ValidationError("attr", f"Attribute '{name}' expects {attr_type}")
+    return raw
+
+
+def parse_attribute_filters(
+    raw_filters: List[str], schema: Dict[str, str]
+) -> List[AttributeFilter]:
+    """Parse ``name:op:value`` expressions against an attribute schema"""
+    if len(raw_filters) > MAX_FILTERS:
+        raise ValidationError("attr", f"At most {MAX_FILTERS} attribute filters")
+
+    filters = []
+    for raw in raw_filters:
+        parts = raw.split(":", 2)
+        if len(parts) != 3:
+            raise ValidationError("attr", f"Expected name:op:value, got '{raw}'")
+        name, op, value = parts
+
+        if name not in schema:
+            raise ValidationError("attr", f"Unknown attribute '{name}'")
+        if op not in OPERATORS:
+            raise ValidationError(
+                "attr", f"Operator must be one of: {', '.join(OPERATORS)}"
+            )
+
+        attr_type = schema[name]
+        if op in RANGE_OPERATORS and attr_type not in ("integer", "number"):
+            raise ValidationError("attr", f"Attribute '{name}' does not support {op}")
+
+        raw_values = value.split(",") if op == "in" else [value]
+        if len(raw_values) > MAX_IN_VALUES:
+            raise ValidationError("attr", f"At most {MAX_IN_VALUES} values for in")
+
+        filters.append(
+            AttributeFilter(
+                name=name,
+                type=attr_type,
+                op=op,
+                values=[_coerce(name, attr_type, v) for v in raw_values],
+            )
+        )
+
+    return filters
+
+
+def _path(attribute: AttributeFilter):
+    element = Lot.item_details[attribute.name]
+    if attribute.type == "integer":
+        return element.as_integer()
+    if attribute.type == "number":
+        return element.as_float()
+    if attribute.type == "boolean":
+        return element.as_boolean()
+    return element.as_string()
+
+
+def compile_attribute_filters(
+    filters: List[AttributeFilter], dialect_name: str
+) -> List[Any]:
+    """SQL criteria for parsed filters on the given database dialect"""
+    criteria = []
+
+    for attribute in filters:
+        if attribute.op in RANGE_OPERATORS:
+            # Ranges compare as floats even for integer attributes: a stored
+            # 2.5 is still a JSON number but would fail an INTEGER cast
+            value = Lot.item_details[attribute.name].as_float()
+            if dialect_name == "postgresql":
+                # Cast only JSON numbers: a string value would fail the query
+                element = type_coerce(Lot.item_details, JSONB)[attribute.name]
+                value = case((func.jsonb_typeof(element) == "number", value))
+            compare = getattr(value, RANGE_OPERATORS[attribute.op])
+            criteria.append(compare(attribute.values[0]))
+        elif dialect_name == "postgresql":
+            document = type_coerce(Lot.item_details, JSONB)
+            criteria.append(
+                or_(*[document.contains({attribute.name: v}) for v in attribute.values])
+            )
+        elif attribute.op == "in":
+            criteria.append(_path(attribute).in_(attribute.values))
+        else:
+            criteria.append(_path(attribute) == attribute.values[0])
+
+    return criteria
@@ -0,0 +1,161 @@
+"""
+Category hierarchy closure table
+
+``category_closure`` stores one row per (ancestor, descendant) pair,
+including each category paired with itself at depth 0, so "a category and all
+its descendants" is a single indexed lookup on ``ancestor_id``. The category
+mutators in ``api/games.py`` keep it in sync with ``Category.parent_id``.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, delete, insert, literal, select, true
+from sqlalchemy.orm import Session, aliased
+
+from ..models import Category, CategoryClosure
+
+
+def subtree_ids(category_id: int):
+    """Subquery selecting a category id and the ids of all its descendants"""
+    return select(CategoryClosure.descendant_id).where(
+        CategoryClosure.ancestor_id == category_id
+    )
+
+
+def is_in_subtree(db: Session, root_id: int, category_id: int) -> bool:
+    """Whether category_id is root_id or one of its descendants"""
+    return (
+        db.query(CategoryClosure)
+        .filter(
+            CategoryClosure.ancestor_id == root_id,
+            CategoryClosure.descendant_id == category_id,
+        )
+        .first()
+        is not None
+    )
+
+
+def add_category_node(db: Session, category: Category) -> None:
+    """Insert closure rows for a new (flushed) leaf category"""
+    db.execute(
+        insert(CategoryClosure).values(
+            ancestor_id=category.id, descendant_id=category.id, depth=0
+        )
+    )
+    if category.parent_id is not None:
+        db.execute(
+            insert(CategoryClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(
+                    CategoryClosure.ancestor_id,
+                    literal(category.id),
+                    CategoryClosure.depth + 1,
+                ).where(CategoryClosure.descendant_id == category.parent_id),
+            )
+        )
+
+
+def move_category_node(
+    db: Session, category_id: int, new_parent_id: Optional[int]
+) -> None:
+    """Re-attach a category subtree under a new parent (or make it a root)"""
+    subtree = subtree_ids(category_id)
+
+    # Drop paths from the old ancestors into the subtree, keep internal ones
+    db.execute(
+        delete(CategoryClosure)
+        .where(
+            CategoryClosure.descendant_id.in_(subtree),
+            CategoryClosure.ancestor_id.notin_(subtree),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    if new_parent_id is None:
+        return
+
+    # Connect every ancestor of the new parent with every subtree node
+    above = aliased(CategoryClosure)
+    below = aliased(CategoryClosure)
+    db.execute(
+        insert(CategoryClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(
+                above.ancestor_id,
+                below.descendant_id,
+                above.depth + below.depth + 1,
+            )
+            .join_from(above, below, true())  # Every pair, on purpose
+            .where(
+                and_(
+                    above.descendant_id == new_parent_id,
+                    below.ancestor_id == category_id,
+                )
+            ),
+        )
+    )
+
+
+def remove_category_node(db: Session, category_id: int) -> None:
+    """Delete closure rows of a leaf category"""
+    db.execute(
+        delete(CategoryClosure)
+        .where(CategoryClosure.descendant_id == category_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebuild_closure(db: Session) -> int:
+    """Rebuild the closure table from parent_id links.
+
+    Returns:
+        Number of closure rows written
+    """
+    parents = dict(db.query(Category.id, Category.parent_id).all())
+    rows = []
+
+    for category_id in parents:
+        ancestor_id: Optional[int] = category_id
+        depth = 0
+        # Guard against cycles in hand-edited data
+        while ancestor_id is not None and depth <= len(parents):
+            rows.append(
+                {
+                    "ancestor_id": ancestor_id,
+                    "descendant_id": category_id,
+                    "depth": depth,
+                }
+            )
+            ancestor_id = parents.get(ancestor_id)
+            depth += 1
+
+    db.execute(delete(CategoryClosure))
+    if rows:
+        db.execute(insert(CategoryClosure), rows)
+    db.commit()
+
+    return len(rows)
+
+
+def build_tree(categories: List[Category], serialize: Any) -> List[Dict[str, Any]]:
+    """Nest an already loaded list of categories by parent_id.
+
+    Args:
+        categories: Categories in the desired sibling order
+        serialize: Callable converting a category to a dict
+
+    Returns:
+        Root nodes, each with a ``children`` list
+    """
+    nodes = {
+        category.id: {**serialize(category), "children": []} for category in categories
+    }
+    roots = []
+
+    for category in categories:
+        parent = nodes.get(category.parent_id)
+        # Orphans (parent filtered out or missing) are shown as roots
+        siblings = parent["children"] if parent else roots
+        siblings.append(nodes[category.id])
+
+    return roots
@@ -0,0 +1,442 @@
+"""
+Realtime chat over WebSockets
+
+``ChatHub`` keeps the chat sockets connected to this worker, keyed by user.
+Incoming messages are validated and saved by ``MessageWriter`` in batches
+(one INSERT for everything that arrived within ``CHAT_WRITE_INTERVAL_MS``),
+then published through a pub/sub backend. Every worker's hub receives the
+published batch and pushes each message to the local sockets of its sender
+and receiver, serialized once per message however many sockets get it.
+
+- ``LocalPubSub`` delivers in process (single worker)
+- ``RedisPubSub`` fans batches out to every worker (``CHAT_PUBSUB_URL``)
+
+Backpressure: a socket has a bounded send queue of ``CHAT_SEND_QUEUE_SIZE``
+messages. A client that falls that far behind is disconnected (close code
+1013) instead of buffering without bound; it reconnects and reloads the
+conversation over HTTP. Senders are slowed down when the write queue is
+full: their socket is not read until the writer catches up.
+"""
+
+import asyncio
+import json
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocket, WebSocketState
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.logging import get_logger
+from ..models import Message, Order, User
+from .unread_counters import record_unread
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional: only needed for multi-worker fan-out
+    aioredis = None
+
+logger = get_logger(__name__)
+
+# WebSocket close code for clients that cannot keep up
+CLOSE_TRY_AGAIN_LATER = 1013
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def serialize_message(row: Any) -> Dict[str, Any]:
+    """JSON form of a saved message, as MessageResponse renders it"""
+    return {
+        "id": row.id,
+        "sender_id": row.sender_id,
+        "receiver_id": row.receiver_id,
+        "order_id": row.order_id,
+        "content": row.content,
+        "is_read": False,
+        "is_system": False,
+        "attachments": None,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+class ChatConnection:
+    """One socket with its bounded send queue"""
+
+    def __init__(self, websocket: WebSocket, user_id: int, queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._sender: Optional[asyncio.Task] = None
+        self.dropped = False
+
+    def start(self) -> None:
+        self._sender = asyncio.create_task(self._send_loop())
+
+    def push(self, text: str) -> bool:
+        """Queue a frame; False (and the socket is closed) when the queue is full"""
+        if self.dropped:
+            return False
+        try:
+            self._queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            self.dropped = True
+            logger.info(f"Dropping slow chat client of user {self.user_id}")
+            self.stop()
+            asyncio.create_task(self._close(CLOSE_TRY_AGAIN_LATER))
+            return False
+
+    def stop(self) -> None:
+        if self._sender is not None:
+            self._sender.cancel()
+            self._sender = None
+
+    async def _send_loop(self) -> None:
+        try:
+            while True:
+                text = await self._queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # Peer went away mid-send
+            logger.debug(f"Chat send to user {self.user_id} failed: {exc}")
+
+    async def _close(self, code: int) -> None:
+        try:
+            if self.websocket.application_state == WebSocketState.CONNECTED:
+                await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+@dataclass
+class PendingMessage:
+    """Message received from a socket, waiting to be saved"""
+
+    connection: ChatConnection
+    receiver_id: int
+    content: str
+    order_id: Optional[int] = None
+    client_id: Optional[str] = None  # Echoed back so clients can match acks
+
+
+class MessageWriter:
+    """Saves queued messages in batches from a background task"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = 200,
+        interval: float = 0.02,
+        queue_size: int = 10_000,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def submit(self, message: PendingMessage) -> None:
+        """Queue a message, waiting while the queue is full (backpressure)"""
+        await self._queue.put(message)
+
+    async def run(
+        self, on_saved: Callable[[List[Tuple[PendingMessage, Any]]], Awaitable[None]]
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                saved, rejected = await run_in_threadpool(self.save, batch)
+            except Exception as exc:
+                logger.error(f"Saving {len(batch)} chat messages failed: {exc}")
+                saved = []
+                rejected = [(item, "Message could not be saved") for item in batch]
+
+            for item, reason in rejected:
+                item.connection.push(
+                    json.dumps(
+                        {"type": "error", "client_id": item.client_id, "detail": reason}
+                    )
+                )
+            if saved:
+                try:
+                    await on_saved(saved)
+                except Exception as exc:
+                    logger.error(f"Publishing {len(saved)} chat messages failed: {exc}")
+
+    def save(
+        self, batch: List[PendingMessage]
+    ) -> Tuple[List[Tuple[PendingMessage, Any]], List[Tuple[PendingMessage, str]]]:
+        """Validate and insert a batch; (saved with rows, rejected with reasons)"""
+        with self.session_factory() as db:
+            receiver_ids = {item.receiver_id for item in batch}
+            active_users = {
+                user_id
+                for (user_id,) in db.query(User.id).filter(
+                    User.id.in_(receiver_ids), User.is_active.is_(True)
+                )
+            }
+            order_ids = {item.order_id for item in batch if item.order_id}
+            order_parties = {
+                order_id: {buyer_id, seller_id}
+                for order_id, buyer_id, seller_id in db.query(
+                    Order.id, Order.buyer_id, Order.seller_id
+                ).filter(Order.id.in_(order_ids))
+            }
+
+            valid, rejected = [], []
+            for item in batch:
+                sender_id = item.connection.user_id
+                if item.receiver_id not in active_users:
+                    rejected.append((item, "Receiver not found"))
+                elif item.order_id and order_parties.get(item.order_id) != {
+                    sender_id,
+                    item.receiver_id,
+                }:
+                    rejected.append((item, "Not a party of this order"))
+                else:
+                    valid.append(item)
+            if not valid:
+                return [], rejected
+
+            rows = db.execute(
+                insert(Message).returning(
+                    Message.id,
+                    Message.sender_id,
+                    Message.receiver_id,
+                    Message.order_id,
+                    Message.content,
+                    Message.created_at,
+                    sort_by_parameter_order=True,
+                ),
+                [
+                    {
+                        "sender_id": item.connection.user_id,
+                        "receiver_id": item.receiver_id,
+                        "order_id": item.order_id,
+                        "content": item.content,
+                        "is_read": False,
+                        "is_system": False,
+                    }
+                    for item in valid
+                ],
+            ).all()
+            record_unread(db, Counter(item.receiver_id for item in valid))
+            db.commit()
+            return list(zip(valid, rows)), rejected
+
+
+class LocalPubSub:
+    """Delivers published batches to this process only"""
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        await self._handler(event)
+
+    async def stop(self) -> None:
+        pass
+
+
+class RedisPubSub:
+    """Delivers published batches to every worker subscribed to the channel"""
+
+    def __init__(self, url: str, channel: str = "chat"):
+        if aioredis is None:
+            raise RuntimeError(
+                "Redis pub/sub needs the redis package (pip install redis)"
+            )
+        self._client = aioredis.from_url(url)
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler) -> None:
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._task = asyncio.create_task(self._listen(handler))
+
+    async def _listen(self, handler: Handler) -> None:
+        async for message in self._pubsub.listen():
+            try:
+                await handler(json.loads(message["data"]))
+            except Exception as exc:
+                logger.error(f"Bad event from {self.channel}: {exc}")
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        await self._client.publish(self.channel, json.dumps(event))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.close()
+
+
+def create_pubsub(url: Optional[str] = None, channel: str = "chat") -> Any:
+    """Pub/sub backend for a CHAT_PUBSUB_URL (None for in-process delivery)"""
+    if not url:
+        return LocalPubSub()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisPubSub(url, channel)
+    raise ValueError(f"Unsupported pub/sub URL: {url}")
+
+
+class ChatHub:
+    """Chat sockets of this worker and the fan-out to them"""
+
+    def __init__(
+        self,
+        writer: MessageWriter,
+        pubsub: Any = None,
+        queue_size: int = 256,
+        max_message_length: int = 4000,
+    ):
+        self.writer = writer
+        self.pubsub = pubsub if pubsub is not None else LocalPubSub()
+        self.queue_size = queue_size
+        self.max_message_length = max_message_length
+        self._connections: Dict[int, Set[ChatConnection]] = {}
+        self._writer_task: Optional[asyncio.Task] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self._connections.values())
+
+    async def start(self) -> None:
+        """Start the writer and subscribe (on first connection)"""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._writer_task is None:
+                await self.pubsub.start(self.deliver)
+                self._writer_task = asyncio.create_task(self.writer.run(self._publish))
+
+    async def stop(self) -> None:
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            self._writer_task = None
+            await self.pubsub.stop()
+        for connections in list(self._connections.values()):
+            for connection in list(connections):
+                connection.stop()
+        self._connections.clear()
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> ChatConnection:
+        await self.start()
+        connection = ChatConnection(websocket, user_id, self.queue_size)
+        connection.start()
+        self._connections.setdefault(user_id, set()).add(connection)
+        return connection
+
+    def disconnect(self, connection: ChatConnection) -> None:
+        connection.stop()
+        connections = self._connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self._connections[connection.user_id]
+
+    async def receive(self, connection: ChatConnection, text: str) -> Optional[str]:
+        """Handle a client frame; an error message when it is rejected"""
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return "Invalid JSON"
+        if not isinstance(data, dict) or data.get("type") != "message":
+            return "Unknown frame type"
+
+        receiver_id = data.get("receiver_id")
+        order_id = data.get("order_id")
+        content = data.get("content")
+        if not isinstance(receiver_id, int) or receiver_id == connection.user_id:
+            return "Invalid receiver_id"
+        if order_id is not None and not isinstance(order_id, int):
+            return "Invalid order_id"
+        if not isinstance(content, str) or not content.strip():
+            return "Message is empty"
+        if len(content) > self.max_message_length:
+            return f"Message longer than {self.max_message_length} characters"
+
+        client_id = data.get("client_id")
+        await self.writer.submit(
+            PendingMessage(
+                connection=connection,
+                receiver_id=receiver_id,
+                content=content,
+                order_id=order_id,
+                client_id=str(client_id)[:64] if client_id is not None else None,
+            )
+        )
+        return None
+
+    async def _publish(self, saved: List[Tuple[PendingMessage, Any]]) -> None:
+        deliveries = [
+            {
+                "recipients": [row.sender_id, row.receiver_id],
+                "payload": {
+                    "type": "message",
+                    "client_id": item.client_id,
+                    "message": serialize_message(row),
+                },
+            }
+            for item, row in saved
+        ]
+        await self.pubsub.publish({"deliveries": deliveries})
+
+    async def deliver(self, event: Dict[str, Any]) -> None:
+        """Push a published batch to the local sockets of its recipients"""
+        for delivery in event["deliveries"]:
+            text = None
+            for user_id in delivery["recipients"]:
+                connections = self._connections.get(user_id)
+                if not connections:
+                    continue
+                if text is None:
+                    text = json.dumps(delivery["payload"])
+                for connection in list(connections):
+                    if not connection.push(text):
+                        self.disconnect(connection)
+
+
+_hub: Optional[ChatHub] = None
+
+
+def get_chat_hub() -> ChatHub:
+    """The worker's chat hub (FastAPI dependency)"""
+    global _hub
+    if _hub is None:
+        _hub = ChatHub(
+            MessageWriter(
+                SessionLocal,
+                batch_size=settings.CHAT_WRITE_BATCH_SIZE,
+                interval=settings.CHAT_WRITE_INTERVAL_MS / 1000,
+                queue_size=settings.CHAT_WRITE_QUEUE_SIZE,
+            ),
+            create_pubsub(settings.CHAT_PUBSUB_URL),
+            queue_size=settings.CHAT_SEND_QUEUE_SIZE,
+            max_message_length=settings.CHAT_MAX_MESSAGE_LENGTH,
+        )
+    return _hub
+
+
+async def shutdown_chat_hub() -> None:
+    """Stop the hub (application shutdown)"""
+    if _hub is not None:
+        await _hub.stop()
@@ -0,0 +1,65 @@
+"""
+Image decoding and thumbnail rendering
+
+These functions run inside the upload process pool (see ``uploads``), so the
+module only imports Pillow and must stay importable without the app settings
+or database.
+"""
+
+import os
+from typing import Dict, Sequence
+
+from PIL import Image, ImageOps
+
+WEBP_QUALITY = 80
+
+
+class ImageProcessingError(Exception):
+    """Raised when an upload is not a decodable image."""
+
+
+def render_thumbnails(
+    source_path: str,
+    dest_dir: str,
+    stem: str,
+    sizes: Sequence[int],
+    max_pixels: int,
+) -> Dict[int, str]:
+    """Decode an image and write one WebP per bounding-box size.
+
+    Args:
+        source_path: Uploaded file on disk
+        dest_dir: Directory the thumbnails are written to
+        stem: File name prefix, thumbnails are named ``{stem}_{size}.webp``
+        sizes: Longest-edge sizes in pixels
+        max_pixels: Decompression bomb limit
+
+    Returns:
+        Mapping of size to written file name
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+
+    try:
+        with Image.open(source_path) as image:
+            largest = max(sizes)
+            # JPEG can decode at 1/2, 1/4 or 1/8 scale, which is much cheaper
+            # than decoding at full size and resizing
+            image.draft("RGB", (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as exc:
+        raise ImageProcessingError(str(exc))
+
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    written = {}
+    # Largest first, each size is resized from the previous one
+    for size in sorted(sizes, reverse=True):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        name = f"{stem}_{size}.webp"
+        image.save(os.path.join(dest_dir, name), "WEBP", quality=WEBP_QUALITY, method=4)
+        written[size] = name
+
+    return written
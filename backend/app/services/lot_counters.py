@@ -0,0 +1,180 @@
+"""
+Denormalized lot counters for games and categories
+
+``Game.total_lots`` and ``Category.total_lots`` count active lots. Session
+listeners collect per-game and per-category deltas from every flush that
+creates, deletes or changes the status (or game/category) of a lot, and apply
+them once per transaction just before commit, so catalog tiles read live
+counts without ``COUNT(*)`` over ``lots``. ``recount_lot_counters`` repairs
+the counters with one grouped query.
+"""
+
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, event, func, inspect
+from sqlalchemy.orm import Session
+
+from ..core.logging import get_logger
+from ..models import Category, Game, Lot, LotStatus
+from .table_versions import bump_table_versions
+
+logger = get_logger(__name__)
+
+# Session.info key holding the pending deltas of the current transaction
+DELTAS_KEY = "lot_counter_deltas"
+
+CounterKey = Tuple[str, int]
+
+
+def is_counted(status: Any) -> bool:
+    """Whether a lot with this status contributes to total_lots"""
+    value = getattr(status, "value", status)
+    return value in (LotStatus.ACTIVE.value, LotStatus.ACTIVE.name)
+
+
+def _previous(lot: Lot, attr: str) -> Any:
+    """Value of a lot attribute before the pending changes"""
+    history = inspect(lot).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(lot, attr)
+
+
+def _count(
+    deltas: Counter, game_id: Optional[int], category_id: Optional[int], delta: int
+) -> None:
+    if game_id is not None:
+        deltas[("game", game_id)] += delta
+    if category_id is not None:
+        deltas[("category", category_id)] += delta
+
+
+def _keep_replaced_value(target: Lot, value: Any, oldvalue: Any, initiator: Any):
+    return value
+
+
+# Load the replaced value on assignment, even on expired instances, so the
+# flush history always carries the state a lot is moving out of.
+for _attr in (Lot.status, Lot.game_id, Lot.category_id):
+    event.listen(_attr, "set", _keep_replaced_value, active_history=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_lot_deltas(session: Session, flush_context: Any) -> None:
+    """Accumulate counter deltas from the lots touched by this flush"""
+    deltas = session.info.setdefault(DELTAS_KEY, Counter())
+
+    for obj in session.new:
+        if isinstance(obj, Lot) and is_counted(obj.status):
+            _count(deltas, obj.game_id, obj.category_id, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Lot) and is_counted(_previous(obj, "status")):
+            _count(deltas, _previous(obj, "game_id"), _previous(obj, "category_id"), -1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Lot) or obj in session.deleted:
+            continue
+        if is_counted(_previous(obj, "status")):
+            _count(deltas, _previous(obj, "game_id"), _previous(obj, "category_id"), -1)
+        if is_counted(obj.status):
+            _count(deltas, obj.game_id, obj.category_id, 1)
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_lot_deltas(session: Session) -> None:
+    """Apply the transaction's counter deltas in one batch"""
+    # Flush first so changes still pending at commit time are counted too
+    session.flush()
+    deltas = session.info.pop(DELTAS_KEY, None)
+    if deltas:
+        apply_deltas(session, deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_lot_deltas(session: Session) -> None:
+    # Savepoint rollbacks are not tracked; repair-lot-counters fixes the drift
+    session.info.pop(DELTAS_KEY, None)
+
+
+def apply_deltas(session: Session, deltas: Dict[CounterKey, int]) -> None:
+    """Add deltas to total_lots with one executemany per table"""
+    changed = []
+    for kind, model in (("game", Game), ("category", Category)):
+        # Sorted ids keep row lock order stable across concurrent transactions
+        params = [
+            {"row_id": row_id, "delta": delta}
+            for (row_kind, row_id), delta in sorted(deltas.items())
+            if row_kind == kind and delta
+        ]
+        if not params:
+            continue
+
+        table = model.__table__
+        session.execute(
+            table.update()
+            .where(table.c.id == bindparam("row_id"))
+            .values(
+                total_lots=func.coalesce(table.c.total_lots, 0) + bindparam("delta")
+            ),
+            params,
+        )
+        changed.append(table.name)
+
+    # total_lots is part of the game and category responses
+    bump_table_versions(session, changed)
+
+
+def _repair(session: Session, model: Any, expected: Dict[int, int]) -> Dict[str, int]:
+    """Write expected counters for rows whose stored value differs"""
+    stored = session.query(model.id, model.total_lots).all()
+    repairs = [
+        {"row_id": row_id, "total": expected.get(row_id, 0)}
+        for row_id, total_lots in stored
+        if (total_lots or 0) != expected.get(row_id, 0)
+    ]
+
+    if repairs:
+        table = model.__table__
+        session.execute(
+            table.update()
+            .where(table.c.id == bindparam("row_id"))
+            .values(total_lots=bindparam("total")),
+            repairs,
+        )
+
+    return {"checked": len(stored), "fixed": len(repairs)}
+
+
+def recount_lot_counters(session: Session) -> Dict[str, Dict[str, int]]:
+    """Recompute every game and category counter from one grouped query.
+
+    Returns:
+        Number of checked and fixed rows per table
+    """
+    games: Counter = Counter()
+    categories: Counter = Counter()
+
+    rows = (
+        session.query(Lot.game_id, Lot.category_id, func.count(Lot.id))
+        .filter(Lot.status == LotStatus.ACTIVE)
+        .group_by(Lot.game_id, Lot.category_id)
+    )
+    for game_id, category_id, total in rows:
+        games[game_id] += total
+        categories[category_id] += total
+
+    report = {
+        "games": _repair(session, Game, games),
+        "categories": _repair(session, Category, categories),
+    }
+    session.commit()
+
+    fixed = report["games"]["fixed"] + report["categories"]["fixed"]
+    if fixed:
+        logger.warning(f"Lot counter drift repaired on {fixed} rows: {report}")
+
+    return report
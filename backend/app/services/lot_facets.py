@@ -0,0 +1,124 @@
+"""
+Faceted counts for the lot catalog
+
+``compute_facets`` counts the lots matched by an already filtered query per
+game, category, price bucket and auto-delivery flag in one statement: a
+``GROUP BY GROUPING SETS`` on PostgreSQL, a ``UNION ALL`` of grouped selects
+over the same filtered subquery elsewhere. Results are cached per filter
+signature for ``FACETS_CACHE_TTL`` seconds, across workers with ``CACHE_URL``.
+"""
+
+import json
+from typing import Any, Dict, List
+
+from sqlalchemy import case, func, literal, literal_column, select, tuple_, union_all
+from sqlalchemy.orm import Query
+
+from ..core.cache import create_cache
+from ..core.config import settings
+from ..core.constants import PRICE_FACET_BUCKETS
+from ..models import Lot
+
+FACETS = ("game", "category", "price", "is_auto_delivery")
+
+facet_cache = create_cache("facets", maxsize=2048, ttl=settings.FACETS_CACHE_TTL)
+
+
+def facet_signature(facets: List[str], **filters: Any) -> str:
+    """Stable cache key for a facet request"""
+    return json.dumps({"facets": sorted(facets), **filters}, sort_keys=True)
+
+
+def _price_bucket():
+    # Literal edges keep the expression free of bound parameters
+    edges = PRICE_FACET_BUCKETS[1:]
+    return case(
+        *[
+            (Lot.price < literal_column(str(edge)), index)
+            for index, edge in enumerate(edges)
+        ],
+        else_=len(edges),
+    )
+
+
+def _price_range(index: int) -> Dict[str, Any]:
+    edges = PRICE_FACET_BUCKETS
+    upper = edges[index + 1] if index + 1 < len(edges) else None
+    label = f"{edges[index]}-{upper}" if upper is not None else f"{edges[index]}+"
+    return {"value": label, "min": edges[index], "max": upper}
+
+
+def compute_facets(query: Query, facets: List[str], dialect_name: str) -> Dict:
+    """Count matching lots per value of each requested facet.
+
+    Args:
+        query: Filtered lot query (ordering and pagination are ignored)
+        facets: Subset of FACETS
+        dialect_name: Database dialect of the session
+
+    Returns:
+        ``{"total": n, "facets": {facet: [{"value": v, "count": n}, ...]}}``
+    """
+    columns = {
+        "game": Lot.game_id,
+        "category": Lot.category_id,
+        "price": _price_bucket(),
+        "is_auto_delivery": Lot.is_auto_delivery,
+    }
+    filtered = (
+        query.order_by(None)
+        .with_entities(*[columns[name].label(name) for name in facets])
+        .subquery()
+    )
+    session = query.session
+
+    rows = []
+    if dialect_name == "postgresql":
+        statement = select(
+            *[filtered.c[name] for name in facets],
+            *[func.grouping(filtered.c[name]) for name in facets],
+            func.count(),
+        ).group_by(
+            func.grouping_sets(*[tuple_(filtered.c[name]) for name in facets], tuple_())
+        )
+        for row in session.execute(statement):
+            values, grouped, count = row[: len(facets)], row[len(facets) : -1], row[-1]
+            # grouping() is 0 for the column the row is grouped by
+            facet = next(
+                (name for name, flag in zip(facets, grouped) if flag == 0), None
+            )
+            value = values[facets.index(facet)] if facet else None
+            rows.append((facet, value, count))
+    else:
+        statement = union_all(
+            select(literal("").label("facet"), literal(None), func.count()).select_from(
+                filtered
+            ),
+            *[
+                select(literal(name), filtered.c[name], func.count()).group_by(
+                    filtered.c[name]
+                )
+                for name in facets
+            ],
+        )
+        for facet, value, count in session.execute(statement):
+            rows.append((facet or None, value, count))
+
+    result: Dict[str, Any] = {"total": 0, "facets": {name: [] for name in facets}}
+    for facet, value, count in rows:
+        if facet is None:
+            result["total"] = count
+        elif facet == "price":
+            result["facets"][facet].append({**_price_range(int(value)), "count": count})
+        else:
+            if facet == "is_auto_delivery" and value is not None:
+                value = bool(value)
+            result["facets"][facet].append({"value": value, "count": count})
+
+    for facet, buckets in result["facets"].items():
+        if facet == "price":
+            buckets.sort(key=lambda bucket: bucket["min"])
+        else:
+            buckets.sort(key=lambda bucket: -bucket["count"])
+
+    return result
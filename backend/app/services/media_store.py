@@ -0,0 +1,327 @@
+"""
+Content-addressed media store
+
+Uploaded images are stored once per (kind, sha256 of the uploaded bytes) in
+sharded directories::
+
+    {UPLOAD_DIR}/lot_images/3f/a9/3fa9...e1_640.webp
+
+so identical uploads share their thumbnails and every URL names immutable
+content. ``MediaBlob.ref_count`` counts the ``Lot.images`` entries and
+``User.avatar_url`` values pointing at a blob; session listeners collect the
+changes of each flush and apply them once per transaction before commit.
+``collect_garbage`` removes blobs nobody has referenced for
+``MEDIA_GC_GRACE_HOURS`` and files without a blob row.
+"""
+
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import bindparam, event, func, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.constants import STATIC_DIRS, THUMBNAIL_SIZES
+from ..core.logging import get_logger
+from ..models import Lot, MediaBlob, User
+
+logger = get_logger(__name__)
+
+# Session.info key holding the pending reference deltas of the transaction
+DELTAS_KEY = "media_ref_deltas"
+
+BlobKey = Tuple[str, str]
+
+_KINDS = {STATIC_DIRS[kind]: kind for kind in THUMBNAIL_SIZES}
+_URL_PATTERN = re.compile(
+    r"^/static/(?P<dir>[a-z_]+)/[0-9a-f]{2}/[0-9a-f]{2}/"
+    r"(?P<digest>[0-9a-f]{64})_\d+\.webp$"
+)
+_FILE_PATTERN = re.compile(r"^(?P<digest>[0-9a-f]{64})_\d+\.webp$")
+
+
+def blob_dir(kind: str, digest: str) -> str:
+    """Directory holding the thumbnails of a blob"""
+    return os.path.join(settings.UPLOAD_DIR, STATIC_DIRS[kind], digest[:2], digest[2:4])
+
+
+def blob_name(digest: str, size: int) -> str:
+    return f"{digest}_{size}.webp"
+
+
+def blob_url(kind: str, digest: str, size: int) -> str:
+    """Public URL of one thumbnail; the content never changes"""
+    return (
+        f"/static/{STATIC_DIRS[kind]}/{digest[:2]}/{digest[2:4]}/"
+        f"{blob_name(digest, size)}"
+    )
+
+
+def parse_blob_url(url: Optional[str]) -> Optional[BlobKey]:
+    """(kind, digest) of a media store URL, None for anything else"""
+    match = _URL_PATTERN.match(url or "")
+    if not match or match.group("dir") not in _KINDS:
+        return None
+    return _KINDS[match.group("dir")], match.group("digest")
+
+
+def register_blob(db: Session, kind: str, digest: str, size: int) -> None:
+    """Record an uploaded blob (caller commits).
+
+    New blobs start unreferenced; the reference is counted when the URL is
+    stored on a lot or user. Re-uploads refresh ``uploaded_at`` so garbage
+    collection does not remove a blob that is about to be referenced.
+    """
+    blob = db.get(MediaBlob, (kind, digest))
+    if blob is not None:
+        blob.uploaded_at = func.now()
+        return
+
+    try:
+        with db.begin_nested():
+            db.add(MediaBlob(kind=kind, digest=digest, size=size, ref_count=0))
+    except IntegrityError:
+        # Registered concurrently by an identical upload
+        db.get(MediaBlob, (kind, digest)).uploaded_at = func.now()
+
+
+def _references(images: Any, avatar_url: Any = None) -> Counter:
+    keys = Counter()
+    for url in [*(images or []), avatar_url]:
+        key = parse_blob_url(url) if isinstance(url, str) else None
+        if key:
+            keys[key] += 1
+    return keys
+
+
+def _before(obj: Any, attr: str) -> Any:
+    """Value of an attribute before the pending changes"""
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, attr)
+
+
+# Attribute holding media URLs per referencing model
+_REFERENCING = {Lot: "images", User: "avatar_url"}
+
+
+def _object_references(obj: Any, previous: bool = False) -> Counter:
+    attr = _REFERENCING.get(type(obj))
+    if attr is None:
+        return Counter()
+    value = _before(obj, attr) if previous else getattr(obj, attr)
+    return _references(value) if attr == "images" else _references(None, value)
+
+
+def _keep_replaced_value(target: Any, value: Any, oldvalue: Any, initiator: Any):
+    return value
+
+
+# Load the replaced value on assignment so the flush history carries the
+# references an object is dropping
+for _attr in (Lot.images, User.avatar_url):
+    event.listen(_attr, "set", _keep_replaced_value, active_history=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_media_refs(session: Session, flush_context: Any) -> None:
+    """Accumulate reference deltas from the lots and users in this flush"""
+    deltas = session.info.setdefault(DELTAS_KEY, Counter())
+
+    for obj in session.new:
+        deltas.update(_object_references(obj))
+
+    for obj in session.deleted:
+        deltas.subtract(_object_references(obj, previous=True))
+
+    for obj in session.dirty:
+        attr = _REFERENCING.get(type(obj))
+        if attr is None or obj in session.deleted:
+            continue
+        if not inspect(obj).attrs[attr].history.has_changes():
+            continue
+        deltas.subtract(_object_references(obj, previous=True))
+        deltas.update(_object_references(obj))
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_media_refs(session: Session) -> None:
+    """Apply the transaction's reference deltas in one batch"""
+    session.flush()
+    deltas = session.info.pop(DELTAS_KEY, None)
+    params = [
+        {"blob_kind": kind, "blob_digest": digest, "delta": delta}
+        for (kind, digest), delta in sorted((deltas or {}).items())
+        if delta
+    ]
+    if not params:
+        return
+
+    table = MediaBlob.__table__
+    session.execute(
+        table.update()
+        .where(
+            table.c.kind == bindparam("blob_kind"),
+            table.c.digest == bindparam("blob_digest"),
+        )
+        .values(ref_count=table.c.ref_count + bindparam("delta")),
+        params,
+    )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_media_refs(session: Session) -> None:
+    session.info.pop(DELTAS_KEY, None)
+
+
+def recount_references(db: Session, batch_size: int = 1000) -> Dict[str, int]:
+    """Recompute every blob's ref_count from lots and users.
+
+    Returns:
+        Number of checked and fixed blobs
+    """
+    expected: Counter = Counter()
+    for (images,) in (
+        db.query(Lot.images).filter(Lot.images.isnot(None)).yield_per(batch_size)
+    ):
+        expected.update(_references(images))
+    for (avatar_url,) in (
+        db.query(User.avatar_url)
+        .filter(User.avatar_url.isnot(None))
+        .yield_per(batch_size)
+    ):
+        expected.update(_references(None, avatar_url))
+
+    stored = db.query(MediaBlob.kind, MediaBlob.digest, MediaBlob.ref_count).all()
+    repairs = [
+        {"blob_kind": kind, "blob_digest": digest, "total": expected[(kind, digest)]}
+        for kind, digest, ref_count in stored
+        if ref_count != expected[(kind, digest)]
+    ]
+    if repairs:
+        table = MediaBlob.__table__
+        db.execute(
+            table.update()
+            .where(
+                table.c.kind == bindparam("blob_kind"),
+                table.c.digest == bindparam("blob_digest"),
+            )
+            .values(ref_count=bindparam("total")),
+            repairs,
+        )
+        logger.warning(f"Media reference drift repaired on {len(repairs)} blobs")
+    db.commit()
+
+    return {"checked": len(stored), "fixed": len(repairs)}
+
+
+def _remove_blob_files(kind: str, digest: str) -> int:
+    freed = 0
+    for size in THUMBNAIL_SIZES[kind]:
+        path = os.path.join(blob_dir(kind, digest), blob_name(digest, size))
+        try:
+            freed += os.path.getsize(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    # Drop the two shard levels once empty
+    directory = blob_dir(kind, digest)
+    for _ in range(2):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+    return freed
+
+
+def _stale_files(root: str, cutoff: float) -> Iterable[Tuple[str, str]]:
+    """(path, file name) of files under root last modified before cutoff"""
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    yield path, name
+            except FileNotFoundError:
+                continue
+
+
+def collect_garbage(
+    db: Session, grace_hours: Optional[int] = None, dry_run: bool = False
+) -> Dict[str, int]:
+    """Delete unreferenced blobs, orphaned files and abandoned uploads.
+
+    Args:
+        db: Database session
+        grace_hours: Minimum age of anything deleted (MEDIA_GC_GRACE_HOURS)
+        dry_run: Only count what would be deleted
+
+    Returns:
+        Number of deleted blobs and files and the bytes freed
+    """
+    grace = timedelta(
+        hours=settings.MEDIA_GC_GRACE_HOURS if grace_hours is None else grace_hours
+    )
+    cutoff = datetime.now(timezone.utc) - grace
+    report = {"blobs": 0, "orphan_files": 0, "temp_files": 0, "bytes_freed": 0}
+
+    candidates = (
+        db.query(MediaBlob.kind, MediaBlob.digest)
+        .filter(MediaBlob.ref_count <= 0, MediaBlob.uploaded_at < cutoff)
+        .all()
+    )
+    for kind, digest in candidates:
+        if dry_run:
+            report["blobs"] += 1
+            continue
+        # Conditions are re-checked so a blob referenced or re-uploaded since
+        # the candidate query survives
+        deleted = (
+            db.query(MediaBlob)
+            .filter(
+                MediaBlob.kind == kind,
+                MediaBlob.digest == digest,
+                MediaBlob.ref_count <= 0,
+                MediaBlob.uploaded_at < cutoff,
+            )
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        if deleted:
+            report["blobs"] += 1
+            report["bytes_freed"] += _remove_blob_files(kind, digest)
+
+    # Files without a blob row (crashed uploads, rows removed by hand)
+    known = set(db.query(MediaBlob.kind, MediaBlob.digest).all())
+    for kind in THUMBNAIL_SIZES:
+        root = os.path.join(settings.UPLOAD_DIR, STATIC_DIRS[kind])
+        for path, name in _stale_files(root, cutoff.timestamp()):
+            match = _FILE_PATTERN.match(name)
+            if not match or (kind, match.group("digest")) in known:
+                continue
+            report["orphan_files"] += 1
+            if not dry_run:
+                report["bytes_freed"] += os.path.getsize(path)
+                os.unlink(path)
+
+    # Upload spool files left behind by killed workers
+    tmp_dir = os.path.join(settings.UPLOAD_DIR, "tmp")
+    for path, _ in _stale_files(tmp_dir, time.time() - grace.total_seconds()):
+        report["temp_files"] += 1
+        if not dry_run:
+            report["bytes_freed"] += os.path.getsize(path)
+            os.unlink(path)
+
+    logger.info(f"Media garbage collection: {report}")
+    return report
@@ -0,0 +1,277 @@
+"""
+Order status events for Server-Sent Events streams
+
+Session listeners record every order created or moved to another status in
+a transaction and publish the events after commit, so all order mutators
+(``update_order``, ``confirm_order``, ``cancel_order``, disputes, ...) feed
+the streams without calling anything themselves. Events go through the same
+pub/sub backends as chat (``ORDER_EVENTS_PUBSUB_URL`` for Redis across
+workers) to ``OrderEventBroadcaster``, which numbers them, keeps the last
+``ORDER_EVENTS_BUFFER_SIZE`` in a ring buffer and pushes each one to the
+open streams of the buyer and the seller.
+
+Reconnecting clients send the id of the last event they saw
+(``Last-Event-ID``) and get the newer events replayed from the buffer. When
+the buffer no longer reaches back that far, or the id comes from another
+worker or process, they get a ``resync`` event and reload their orders once.
+"""
+
+import asyncio
+import json
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.logging import get_logger
+from ..models import Order
+from .chat import create_pubsub
+
+logger = get_logger(__name__)
+
+# Session.info key holding the order events of the current transaction
+PENDING_KEY = "order_events_pending"
+
+# Reconnection delay suggested to EventSource clients
+RETRY_MS = 3000
+
+RESYNC_FRAME = "event: resync\ndata: {}\n\n"
+HEARTBEAT_FRAME = ": heartbeat\n\n"
+
+
+def _status_value(status: Any) -> Optional[str]:
+    return getattr(status, "value", status)
+
+
+def _keep_replaced_value(target: Order, value: Any, oldvalue: Any, initiator: Any):
+    return value
+
+
+# Load the replaced status on assignment so the flush history has it
+event.listen(Order.status, "set", _keep_replaced_value, active_history=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_order_events(session: Session, flush_context: Any) -> None:
+    """Record orders created or moved to another status by this flush"""
+    changes: List[Tuple[Order, Optional[str]]] = []
+    for obj in session.new:
+        if isinstance(obj, Order):
+            changes.append((obj, None))
+    for obj in session.dirty:
+        if isinstance(obj, Order) and obj not in session.deleted:
+            history = inspect(obj).attrs.status.history
+            if history.added and history.deleted:
+                changes.append((obj, _status_value(history.deleted[0])))
+
+    if changes:
+        pending = session.info.setdefault(PENDING_KEY, [])
+        for order, previous in changes:
+            status = _status_value(order.status)
+            if status != previous:
+                pending.append(
+                    {
+                        "order_id": order.id,
+                        "status": status,
+                        "previous_status": previous,
+                        "buyer_id": order.buyer_id,
+                        "seller_id": order.seller_id,
+                        "lot_id": order.lot_id,
+                    }
+                )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_order_events(session: Session) -> None:
+    events = session.info.pop(PENDING_KEY, None)
+    if events:
+        get_order_events().publish_threadsafe(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_order_events(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+class OrderEventStream:
+    """Queue of SSE frames for one open stream"""
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def push(self, frame: Optional[str]) -> None:
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Ends the response; the client reconnects and replays what it missed
+            self.closed = True
+
+
+class OrderEventBroadcaster:
+    """Numbered recent order events and the open streams of this worker"""
+
+    def __init__(
+        self,
+        pubsub: Any = None,
+        buffer_size: int = 1000,
+        queue_size: int = 100,
+        heartbeat: float = 15,
+    ):
+        self.pubsub = pubsub if pubsub is not None else create_pubsub()
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        # Ids are "<epoch>-<sequence>"; another epoch means another process
+        self.epoch = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._buffer: Deque[Tuple[int, Tuple[int, ...], str]] = deque(
+            maxlen=buffer_size
+        )
+        self._streams: Dict[int, Set[OrderEventStream]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(streams) for streams in self._streams.values())
+
+    async def start(self) -> None:
+        """Subscribe to published events (application startup)"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            await self.pubsub.start(self.dispatch)
+            self._heartbeat_task = asyncio.create_task(self._send_heartbeats())
+
+    async def stop(self) -> None:
+        if self._loop is not None:
+            self._loop = None
+            self._heartbeat_task.cancel()
+            await self.pubsub.stop()
+        # Streams end after the frames already queued (or at once when full)
+        for streams in self._streams.values():
+            for stream in streams:
+                stream.push(None)
+
+    def publish_threadsafe(self, events: List[Dict[str, Any]]) -> None:
+        """Publish committed events from any thread"""
+        loop = self._loop
+        if loop is None:  # Not serving (scripts, maintenance commands)
+            return
+        try:
+            loop.call_soon_threadsafe(self._publish, events)
+        except RuntimeError:  # Loop closed during shutdown
+            logger.debug(f"Dropped {len(events)} order events after shutdown")
+
+    async def _send_heartbeats(self) -> None:
+        # One timer for all streams instead of a get() timeout per stream
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            self.send_heartbeat()
+
+    def send_heartbeat(self) -> None:
+        """Keep idle streams from being closed by proxies"""
+        for streams in self._streams.values():
+            for stream in streams:
+                if not stream.queue.full():  # A full stream is busy anyway
+                    stream.queue.put_nowait(HEARTBEAT_FRAME)
+
+    def _publish(self, events: List[Dict[str, Any]]) -> None:
+        task = asyncio.ensure_future(self.pubsub.publish({"events": events}))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def dispatch(self, message: Dict[str, Any]) -> None:
+        """Number a published batch, buffer it and push it to open streams"""
+        for order_event in message["events"]:
+            self._sequence += 1
+            recipients = (order_event["buyer_id"], order_event["seller_id"])
+            frame = (
+                f"id: {self.epoch}-{self._sequence}\n"
+                f"event: order_status\n"
+                f"data: {json.dumps(order_event)}\n\n"
+            )
+            self._buffer.append((self._sequence, recipients, frame))
+
+            for user_id in set(recipients):
+                for stream in self._streams.get(user_id, ()):
+                    stream.push(frame)
+
+    def replay(self, user_id: int, last_event_id: str) -> Optional[List[str]]:
+        """Frames for a user after ``last_event_id``; None when some are lost"""
+        epoch, _, sequence = last_event_id.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        last = int(sequence)
+        if last > self._sequence:
+            return None
+        # Everything after `last` must still be buffered
+        if last < self._sequence and (
+            not self._buffer or self._buffer[0][0] > last + 1
+        ):
+            return None
+
+        frames = []
+        for sequence_number, recipients, frame in reversed(self._buffer):
+            if sequence_number <= last:
+                break
+            if user_id in recipients:
+                frames.append(frame)
+        frames.reverse()
+        return frames
+
+    def subscribe(self, user_id: int) -> OrderEventStream:
+        stream = OrderEventStream(user_id, self.queue_size)
+        self._streams.setdefault(user_id, set()).add(stream)
+        return stream
+
+    def unsubscribe(self, stream: OrderEventStream) -> None:
+        streams = self._streams.get(stream.user_id)
+        if streams is not None:
+            streams.discard(stream)
+            if not streams:
+                del self._streams[stream.user_id]
+
+    async def stream(
+        self, user_id: int, last_event_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """SSE frames for one client until it disconnects or falls behind"""
+        # Subscribe and replay with no await in between: events dispatched
+        # later are queued and newer than the replay, none are in both
+        stream = self.subscribe(user_id)
+        replayed: List[str] = []
+        if last_event_id:
+            frames = self.replay(user_id, last_event_id)
+            replayed = frames if frames is not None else [RESYNC_FRAME]
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            for frame in replayed:
+                yield frame
+
+            while True:
+                frame = await stream.queue.get()
+                if stream.closed or frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(stream)
+
+
+_broadcaster: Optional[OrderEventBroadcaster] = None
+
+
+def get_order_events() -> OrderEventBroadcaster:
+    """The worker's order event broadcaster (FastAPI dependency)"""
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = OrderEventBroadcaster(
+            create_pubsub(settings.ORDER_EVENTS_PUBSUB_URL, channel="order_events"),
+            buffer_size=settings.ORDER_EVENTS_BUFFER_SIZE,
+            queue_size=settings.ORDER_EVENTS_QUEUE_SIZE,
+            heartbeat=settings.ORDER_EVENTS_HEARTBEAT_SECONDS,
+        )
+    return _broadcaster
@@ -0,0 +1,207 @@
+"""
+Refresh token rotation and revocation
+
+Every refresh token is recorded in ``refresh_tokens``. Refreshing marks the
+presented token used and issues a new pair in the same family (all tokens
+descending from one login). Presenting a used or revoked token again means
+it was copied: the whole family is revoked, together with the access tokens
+issued alongside it, and the client has to log in again.
+
+Access tokens are revoked by ``jti`` in ``revoked_tokens``; after commit they
+are also added to the in-memory ``core.revocation.revoked_tokens`` list that
+``verify_token`` consults.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..core.auth import create_access_token, create_refresh_token, decode_token
+from ..core.config import settings
+from ..core.logging import get_logger
+from ..core.revocation import revoked_tokens
+from ..models import RefreshToken, RevokedToken, User
+
+logger = get_logger(__name__)
+
+# Session.info key holding (jti, expiry) of access tokens revoked in the
+# current transaction
+PENDING_KEY = "revoked_tokens_pending"
+
+
+class InvalidRefreshToken(Exception):
+    """Refresh token is malformed, expired, unknown or revoked"""
+
+
+class RefreshTokenReused(InvalidRefreshToken):
+    """An already rotated refresh token was presented again"""
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_revocations(session: Session) -> None:
+    for jti, expires_at in session.info.pop(PENDING_KEY, []):
+        revoked_tokens.add(jti, expires_at.timestamp())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_revocations(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+def issue_tokens(
+    db: Session, user: User, family_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Access and refresh token pair for a user (caller commits).
+
+    Args:
+        db: Database session
+        user: Authenticated user
+        family_id: Family of the rotated token; a new family when logging in
+    """
+    now = datetime.now(timezone.utc)
+    access_ttl = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    refresh_ttl = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    claims = {"sub": user.username, "user_id": user.id}
+
+    access_jti = uuid.uuid4().hex
+    refresh_jti = uuid.uuid4().hex
+    family_id = family_id or refresh_jti
+
+    access_token = create_access_token({**claims, "jti": access_jti}, access_ttl)
+    refresh_token = create_refresh_token(
+        {**claims, "jti": refresh_jti, "fam": family_id}, refresh_ttl
+    )
+    db.add(
+        RefreshToken(
+            jti=refresh_jti,
+            family_id=family_id,
+            user_id=user.id,
+            access_jti=access_jti,
+            # exp claims are whole seconds, rounded either way
+            access_expires_at=now + access_ttl + timedelta(seconds=1),
+            expires_at=now + refresh_ttl,
+        )
+    )
+
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": int(access_ttl.total_seconds()),
+    }
+
+
+def rotate_refresh_token(db: Session, token: str) -> Dict[str, Any]:
+    """Exchange a refresh token for a new pair in its family (caller commits).
+
+    Raises:
+        RefreshTokenReused: The token was already rotated or revoked; its
+            family has been revoked in the session and must be committed
+        InvalidRefreshToken: Invalid token, unknown token or inactive user
+    """
+    payload = decode_token(token, token_type="refresh")
+    if payload is None or not payload.get("jti"):
+        raise InvalidRefreshToken("Invalid refresh token")
+
+    stored = (
+        db.query(RefreshToken)
+        .filter(RefreshToken.jti == payload["jti"])
+        .with_for_update()
+        .first()
+    )
+    if stored is None:
+        raise InvalidRefreshToken("Unknown refresh token")
+
+    if stored.used_at is not None or stored.revoked_at is not None:
+        logger.warning(
+            f"Refresh token reuse for user {stored.user_id}, "
+            f"revoking family {stored.family_id}"
+        )
+        revoke_family(db, stored.family_id)
+        raise RefreshTokenReused("Refresh token already used")
+
+    user = db.query(User).filter(User.id == stored.user_id).first()
+    if user is None or not user.is_active:
+        raise InvalidRefreshToken("User not found or inactive")
+
+    stored.used_at = datetime.now(timezone.utc)
+    return issue_tokens(db, user, family_id=stored.family_id)
+
+
+def revoke_family(db: Session, family_id: str) -> int:
+    """Revoke every refresh token of a family and its live access tokens"""
+    now = datetime.now(timezone.utc)
+    access_tokens: List[Tuple[str, datetime]] = (
+        db.query(RefreshToken.access_jti, RefreshToken.access_expires_at)
+        .filter(
+            RefreshToken.family_id == family_id,
+            RefreshToken.access_expires_at > now,
+        )
+        .all()
+    )
+    for jti, expires_at in access_tokens:
+        revoke_access_token(db, jti, expires_at)
+
+    result = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def revoke_access_token(db: Session, jti: str, expires_at: datetime) -> None:
+    """Deny an access token until it expires (caller commits)"""
+    if expires_at.tzinfo is None:  # SQLite
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    db.execute(
+        insert(RevokedToken)
+        .values(jti=jti, expires_at=expires_at)
+        .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+    )
+    db.info.setdefault(PENDING_KEY, []).append((jti, expires_at))
+
+
+def logout(
+    db: Session, access_token: str, user: User, refresh_token: Optional[str] = None
+) -> None:
+    """Revoke the presented access token and the refresh token's family"""
+    payload = decode_token(access_token)
+    if payload is not None and payload.get("jti"):
+        expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+        revoke_access_token(db, payload["jti"], expires_at)
+
+    if refresh_token:
+        refresh_payload = decode_token(refresh_token, token_type="refresh")
+        if (
+            refresh_payload
+            and refresh_payload.get("jti")
+            and refresh_payload.get("user_id") == user.id
+        ):
+            stored = db.get(RefreshToken, refresh_payload["jti"])
+            if stored is not None:
+                revoke_family(db, stored.family_id)
+
+
+def purge_expired_tokens(db: Session) -> Dict[str, int]:
+    """Delete refresh and revocation rows of expired tokens (caller commits)"""
+    now = datetime.now(timezone.utc)
+    refresh = (
+        db.query(RefreshToken)
+        .filter(RefreshToken.expires_at <= now)
+        .delete(synchronize_session=False)
+    )
+    revoked = (
+        db.query(RevokedToken)
+        .filter(RevokedToken.expires_at <= now)
+        .delete(synchronize_session=False)
+    )
+    return {"refresh_tokens": refresh, "revoked_tokens": revoked}
@@ -0,0 +1,190 @@
+"""
+Seller reputation aggregates
+
+``User.rating``, ``rating_sum``, ``total_reviews``, ``total_sales`` and
+``total_purchases`` are maintained incrementally inside the transactions that
+create reviews and complete orders, so profiles and listings read them as
+plain columns. ``reconcile_user_stats`` recomputes them from ``reviews`` and
+``orders`` in batches and repairs any drift.
+"""
+
+from typing import Any, Dict, List
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from ..core.logging import get_logger
+from ..models import Order, OrderStatus, Review, User
+
+logger = get_logger(__name__)
+
+# Number of drifted users included in a reconciliation report
+DRIFT_SAMPLE_SIZE = 20
+
+
+def _average(rating_sum: int, total_reviews: int) -> float:
+    """Average rating rounded to the precision of ``User.rating``"""
+    if not total_reviews:
+        return 0.0
+    return round(rating_sum / total_reviews, 2)
+
+
+def record_review(db: Session, review: Review) -> None:
+    """Fold a new review into the reviewed user's rating (caller commits)"""
+    if review.is_visible is False:
+        return
+
+    rating_sum = func.coalesce(User.rating_sum, 0)
+    total_reviews = func.coalesce(User.total_reviews, 0)
+
+    # SET expressions see the pre-update row, so the average is computed
+    # from the same values that are being incremented.
+    db.execute(
+        update(User)
+        .where(User.id == review.reviewed_id)
+        .values(
+            rating_sum=rating_sum + review.rating,
+            total_reviews=total_reviews + 1,
+            rating=(rating_sum + review.rating) * 1.0 / (total_reviews + 1),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def record_order_completed(db: Session, order: Order) -> None:
+    """Count a completed order for its seller and buyer (caller commits)"""
+    db.execute(
+        update(User)
+        .where(User.id == order.seller_id)
+        .values(total_sales=func.coalesce(User.total_sales, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(User)
+        .where(User.id == order.buyer_id)
+        .values(total_purchases=func.coalesce(User.total_purchases, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _expected_stats(db: Session, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Recompute aggregates for a batch of users with grouped queries"""
+    expected = {
+        user_id: {
+            "rating_sum": 0,
+            "total_reviews": 0,
+            "total_sales": 0,
+            "total_purchases": 0,
+        }
+        for user_id in user_ids
+    }
+
+    reviews = (
+        db.query(Review.reviewed_id, func.sum(Review.rating), func.count(Review.id))
+        .filter(Review.reviewed_id.in_(user_ids), Review.is_visible.isnot(False))
+        .group_by(Review.reviewed_id)
+    )
+    for user_id, rating_sum, total_reviews in reviews:
+        expected[user_id]["rating_sum"] = int(rating_sum or 0)
+        expected[user_id]["total_reviews"] = total_reviews
+
+    sales = (
+        db.query(Order.seller_id, func.count(Order.id))
+        .filter(Order.seller_id.in_(user_ids), Order.status == OrderStatus.COMPLETED)
+        .group_by(Order.seller_id)
+    )
+    for user_id, total_sales in sales:
+        expected[user_id]["total_sales"] = total_sales
+
+    purchases = (
+        db.query(Order.buyer_id, func.count(Order.id))
+        .filter(Order.buyer_id.in_(user_ids), Order.status == OrderStatus.COMPLETED)
+        .group_by(Order.buyer_id)
+    )
+    for user_id, total_purchases in purchases:
+        expected[user_id]["total_purchases"] = total_purchases
+
+    for stats in expected.values():
+        stats["rating"] = _average(stats["rating_sum"], stats["total_reviews"])
+
+    return expected
+
+
+def reconcile_user_stats(
+    db: Session, batch_size: int = 500, fix: bool = True
+) -> Dict[str, Any]:
+    """Recompute reputation aggregates in batches and report drift.
+
+    Args:
+        db: Database session
+        batch_size: Number of users checked per batch (one commit per batch)
+        fix: Write the recomputed values back when drift is found
+
+    Returns:
+        Report with the number of checked, drifted and fixed users and a
+        sample of drifted rows
+    """
+    report: Dict[str, Any] = {"checked": 0, "drifted": 0, "fixed": 0, "samples": []}
+    last_id = 0
+
+    while True:
+        rows = (
+            db.query(
+                User.id,
+                User.rating,
+                User.rating_sum,
+                User.total_reviews,
+                User.total_sales,
+                User.total_purchases,
+            )
+            .filter(User.id > last_id)
+            .order_by(User.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        expected = _expected_stats(db, [row.id for row in rows])
+        repairs = []
+
+        for row in rows:
+            stats = expected[row.id]
+            actual = {
+                "rating": float(row.rating or 0),
+                "rating_sum": row.rating_sum or 0,
+                "total_reviews": row.total_reviews or 0,
+                "total_sales": row.total_sales or 0,
+                "total_purchases": row.total_purchases or 0,
+            }
+            drifted = abs(actual["rating"] - stats["rating"]) >= 0.005 or any(
+                actual[field] != stats[field] for field in stats if field != "rating"
+            )
+            if not drifted:
+                continue
+
+            report["drifted"] += 1
+            if len(report["samples"]) < DRIFT_SAMPLE_SIZE:
+                report["samples"].append(
+                    {"user_id": row.id, "actual": actual, "expected": stats}
+                )
+            repairs.append({"id": row.id, **stats})
+
+        report["checked"] += len(rows)
+
+        if fix and repairs:
+            # ORM bulk UPDATE by primary key: one executemany per batch
+            db.execute(update(User), repairs)
+            db.commit()
+            report["fixed"] += len(repairs)
+
+    if report["drifted"]:
+        logger.warning(
+            f"Reputation drift: {report['drifted']} of {report['checked']} users"
+            f" ({report['fixed']} fixed)"
+        )
+    else:
+        logger.info(f"Reputation aggregates consistent for {report['checked']} users")
+
+    return report
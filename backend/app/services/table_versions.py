@@ -0,0 +1,149 @@
+"""
+Per-table change counters for conditional catalog responses
+
+``table_versions`` holds one row per tracked table. Session listeners note
+which tracked tables a transaction inserts into, updates or deletes from and
+bump their versions once, just before commit. Endpoints derive weak ETags
+from these versions (plus ``updated_at`` for single rows) with one small
+query instead of loading and serializing the rows.
+
+Changes that only touch ``Lot.views`` or ``Lot.favorites`` do not bump the
+version: weak validators allow counters like these to be slightly stale.
+Likewise ``users`` only tracks the public profile fields lots embed for
+their seller, not passwords, private counters or timestamps.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event, inspect, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from ..core.http_cache import CacheValidators, as_utc, weak_etag
+from ..models import Category, Game, Lot, TableVersion, User
+
+# Session.info key holding the tables changed in the current transaction
+PENDING_KEY = "table_versions_pending"
+
+TRACKED = {Game: "games", Category: "categories", Lot: "lots", User: "users"}
+# Tables behind lot listings (lots embed their game, category and seller)
+CATALOG_TABLES = ("lots", "games", "categories", "users")
+IGNORED_ATTRIBUTES = {
+    "lots": {"views", "favorites"},
+    "users": {
+        "hashed_password",
+        "is_active",
+        "rating_sum",
+        "total_purchases",
+        "unread_messages",
+        "updated_at",
+    },
+}
+
+
+def _is_changed(obj: Any, table: str) -> bool:
+    ignored = IGNORED_ATTRIBUTES.get(table, set())
+    state = inspect(obj)
+    return any(
+        state.attrs[key].history.has_changes()
+        for key in state.mapper.column_attrs.keys()
+        if key not in ignored
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_tables(session: Session, flush_context: Any) -> None:
+    """Note the tracked tables written by this flush"""
+    pending = session.info.setdefault(PENDING_KEY, set())
+
+    for obj in [*session.new, *session.deleted]:
+        table = TRACKED.get(type(obj))
+        if table:
+            pending.add(table)
+
+    for obj in session.dirty:
+        table = TRACKED.get(type(obj))
+        if table and table not in pending and _is_changed(obj, table):
+            pending.add(table)
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_table_versions(session: Session) -> None:
+    session.flush()
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        bump_table_versions(session, pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_table_versions(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+
+def bump_table_versions(session: Session, tables: Iterable[str]) -> None:
+    """Increment the versions of tables in the current transaction"""
+    now = datetime.now(timezone.utc)
+    # Sorted names keep row lock order stable across transactions
+    for name in sorted(set(tables)):
+        result = session.execute(
+            update(TableVersion)
+            .where(TableVersion.name == name)
+            .values(version=TableVersion.version + 1, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            continue
+
+        # First change of this table: create the row, racing writers
+        # increment it instead
+        dialect = session.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(TableVersion).values(name=name, version=1, updated_at=now)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[TableVersion.name],
+                set_={"version": TableVersion.version + 1, "updated_at": now},
+            )
+        )
+
+
+def get_table_versions(
+    db: Session, tables: Iterable[str]
+) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    """(version, updated_at) per table; (0, None) before its first change"""
+    names = sorted(set(tables))
+    versions = {name: (0, None) for name in names}
+    rows = db.query(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+    for name, version, updated_at in rows.filter(TableVersion.name.in_(names)):
+        versions[name] = (version, updated_at)
+    return versions
+
+
+def table_validators(
+    db: Session,
+    tables: Iterable[str],
+    *key: Any,
+    updated_at: Optional[datetime] = None,
+) -> CacheValidators:
+    """Validators for a response built from the given tables.
+
+    Args:
+        db: Database session
+        tables: Tables the response is read from
+        key: Anything else the response depends on (query, viewer role)
+        updated_at: Row timestamp for single-row responses
+    """
+    versions = get_table_versions(db, tables)
+    timestamps = [ts for _, ts in versions.values() if ts is not None]
+    if updated_at is not None:
+        timestamps.append(updated_at)
+
+    last_modified = max(timestamps, key=as_utc) if timestamps else None
+
+    etag = weak_etag(
+        sorted((name, version) for name, (version, _) in versions.items()),
+        updated_at.isoformat() if updated_at else None,
+        *key,
+    )
+    return CacheValidators(etag=etag, last_modified=last_modified)
@@ -0,0 +1,249 @@
+"""
+Denormalized unread message counters
+
+``User.unread_messages`` counts the messages a user received and has not
+read, so the header badge reads one column instead of running ``COUNT(*)``
+over ``messages`` on every page load. Like ``lot_counters``, deltas are
+collected per transaction and applied in one batch just before commit:
+
+- ORM flushes that add, delete or change ``is_read`` of a message are
+  picked up by session listeners
+- bulk statements (the chat writer's batch INSERT, ``mark_read``) bypass
+  the ORM and report their deltas with ``record_unread``
+
+``recount_unread_counters`` repairs drift with one grouped query over the
+partial ``ix_messages_unread`` index.
+"""
+
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import (
+    and_,
+    bindparam,
+    case,
+    event,
+    false,
+    func,
+    inspect,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from ..core.logging import get_logger
+from ..models import Message, User
+
+logger = get_logger(__name__)
+
+# Session.info key holding the pending deltas of the current transaction
+DELTAS_KEY = "unread_message_deltas"
+
+
+def _is_unread(is_read: Any) -> bool:
+    return not is_read
+
+
+def _previous(message: Message, attr: str) -> Any:
+    """Value of a message attribute before the pending changes"""
+    history = inspect(message).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(message, attr)
+
+
+def _keep_replaced_value(target: Message, value: Any, oldvalue: Any, initiator: Any):
+    return value
+
+
+for _attr in (Message.is_read, Message.receiver_id):
+    event.listen(_attr, "set", _keep_replaced_value, active_history=True)
+
+
+def record_unread(session: Session, deltas: Dict[int, int]) -> None:
+    """Add per-receiver deltas to the transaction's pending counter changes"""
+    pending = session.info.setdefault(DELTAS_KEY, Counter())
+    pending.update(deltas)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_unread_deltas(session: Session, flush_context: Any) -> None:
+    """Accumulate counter deltas from the messages touched by this flush"""
+    deltas: Counter = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, Message) and _is_unread(obj.is_read):
+            deltas[obj.receiver_id] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Message) and _is_unread(_previous(obj, "is_read")):
+            deltas[_previous(obj, "receiver_id")] -= 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, Message) or obj in session.deleted:
+            continue
+        if _is_unread(_previous(obj, "is_read")):
+            deltas[_previous(obj, "receiver_id")] -= 1
+        if _is_unread(obj.is_read):
+            deltas[obj.receiver_id] += 1
+
+    if deltas:
+        record_unread(session, deltas)
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_unread_deltas(session: Session) -> None:
+    """Apply the transaction's counter deltas with one executemany"""
+    # Flush first so changes still pending at commit time are counted too
+    session.flush()
+    deltas = session.info.pop(DELTAS_KEY, None)
+    if not deltas:
+        return
+
+    # Sorted ids keep row lock order stable across concurrent transactions
+    params = [
+        {"user_id": user_id, "delta": delta}
+        for user_id, delta in sorted(deltas.items())
+        if delta
+    ]
+    if params:
+        table = User.__table__
+        session.execute(
+            table.update()
+            .where(table.c.id == bindparam("user_id"))
+            .values(
+                unread_messages=func.coalesce(table.c.unread_messages, 0)
+                + bindparam("delta")
+            ),
+            params,
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_unread_deltas(session: Session) -> None:
+    # Savepoint rollbacks are not tracked; repair-unread-counters fixes the drift
+    session.info.pop(DELTAS_KEY, None)
+
+
+def mark_read(
+    db: Session,
+    user_id: int,
+    sender_id: Optional[int] = None,
+    up_to_id: Optional[int] = None,
+) -> int:
+    """Mark a user's unread messages read with one UPDATE (caller commits).
+
+    Args:
+        db: Database session
+        user_id: Receiver whose messages are marked read
+        sender_id: Only messages from this user (one conversation)
+        up_to_id: Only messages up to this id, so messages that arrived after
+            the client rendered the conversation stay unread
+
+    Returns:
+        Number of messages marked read
+    """
+    statement = update(Message).where(
+        Message.receiver_id == user_id, Message.is_read == false()
+    )
+    if sender_id is not None:
+        statement = statement.where(Message.sender_id == sender_id)
+    if up_to_id is not None:
+        statement = statement.where(Message.id <= up_to_id)
+
+    result = db.execute(
+        statement.values(is_read=True).execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        record_unread(db, {user_id: -result.rowcount})
+    return result.rowcount
+
+
+def get_inbox(
+    db: Session, user_id: int, skip: int = 0, limit: int = 20
+) -> List[Tuple[Message, User, int]]:
+    """Latest message of each conversation, newest conversation first.
+
+    One query: a window over the user's messages partitioned by the other
+    party ranks each conversation's messages and counts its unread ones.
+
+    Returns:
+        (latest message, other party, unread messages from them) tuples
+    """
+    other_id = case(
+        (Message.sender_id == user_id, Message.receiver_id), else_=Message.sender_id
+    )
+    ranked = (
+        select(
+            Message.id.label("message_id"),
+            other_id.label("other_id"),
+            func.row_number()
+            .over(partition_by=other_id, order_by=Message.id.desc())
+            .label("position"),
+            func.sum(
+                case(
+                    (
+                        and_(
+                            Message.receiver_id == user_id,
+                            Message.is_read == false(),
+                        ),
+                        1,
+                    ),
+                    else_=0,
+                )
+            )
+            .over(partition_by=other_id)
+            .label("unread"),
+        )
+        .where(or_(Message.sender_id == user_id, Message.receiver_id == user_id))
+        .subquery()
+    )
+
+    rows = db.execute(
+        select(Message, User, ranked.c.unread)
+        .join(ranked, Message.id == ranked.c.message_id)
+        .join(User, User.id == ranked.c.other_id)
+        .where(ranked.c.position == 1)
+        .order_by(Message.id.desc())
+        .offset(skip)
+        .limit(limit)
+    ).all()
+    return [(message, other, int(unread or 0)) for message, other, unread in rows]
+
+
+def recount_unread_counters(db: Session) -> Dict[str, int]:
+    """Recompute every user's unread counter from one grouped query.
+
+    Returns:
+        Number of checked and fixed users
+    """
+    expected = dict(
+        db.query(Message.receiver_id, func.count(Message.id))
+        .filter(Message.is_read == false())
+        .group_by(Message.receiver_id)
+        .all()
+    )
+    stored = db.query(User.id, User.unread_messages).all()
+    repairs = [
+        {"user_id": user_id, "total": expected.get(user_id, 0)}
+        for user_id, unread in stored
+        if (unread or 0) != expected.get(user_id, 0)
+    ]
+
+    if repairs:
+        table = User.__table__
+        db.execute(
+            table.update()
+            .where(table.c.id == bindparam("user_id"))
+            .values(unread_messages=bindparam("total")),
+            repairs,
+        )
+    db.commit()
+
+    report = {"checked": len(stored), "fixed": len(repairs)}
+    if repairs:
+        logger.warning(f"Unread counter drift repaired: {report}")
+    return report
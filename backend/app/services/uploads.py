@@ -0,0 +1,187 @@
+"""
+Streaming image uploads
+
+``save_image_upload`` copies an ``UploadFile`` to ``UPLOAD_DIR`` in
+``UPLOAD_CHUNK_SIZE`` chunks, hashing it on the way and enforcing the size
+limit while reading instead of trusting the client supplied size, and never
+holds more than one chunk in memory. Thumbnails are stored in the
+content-addressed ``media_store``. Decoding, resizing and WebP encoding are
+CPU bound and run in a bounded ``ProcessPoolExecutor``; at most
+``IMAGE_WORKERS * 2`` images are queued at once so a burst of uploads cannot
+pile up unbounded work.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Optional
+
+from fastapi import UploadFile
+
+from ..core.config import settings
+from ..core.constants import THUMBNAIL_SIZES
+from ..core.logging import get_logger
+from ..core.validators import FileValidators, ValidationError
+from .images import ImageProcessingError, render_thumbnails
+from .media_store import blob_dir, blob_name, blob_url
+
+logger = get_logger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_slots: Optional[threading.BoundedSemaphore] = None
+
+
+@dataclass
+class ImageUpload:
+    """Thumbnails written for one uploaded image"""
+
+    kind: str
+    digest: str  # sha256 of the uploaded bytes
+    size: int  # Bytes received
+    deduplicated: bool = False  # Content was already stored
+    urls: Dict[int, str] = field(default_factory=dict)
+
+    @property
+    def url(self) -> str:
+        """URL of the largest thumbnail"""
+        return self.urls[max(self.urls)]
+
+
+def get_image_executor() -> ProcessPoolExecutor:
+    """Process pool for image work, created on first use"""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = max(1, settings.IMAGE_WORKERS)
+            # spawn: workers must not inherit the server's threads and sockets
+            _executor = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _slots = threading.BoundedSemaphore(workers * 2)
+        return _executor
+
+
+def shutdown_image_executor() -> None:
+    """Stop the image workers (application shutdown)"""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+            _slots = None
+
+
+def stream_to_file(
+    source: BinaryIO, target: BinaryIO, max_size: int, hasher: Any = None
+) -> int:
+    """Copy a stream chunk by chunk, failing as soon as max_size is exceeded"""
+    received = 0
+    while True:
+        chunk = source.read(settings.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return received
+        received += len(chunk)
+        if received > max_size:
+            raise ValidationError(
+                "file_size",
+                f"File too large. Maximum size: {max_size // (1024 * 1024)}MB",
+            )
+        if hasher is not None:
+            hasher.update(chunk)
+        target.write(chunk)
+
+
+def _render(source_path: str, dest_dir: str, stem: str, kind: str) -> Dict[int, str]:
+    sizes = THUMBNAIL_SIZES[kind]
+    if settings.IMAGE_WORKERS <= 0:
+        # Inline processing (single process deployments, debugging)
+        return render_thumbnails(
+            source_path, dest_dir, stem, sizes, settings.IMAGE_MAX_PIXELS
+        )
+
+    executor = get_image_executor()
+    slots = _slots
+    slots.acquire()
+    try:
+        future = executor.submit(
+            render_thumbnails,
+            source_path,
+            dest_dir,
+            stem,
+            sizes,
+            settings.IMAGE_MAX_PIXELS,
+        )
+        return future.result(timeout=settings.IMAGE_PROCESSING_TIMEOUT)
+    finally:
+        slots.release()
+
+
+def save_image_upload(file: UploadFile, kind: str) -> ImageUpload:
+    """Store an uploaded image as WebP thumbnails in the media store.
+
+    The upload is hashed while it is streamed to disk; content that is
+    already stored is not rendered again. The caller registers the blob
+    with ``media_store.register_blob``.
+
+    Blocking: call from a sync endpoint (FastAPI runs it in the threadpool).
+
+    Raises:
+        ValidationError: Bad extension, too large or not a decodable image
+    """
+    max_size = min(settings.MAX_FILE_SIZE, FileValidators.MAX_IMAGE_SIZE)
+    FileValidators.validate_image_file(file.filename or "", 0)
+
+    tmp_dir = os.path.join(settings.UPLOAD_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    stem = uuid.uuid4().hex
+    tmp_path = os.path.join(tmp_dir, f"{stem}.upload")
+    hasher = hashlib.sha256()
+    rendered: Dict[int, str] = {}
+    try:
+        with open(tmp_path, "wb") as target:
+            size = stream_to_file(file.file, target, max_size, hasher)
+        if not size:
+            raise ValidationError("file", "File is empty")
+
+        digest = hasher.hexdigest()
+        dest_dir = blob_dir(kind, digest)
+        sizes = THUMBNAIL_SIZES[kind]
+        deduplicated = all(
+            os.path.exists(os.path.join(dest_dir, blob_name(digest, s))) for s in sizes
+        )
+
+        if not deduplicated:
+            try:
+                rendered = _render(tmp_path, tmp_dir, stem, kind)
+            except ImageProcessingError as exc:
+                logger.info(f"Rejected upload {file.filename!r}: {exc}")
+                raise ValidationError("file", "File is not a valid image")
+
+            # Rendered under a unique name, then renamed: identical uploads
+            # racing each other replace a complete file with an equal one
+            os.makedirs(dest_dir, exist_ok=True)
+            for s, name in rendered.items():
+                os.replace(
+                    os.path.join(tmp_dir, name),
+                    os.path.join(dest_dir, blob_name(digest, s)),
+                )
+            rendered = {}
+    finally:
+        for name in [f"{stem}.upload", *rendered.values()]:
+            path = os.path.join(tmp_dir, name)
+            if os.path.exists(path):
+                os.unlink(path)
+
+    return ImageUpload(
+        kind=kind,
+        digest=digest,
+        size=size,
+        deduplicated=deduplicated,
+        urls={s: blob_url(kind, digest, s) for s in sizes},
+    )
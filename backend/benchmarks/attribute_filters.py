@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark item_details attribute filters on a large seeded lots table.
+
+Run from the backend directory against the database in DATABASE_URL
+(PostgreSQL for the GIN index, SQLite works for a rough baseline):
+
+    python benchmarks/attribute_filters.py --rows 2000000
+    python benchmarks/attribute_filters.py --skip-seed --repeat 20
+
+On PostgreSQL every case is also timed with bitmap scans disabled, which
+shows what the jsonb_path_ops index buys.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath("."))
+
+from sqlalchemy import func, select, text
+
+from app.core.database import Base, engine
+from app.models import Category, CategoryClosure, Game, Lot, LotStatus, User
+from app.services.attribute_filters import (
+    compile_attribute_filters,
+    parse_attribute_filters,
+)
+
+SCHEMA = {"server": "string", "level": "integer", "rank": "string", "ranked": "boolean"}
+SERVERS = ["EU-West", "EU-East", "US-East", "US-West", "Asia", "OCE", "SA", "RU"]
+RANKS = ["bronze", "silver", "gold", "platinum", "diamond", "master"]
+
+CASES = {
+    "eq": ["server:eq:OCE"],
+    "eq+eq": ["server:eq:EU-West", "rank:eq:master"],
+    "in": ["rank:in:diamond,master"],
+    "range": ["level:gte:95"],
+    "eq+range": ["server:eq:SA", "level:gte:90"],
+}
+
+
+def seed(rows: int, batch_size: int, rng: random.Random) -> int:
+    """Insert a seller, game, category and `rows` lots; returns category id"""
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        seller_id = conn.execute(
+            User.__table__.insert().values(
+                username=f"bench_{rng.randrange(10**9)}",
+                email=f"bench_{rng.randrange(10**9)}@example.com",
+                hashed_password="x",
+            )
+        ).inserted_primary_key[0]
+        game_id = conn.execute(
+            Game.__table__.insert().values(name="Benchmark Game")
+        ).inserted_primary_key[0]
+        category_id = conn.execute(
+            Category.__table__.insert().values(
+                name="Accounts", game_id=game_id, attribute_schema=SCHEMA
+            )
+        ).inserted_primary_key[0]
+        conn.execute(
+            CategoryClosure.__table__.insert().values(
+                ancestor_id=category_id, descendant_id=category_id, depth=0
+            )
+        )
+
+    # Skewed server popularity, roughly like production traffic
+    weights = [40, 15, 20, 10, 8, 3, 2, 2]
+    for start in range(0, rows, batch_size):
+        batch = []
+        for _ in range(min(batch_size, rows - start)):
+            batch.append(
+                {
+                    "title": "Account",
+                    "description": "Seeded benchmark lot",
+                    "price": rng.randint(1, 100000) / 100,
+                    "seller_id": seller_id,
+                    "game_id": game_id,
+                    "category_id": category_id,
+                    "status": LotStatus.ACTIVE,
+                    "item_details": {
+                        "server": rng.choices(SERVERS, weights)[0],
+                        "level": rng.randint(1, 100),
+                        "rank": rng.choice(RANKS),
+                        "ranked": rng.random() < 0.3,
+                    },
+                }
+            )
+        with engine.begin() as conn:
+            conn.execute(Lot.__table__.insert(), batch)
+        print(f"seeded {start + len(batch)}/{rows}", file=sys.stderr)
+
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE lots"))
+
+    return category_id
+
+
+def run_case(category_id: int, raw_filters: list, repeat: int, setup: str = None):
+    """Median count and first-page latency in milliseconds"""
+    filters = parse_attribute_filters(raw_filters, SCHEMA)
+    criteria = compile_attribute_filters(filters, engine.dialect.name)
+    where = [Lot.category_id == category_id, *criteria]
+
+    count_query = select(func.count(Lot.id)).where(*where)
+    page_query = select(Lot.id).where(*where).order_by(Lot.id.desc()).limit(50)
+
+    timings = {"count": [], "page": []}
+    with engine.connect() as conn:
+        if setup:
+            conn.execute(text(setup))
+        for _ in range(repeat):
+            for name, query in (("count", count_query), ("page", page_query)):
+                started = time.perf_counter()
+                result = conn.execute(query).all()
+                timings[name].append((time.perf_counter() - started) * 1000)
+        matched = conn.execute(count_query).scalar()
+
+    return {
+        "matched": matched,
+        "count_ms": round(statistics.median(timings["count"]), 2),
+        "page_ms": round(statistics.median(timings["page"]), 2),
+        "page_rows": len(result),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.skip_seed:
+        with engine.connect() as conn:
+            category_id = conn.execute(
+                select(Category.id)
+                .where(
+                    Category.name == "Accounts", Category.attribute_schema.isnot(None)
+                )
+                .order_by(Category.id.desc())
+            ).scalar()
+    else:
+        category_id = seed(args.rows, args.batch_size, rng)
+
+    results = {}
+    for name, raw_filters in CASES.items():
+        results[name] = {"indexed": run_case(category_id, raw_filters, args.repeat)}
+        if engine.dialect.name == "postgresql":
+            results[name]["no_bitmap_scan"] = run_case(
+                category_id,
+                raw_filters,
+                args.repeat,
+                setup="SET enable_bitmapscan = off",
+            )
+
+    print(
+        json.dumps(
+            {"dialect": engine.dialect.name, "rows": args.rows, "cases": results},
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Measure cache hit latency per tier of the cache shared by workers.
+
+Run from the backend directory (no database needed):
+
+    python benchmarks/cache_tiers.py
+    python benchmarks/cache_tiers.py --facets 10,100 --writers 3
+    python benchmarks/cache_tiers.py --redis-url redis://localhost:6379/15
+
+A facet-shaped value (--facets value counts per filter) is read through:
+
+- ttl_cache: a plain in-process TTLCache
+- local: a TieredCache hit served from the worker's own copy
+- shm: a hit in the shared memory segment (no local copy: CACHE_LOCAL_TTL 0)
+- redis: the same through a Redis-compatible server, with --redis-url
+- miss: a key found in neither tier (shm)
+
+Each call is timed on its own for --calls calls after a warmup; the report
+has p50/p99/mean in microseconds per tier and value size, and the pickled
+size of the value. --writers processes keep updating other keys of the
+segment meanwhile, so reads contend for its locks and replay their
+invalidations as they would under load.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath("."))
+
+from app.core.cache import RedisCache, SharedMemoryCache, TieredCache, TTLCache
+
+
+def facets(values: int) -> Dict[str, Any]:
+    """A facet response like get_lot_facets, values counts per filter"""
+    return {
+        "total": values * 10,
+        "price": {"min": 1.5, "max": 999.0},
+        "facets": {
+            name: [
+                {"value": f"{name}-{number}", "count": number}
+                for number in range(values)
+            ]
+            for name in ("server", "rarity", "level")
+        },
+    }
+
+
+def measure(get: Callable[[str], Any], key: str, calls: int) -> Dict[str, float]:
+    for _ in range(min(calls, 1000)):
+        get(key)
+    timings = []
+    clock = time.perf_counter_ns
+    for _ in range(calls):
+        started = clock()
+        get(key)
+        timings.append(clock() - started)
+    timings.sort()
+    return {
+        "p50_us": round(timings[len(timings) // 2] / 1000, 2),
+        "p99_us": round(timings[int(len(timings) * 0.99)] / 1000, 2),
+        "mean_us": round(statistics.fmean(timings) / 1000, 2),
+    }
+
+
+def write_forever(path: str, slots: int, slot_size: int, value: Any) -> None:
+    cache = TieredCache("writer", SharedMemoryCache(path, slots, slot_size), ttl=60)
+    number = 0
+    while True:
+        cache.set(f"key{number % 1000}", value)
+        number += 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--facets",
+        default="5,50",
+        help="Comma-separated value counts per filter (value sizes)",
+    )
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--writers", type=int, default=0, help="Writer processes")
+    parser.add_argument("--slot-size", type=int, default=16384)
+    parser.add_argument("--slots", type=int, default=4096)
+    parser.add_argument("--redis-url", help="Also measure a Redis-compatible server")
+    args = parser.parse_args()
+
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    segment = tempfile.NamedTemporaryFile(prefix="cache-bench-", dir=directory)
+    shm = SharedMemoryCache(segment.name, args.slots, args.slot_size)
+    redis_cache: Optional[RedisCache] = (
+        RedisCache(args.redis_url, prefix="cache_bench:") if args.redis_url else None
+    )
+
+    writers = []
+    for _ in range(args.writers):
+        writer = multiprocessing.get_context("fork").Process(
+            target=write_forever,
+            args=(segment.name, args.slots, args.slot_size, facets(5)),
+            daemon=True,
+        )
+        writer.start()
+        writers.append(writer)
+
+    results: List[dict] = []
+    try:
+        for values in [int(count) for count in args.facets.split(",")]:
+            value = facets(values)
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            if size > args.slot_size - SharedMemoryCache.SLOT_HEADER.size:
+                print(f"{values} values: {size} bytes exceed a slot", file=sys.stderr)
+
+            plain = TTLCache(ttl=60)
+            plain.set("key", value)
+            tiers: Dict[str, Callable[[str], Any]] = {"ttl_cache": plain.get}
+            local = TieredCache("bench", shm, ttl=60, local_ttl=60)
+            local.set("key", value)
+            tiers["local"] = local.get
+            shared = TieredCache("bench", shm, ttl=60, local_ttl=0)
+            tiers["shm"] = shared.get
+            if redis_cache is not None:
+                remote = TieredCache("bench", redis_cache, ttl=60, local_ttl=0)
+                remote.set("key", value)
+                tiers["redis"] = remote.get
+
+            for tier, get in tiers.items():
+                print(f"{values} values, {tier}...", file=sys.stderr)
+                results.append(
+                    {
+                        "tier": tier,
+                        "facet_values": values,
+                        "value_bytes": size,
+                        **measure(get, "key", args.calls),
+                    }
+                )
+            print(f"{values} values, miss...", file=sys.stderr)
+            results.append(
+                {
+                    "tier": "miss",
+                    "facet_values": values,
+                    "value_bytes": 0,
+                    **measure(shared.get, "missing", args.calls),
+                }
+            )
+    finally:
+        for writer in writers:
+            writer.terminate()
+        if redis_cache is not None:
+            redis_cache.delete(remote._digest("key"))
+            redis_cache.close()
+        shm.close()
+        segment.close()
+
+    report = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "calls": args.calls,
+        "writers": args.writers,
+        "slot_size": args.slot_size,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark chat fan-out throughput with thousands of connected clients.
+
+Run from the backend directory:
+
+    python benchmarks/chat_fanout.py
+    python benchmarks/chat_fanout.py --users 10000 --sockets-per-user 2 --slow 0.01
+    python benchmarks/chat_fanout.py --persist
+
+Sockets are in-memory stand-ins that accept frames immediately; "slow" ones
+never finish a send, so their queues fill and ChatHub drops them. Messages
+between random pairs of users go through ChatHub.deliver in batches of
+--batch (what MessageWriter publishes). With --persist they take the full
+path instead: ChatHub.receive, batched INSERT into a scratch in-memory
+SQLite database, then delivery.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath("."))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import User
+from app.services.chat import ChatConnection, ChatHub, MessageWriter
+
+
+class Socket:
+    def __init__(self, slow: bool):
+        self.slow = slow
+        self.frames = 0
+        self.application_state = None
+
+    async def send_text(self, text: str) -> None:
+        if self.slow:
+            await asyncio.Event().wait()
+        self.frames += 1
+
+    async def close(self, code: int) -> None:
+        pass
+
+
+def scratch_sessions(users: int) -> sessionmaker:
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.bulk_insert_mappings(
+            User,
+            [
+                {
+                    "id": i,
+                    "username": f"user{i}",
+                    "email": f"user{i}@example.com",
+                    "hashed_password": "x",
+                    "is_active": True,
+                }
+                for i in range(1, users + 1)
+            ],
+        )
+        db.commit()
+    return factory
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    writer = MessageWriter(
+        scratch_sessions(args.users) if args.persist else None,
+        batch_size=args.batch,
+    )
+    hub = ChatHub(writer, queue_size=args.queue_size)
+    await hub.start()
+
+    sockets, all_connections, connections = [], [], {}
+    for user_id in range(1, args.users + 1):
+        for _ in range(args.sockets_per_user):
+            socket = Socket(slow=rng.random() < args.slow)
+            connection = ChatConnection(socket, user_id, args.queue_size)
+            connection.start()
+            hub._connections.setdefault(user_id, set()).add(connection)
+            connections.setdefault(user_id, connection)
+            all_connections.append(connection)
+            sockets.append(socket)
+
+    pairs = [
+        tuple(rng.sample(range(1, args.users + 1), 2)) for _ in range(args.messages)
+    ]
+    expected = sum(
+        1 for sender, receiver in pairs for _ in range(args.sockets_per_user * 2)
+    )
+
+    started = time.perf_counter()
+    if args.persist:
+        for sender, receiver in pairs:
+            frame = json.dumps(
+                {
+                    "type": "message",
+                    "receiver_id": receiver,
+                    "content": "Hi, still for sale?",
+                }
+            )
+            await hub.receive(connections[sender], frame)
+    else:
+        for offset in range(0, len(pairs), args.batch):
+            deliveries = [
+                {
+                    "recipients": [sender, receiver],
+                    "payload": {
+                        "type": "message",
+                        "message": {
+                            "sender_id": sender,
+                            "receiver_id": receiver,
+                            "content": "Hi, still for sale?",
+                        },
+                    },
+                }
+                for sender, receiver in pairs[offset : offset + args.batch]
+            ]
+            await hub.deliver({"deliveries": deliveries})
+            await asyncio.sleep(0)  # Let the socket senders drain
+
+    fast = [socket for socket in sockets if not socket.slow]
+    fast_expected = expected * len(fast) / len(sockets)
+    while sum(socket.frames for socket in fast) < fast_expected * 0.999:
+        await asyncio.sleep(0.001)
+        if time.perf_counter() - started > args.timeout:
+            break
+    elapsed = time.perf_counter() - started
+
+    delivered = sum(socket.frames for socket in sockets)
+    dropped = sum(1 for connection in all_connections if connection.dropped)
+    await hub.stop()
+
+    return {
+        "users": args.users,
+        "sockets": len(sockets),
+        "slow_sockets": len(sockets) - len(fast),
+        "messages": args.messages,
+        "persisted": args.persist,
+        "frames_delivered": delivered,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(args.messages / elapsed),
+        "frames_per_second": round(delivered / elapsed),
+        "sockets_dropped": dropped,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--sockets-per-user", type=int, default=2)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument(
+        "--slow", type=float, default=0.0, help="Fraction of slow sockets"
+    )
+    parser.add_argument("--persist", action="store_true")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
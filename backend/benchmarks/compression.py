@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Benchmark CPU cost against bytes saved when compressing lot listing pages.
+
+Run from the backend directory (no database needed):
+
+    python benchmarks/compression.py
+    python benchmarks/compression.py --items 100 --repeat 200 --sellers 10
+
+Pages are serialized with the real PaginatedResponse[LotResponse] schema, so
+the nested seller/game/category objects repeat the way they do in get_lots.
+Each codec and level is timed one-shot (what CompressionMiddleware does for a
+buffered JSON response) and streamed with a flush per item (what it does for
+a streaming response).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath("."))
+
+from app.core.middleware import ResponseEncoder, brotli
+from app.schemas import LotResponse, PaginatedResponse
+
+GZIP_LEVELS = (1, 4, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 11)
+
+
+def build_page(items: int, sellers: int, rng: random.Random) -> bytes:
+    """JSON body of one get_lots page"""
+    now = datetime.now(timezone.utc)
+    game = {
+        "id": 1,
+        "name": "World of Warcraft",
+        "slug": "world-of-warcraft",
+        "description": "Massively multiplayer online role-playing game",
+        "developer": "Blizzard Entertainment",
+        "publisher": "Blizzard Entertainment",
+        "genres": ["MMORPG", "Fantasy"],
+        "platforms": ["PC", "Mac"],
+        "image_url": "/static/game_images/wow.webp",
+        "total_lots": 125000,
+        "is_popular": True,
+        "is_active": True,
+        "created_at": now - timedelta(days=900),
+    }
+    category = {
+        "id": 3,
+        "name": "Accounts",
+        "slug": "accounts",
+        "game_id": 1,
+        "total_lots": 48000,
+        "is_active": True,
+        "sort_order": 1,
+        "created_at": now - timedelta(days=800),
+    }
+    seller_pool = [
+        {
+            "id": 100 + i,
+            "username": f"seller_{i}",
+            "email": f"seller_{i}@example.com",
+            "display_name": f"Seller {i}",
+            "bio": "Fast delivery, 24/7 online",
+            "avatar_url": f"/static/avatars/{i:02x}/{i:02x}/{'ab' * 32}_256.webp",
+            "is_verified": True,
+            "role": "seller",
+            "rating": round(rng.uniform(4, 5), 2),
+            "total_reviews": rng.randrange(2000),
+            "total_sales": rng.randrange(5000),
+            "created_at": now - timedelta(days=rng.randrange(1000)),
+        }
+        for i in range(sellers)
+    ]
+
+    lots = []
+    for i in range(items):
+        seller = rng.choice(seller_pool)
+        lots.append(
+            {
+                "id": 10_000 + i,
+                "title": f"Level {rng.randint(60, 80)} account, "
+                f"{rng.randint(1, 30)} mounts",
+                "description": "Full access, original email included. "
+                * rng.randint(1, 4),
+                "price": f"{rng.randint(500, 50000) / 100:.2f}",
+                "delivery_time": "Instant",
+                "is_auto_delivery": rng.random() < 0.4,
+                "seller_id": seller["id"],
+                "game_id": 1,
+                "category_id": 3,
+                "item_details": {
+                    "server": rng.choice(["EU-West", "US-East", "Asia"]),
+                    "level": rng.randint(60, 80),
+                },
+                "images": [f"/static/lot_images/{rng.getrandbits(256):064x}_640.webp"],
+                "status": "active",
+                "views": rng.randrange(10000),
+                "favorites": rng.randrange(500),
+                "created_at": now - timedelta(minutes=rng.randrange(100000)),
+                "seller": seller,
+                "game": game,
+                "category": category,
+            }
+        )
+
+    page = PaginatedResponse[LotResponse].model_validate(
+        {"items": lots, "total": 48000, "skip": 0, "limit": items}
+    )
+    return page.model_dump_json().encode()
+
+
+def measure(body: bytes, coding: str, level: int, repeat: int, chunks: list) -> dict:
+    gzip_level = level if coding == "gzip" else 6
+    brotli_quality = level if coding == "br" else 4
+
+    one_shot, streamed = [], []
+    for _ in range(repeat):
+        started = time.process_time()
+        encoder = ResponseEncoder(coding, gzip_level, brotli_quality)
+        compressed = encoder.compress(body) + encoder.finish()
+        one_shot.append((time.process_time() - started) * 1000)
+
+        started = time.process_time()
+        encoder = ResponseEncoder(coding, gzip_level, brotli_quality)
+        streamed_size = sum(len(encoder.compress(c, flush=True)) for c in chunks)
+        streamed_size += len(encoder.finish())
+        streamed.append((time.process_time() - started) * 1000)
+
+    return {
+        "bytes": len(compressed),
+        "ratio": round(len(body) / len(compressed), 2),
+        "saved_bytes": len(body) - len(compressed),
+        "cpu_ms": round(statistics.median(one_shot), 3),
+        "streamed_bytes": streamed_size,
+        "streamed_cpu_ms": round(statistics.median(streamed), 3),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--sellers", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    body = build_page(args.items, args.sellers, random.Random(args.seed))
+    # One chunk per lot, as a streaming serializer would emit them
+    items = json.loads(body)["items"]
+    chunks = [json.dumps(item).encode() for item in items]
+
+    results = {}
+    for level in GZIP_LEVELS:
+        results[f"gzip-{level}"] = measure(body, "gzip", level, args.repeat, chunks)
+    if brotli is not None:
+        for quality in BROTLI_QUALITIES:
+            results[f"br-{quality}"] = measure(body, "br", quality, args.repeat, chunks)
+    else:
+        print("brotli not installed, skipping br", file=sys.stderr)
+
+    print(
+        json.dumps(
+            {
+                "items": args.items,
+                "page_bytes": len(body),
+                "zlib_version": zlib.ZLIB_VERSION,
+                "codecs": results,
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Load-test the HTTP API with realistic traffic mixes and compare runs.
+
+Run from the backend directory against a seeded database (seed_data.py) in
+DATABASE_URL:
+
+    python benchmarks/http_load.py                       # in-process ASGI app
+    python benchmarks/http_load.py --target uvicorn --workers 4
+    python benchmarks/http_load.py --url http://127.0.0.1:8000
+    python benchmarks/http_load.py --mix browse=70,detail=30 --output new.json
+    python benchmarks/http_load.py --baseline base.json --threshold 10
+    python benchmarks/http_load.py --report new.json --baseline base.json
+
+Virtual users (--concurrency) send requests back to back for --duration
+seconds after a --warmup. Each request comes from a scenario picked by the
+mix weights:
+
+- browse: lot listings (filtered by game, sorted, paged), facets, games
+- detail: one lot, popular lots far more often
+- login: JSON login of a seeded user (bcrypt is part of the cost)
+- order: an order for an active lot of another seller (writes rows, so use
+  a scratch database)
+
+``--target asgi`` drives ``app.main.app`` through httpx without sockets,
+``uvicorn`` starts the production server (serve.py, ``--workers``
+processes) and ``--url`` uses a running one on the same database. The JSON
+report has RPS, errors (status >= 400 or no response) and p50/p95/p99
+latency per endpoint. With --baseline, endpoints whose RPS drops or
+p50/p95 latency grows by more than --threshold percent (and more than
+--min-delta-ms), whose share of errors grows by more than --error-threshold
+percentage points, or that are missing from the run are listed under
+``comparison.regressions`` and the script exits with status 1.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath("."))
+
+# A load test sends far more requests per minute than a client may
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+from sqlalchemy import select
+
+from app.core.auth import create_access_token
+from app.core.constants import API_V1_PREFIX
+from app.core.database import SessionLocal
+from app.models import Game, Lot, LotStatus, User
+
+MIXES = {
+    "default": {"browse": 55, "detail": 30, "login": 5, "order": 10},
+    "browse": {"browse": 70, "detail": 30},
+    "checkout": {"detail": 40, "login": 20, "order": 40},
+}
+
+# Metrics compared against a baseline; True when higher is better
+COMPARED_METRICS = {"rps": True, "p50_ms": False, "p95_ms": False}
+
+
+@dataclass
+class Context:
+    """Ids sampled from the database that the scenarios request"""
+
+    password: str
+    game_ids: List[int]
+    lots: List[Tuple[int, int]]  # (id, seller_id), most viewed first
+    users: List[Tuple[int, str, str]]  # (id, username, access token)
+
+
+@dataclass
+class Results:
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: Dict[str, Dict[str, int]] = field(
+        default_factory=lambda: defaultdict(lambda: defaultdict(int))
+    )
+
+
+def load_context(args: argparse.Namespace) -> Context:
+    with SessionLocal() as db:
+        game_ids = db.scalars(
+            select(Game.id).where(Game.is_active.is_(True)).limit(args.sample)
+        ).all()
+        lots = db.execute(
+            select(Lot.id, Lot.seller_id)
+            .where(Lot.status == LotStatus.ACTIVE)
+            .order_by(Lot.views.desc())
+            .limit(args.sample)
+        ).all()
+        users = db.execute(
+            select(User.id, User.username)
+            .where(User.is_active.is_(True))
+            .order_by(User.id)
+            .limit(args.sample)
+        ).all()
+
+    if not (game_ids and lots and len(users) > 1):
+        raise SystemExit("Seed the database first: python seed_data.py --scale 0.01")
+    return Context(
+        password=args.password,
+        game_ids=list(game_ids),
+        lots=[tuple(lot) for lot in lots],
+        users=[
+            (
+                user_id,
+                username,
+                create_access_token({"sub": username, "user_id": user_id}),
+            )
+            for user_id, username in users
+        ],
+    )
+
+
+def popular(rng: random.Random, items: List[Any]) -> Any:
+    """Skewed pick: the first items (most viewed lots) are requested most"""
+    return items[int(len(items) * rng.random() ** 3)]
+
+
+async def browse(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    game_id = rng.choice(ctx.game_ids)
+    roll = rng.random()
+    if roll < 0.5:
+        params = {
+            "game_id": game_id,
+            "limit": 20,
+            "skip": 20 * int(rng.random() ** 4 * 10),
+        }
+        params["sort_by"], params["sort_order"] = rng.choice(
+            [("created_at", "desc"), ("price", "asc"), ("price", "desc")]
+        )
+        return "GET /lots", await client.get(f"{API_V1_PREFIX}/lots/", params=params)
+    if roll < 0.7:
+        return "GET /lots", await client.get(
+            f"{API_V1_PREFIX}/lots/", params={"limit": 20}
+        )
+    if roll < 0.9:
+        return "GET /lots/facets", await client.get(
+            f"{API_V1_PREFIX}/lots/facets", params={"game_id": game_id}
+        )
+    return "GET /games", await client.get(
+        f"{API_V1_PREFIX}/games/", params={"limit": 50}
+    )
+
+
+async def detail(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    lot_id, _ = popular(rng, ctx.lots)
+    return "GET /lots/{id}", await client.get(f"{API_V1_PREFIX}/lots/{lot_id}")
+
+
+async def login(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    _, username, _ = rng.choice(ctx.users)
+    return "POST /auth/login/json", await client.post(
+        f"{API_V1_PREFIX}/auth/login/json",
+        json={"username": username, "password": ctx.password},
+    )
+
+
+async def order(client: httpx.AsyncClient, ctx: Context, rng: random.Random):
+    lot_id, seller_id = popular(rng, ctx.lots)
+    buyer = rng.randrange(len(ctx.users))
+    if ctx.users[buyer][0] == seller_id:  # Sellers cannot buy their own lots
+        buyer = (buyer + 1) % len(ctx.users)
+    _, _, token = ctx.users[buyer]
+    return "POST /orders", await client.post(
+        f"{API_V1_PREFIX}/orders/",
+        json={"lot_id": lot_id, "buyer_message": "Load test order"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+
+SCENARIOS = {"browse": browse, "detail": detail, "login": login, "order": order}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    ctx: Context,
+    mix: Dict[str, float],
+    rng: random.Random,
+    deadline: float,
+    results: Optional[Results],
+) -> None:
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        scenario = SCENARIOS[rng.choices(names, weights)[0]]
+        started = time.perf_counter()
+        try:
+            label, response = await scenario(client, ctx, rng)
+            status = str(response.status_code)
+        except httpx.HTTPError as exc:
+            label, status = scenario.__name__, type(exc).__name__
+        if results is not None:
+            results.latencies[label].append((time.perf_counter() - started) * 1000)
+            results.statuses[label][status] += 1
+
+
+async def run_phase(
+    client: httpx.AsyncClient,
+    ctx: Context,
+    args: argparse.Namespace,
+    seconds: float,
+    results: Optional[Results],
+) -> float:
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            virtual_user(
+                client, ctx, args.mix, random.Random(rng.random()), deadline, results
+            )
+            for _ in range(args.concurrency)
+        )
+    )
+    return time.perf_counter() - started
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    return ordered[
+        max(0, min(len(ordered) - 1, int(len(ordered) * fraction + 0.5) - 1))
+    ]
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], seconds: float) -> dict:
+    ordered = sorted(latencies)
+    errors = sum(
+        count
+        for status, count in statuses.items()
+        if not status.isdigit() or int(status) >= 400
+    )
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "error_pct": round(errors / len(ordered) * 100, 2),
+        "rps": round(len(ordered) / seconds, 1),
+        "mean_ms": round(sum(ordered) / len(ordered), 2),
+        "p50_ms": round(percentile(ordered, 0.50), 2),
+        "p95_ms": round(percentile(ordered, 0.95), 2),
+        "p99_ms": round(percentile(ordered, 0.99), 2),
+        "status": dict(sorted(statuses.items())),
+    }
+
+
+def build_report(results: Results, seconds: float, args: argparse.Namespace) -> dict:
+    everything: List[float] = []
+    statuses: Dict[str, int] = defaultdict(int)
+    endpoints = {}
+    for label in sorted(results.latencies):
+        everything.extend(results.latencies[label])
+        for status, count in results.statuses[label].items():
+            statuses[status] += count
+        endpoints[label] = summarize(
+            results.latencies[label], results.statuses[label], seconds
+        )
+    return {
+        "target": args.url or args.target,
+        "workers": args.workers if args.target == "uvicorn" and not args.url else None,
+        "mix": args.mix,
+        "concurrency": args.concurrency,
+        "seconds": round(seconds, 2),
+        "total": summarize(everything, statuses, seconds) if everything else {},
+        "endpoints": endpoints,
+    }
+
+
+def error_pct(summary: dict) -> float:
+    # Reports saved before error_pct was added only have the counts
+    if "error_pct" in summary:
+        return summary["error_pct"]
+    requests = summary.get("requests") or 0
+    return round(summary["errors"] / requests * 100, 2) if requests else 0.0
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    threshold: float,
+    min_delta_ms: float,
+    error_threshold: float = 1.0,
+) -> dict:
+    """Per-endpoint changes in percent and the ones beyond the threshold"""
+    changes, regressions = {}, []
+    for label, before in baseline.get("endpoints", {}).items():
+        after = current.get("endpoints", {}).get(label)
+        if after is None:
+            regressions.append(f"{label}: missing from the current report")
+            continue
+        changes[label] = {}
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before[metric], after[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            changes[label][metric] = {
+                "baseline": old,
+                "current": new,
+                "change_pct": round(change, 1),
+            }
+            worse = -change if higher_is_better else change
+            if worse > threshold and (higher_is_better or new - old > min_delta_ms):
+                regressions.append(f"{label} {metric}: {old} -> {new} ({change:+.1f}%)")
+
+        # Failing fast looks like more RPS and less latency
+        old, new = error_pct(before), error_pct(after)
+        changes[label]["error_pct"] = {
+            "baseline": old,
+            "current": new,
+            "change_points": round(new - old, 2),
+        }
+        if new - old > error_threshold:
+            regressions.append(f"{label} error_pct: {old} -> {new}")
+    return {
+        "threshold_pct": threshold,
+        "error_threshold_points": error_threshold,
+        "regressions": regressions,
+        "endpoints": changes,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, *options: str) -> Tuple[subprocess.Popen, str]:
+    """serve.py on a free local port, once it answers"""
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "serve.py",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            *options,
+        ],
+        stdout=subprocess.DEVNULL,  # The app's console log
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"serve.py exited with status {server.returncode}")
+        try:
+            if httpx.get(f"{url}/health").status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("serve.py did not start within 60 seconds")
+
+
+async def measure(args: argparse.Namespace) -> dict:
+    ctx = load_context(args)
+    server = None
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60)
+    elif args.target == "uvicorn":
+        server, url = start_server(args.workers)
+        client = httpx.AsyncClient(base_url=url, limits=limits, timeout=60)
+    else:
+        from app.main import app
+
+        # Keep the per-request console log off the JSON report (files still get it)
+        for handler in logging.getLogger().handlers:
+            if getattr(handler, "stream", None) is sys.stdout:
+                handler.setLevel(logging.WARNING)
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60
+        )
+
+    try:
+        async with client:
+            if args.warmup:
+                print(f"Warming up for {args.warmup}s...", file=sys.stderr)
+                await run_phase(client, ctx, args, args.warmup, None)
+            print(f"Measuring for {args.duration}s...", file=sys.stderr)
+            results = Results()
+            seconds = await run_phase(client, ctx, args, args.duration, results)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return build_report(results, seconds, args)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--url", help="Load a running server instead")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn processes")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=MIXES["default"],
+        help=f"One of {', '.join(MIXES)} or weights like browse=70,detail=30",
+    )
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--sample", type=int, default=5000, help="Ids loaded per table")
+    parser.add_argument("--password", default="password123", help="Of seeded users")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the report to this file")
+    parser.add_argument("--report", help="Compare this saved report, do not run")
+    parser.add_argument("--baseline", help="Report to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="Percent")
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=1.0,
+        help="Latency changes below this are noise, whatever the percentage",
+    )
+    parser.add_argument(
+        "--error-threshold",
+        type=float,
+        default=1.0,
+        help="Percentage points of requests that may newly fail",
+    )
+    args = parser.parse_args()
+
+    if args.report:
+        with open(args.report) as report_file:
+            report = json.load(report_file)
+    else:
+        report = asyncio.run(measure(args))
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        report["comparison"] = compare(
+            baseline,
+            report,
+            args.threshold,
+            args.min_delta_ms,
+            args.error_threshold,
+        )
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    print(json.dumps(report, indent=2))
+    return 1 if report.get("comparison", {}).get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
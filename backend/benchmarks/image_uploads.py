@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark image upload throughput through the streaming pipeline.
+
+Run from the backend directory; files are written to a temporary UPLOAD_DIR:
+
+    python benchmarks/image_uploads.py --images 200 --workers 0 1 2 4
+    python benchmarks/image_uploads.py --width 4000 --height 3000 --concurrency 16
+
+Each worker count is timed with `concurrency` uploads in flight (threads, as
+FastAPI's threadpool runs the sync endpoints). Workers 0 renders inline in the
+request thread, which is the baseline the process pool is compared against.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath("."))
+
+from fastapi import UploadFile
+from PIL import Image
+
+from app.core.config import settings
+from app.services import uploads
+
+
+def make_image(width: int, height: int, rng: random.Random) -> bytes:
+    """JPEG with enough noise that encoding is not trivially cheap"""
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    tint = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in "rgb"))
+    buffer = io.BytesIO()
+    Image.blend(image, tint, 0.5).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def run(payloads: list, workers: int, concurrency: int, kind: str) -> dict:
+    settings.IMAGE_WORKERS = workers
+    uploads.shutdown_image_executor()
+    if workers:
+        # Start the pool outside the timed section
+        uploads.get_image_executor().submit(int).result()
+
+    def upload(payload: bytes) -> float:
+        started = time.perf_counter()
+        uploads.save_image_upload(
+            UploadFile(file=io.BytesIO(payload), filename="bench.jpg"), kind
+        )
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(upload, payloads))
+    elapsed = time.perf_counter() - started
+    uploads.shutdown_image_executor()
+
+    total_bytes = sum(len(p) for p in payloads)
+    return {
+        "images_per_s": round(len(payloads) / elapsed, 1),
+        "mb_per_s": round(total_bytes / elapsed / 2**20, 2),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(sorted(latencies)[int(len(latencies) * 0.95) - 1], 1),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--width", type=int, default=2400)
+    parser.add_argument("--height", type=int, default=1600)
+    parser.add_argument(
+        "--kind", choices=["avatars", "lot_images"], default="lot_images"
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # A handful of distinct images reused round-robin keeps generation cheap
+    distinct = [make_image(args.width, args.height, rng) for _ in range(8)]
+    payloads = [distinct[i % len(distinct)] for i in range(args.images)]
+
+    upload_dir = tempfile.mkdtemp(prefix="upload-bench-")
+    settings.UPLOAD_DIR = upload_dir
+    try:
+        results = {
+            str(workers): run(payloads, workers, args.concurrency, args.kind)
+            for workers in args.workers
+        }
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    print(
+        json.dumps(
+            {
+                "images": args.images,
+                "image_bytes": len(payloads[0]),
+                "resolution": f"{args.width}x{args.height}",
+                "concurrency": args.concurrency,
+                "workers": results,
+            },
+            indent=2,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark access tokens signed and verified per second for each algorithm.
+
+Run from the backend directory (no database needed):
+
+    python benchmarks/jwt_signing.py
+    python benchmarks/jwt_signing.py --seconds 2
+
+Keys are generated in memory. Each algorithm is measured through KeyRing
+(key objects parsed once) and, where it supports the algorithm, through
+python-jose as create_access_token/verify_token used it before (key parsed
+on every call).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath("."))
+
+from cryptography.hazmat.primitives import serialization
+
+from app.core.jwt_keys import KeyRing, SigningKey, generate_private_key_pem
+
+try:
+    from jose import jwt as jose_jwt
+except ImportError:
+    jose_jwt = None
+
+SECRET = "benchmark-secret-key-of-reasonable-length"
+
+
+def claims() -> dict:
+    return {
+        "sub": "seller_42",
+        "user_id": 42,
+        "jti": uuid.uuid4().hex,
+        "type": "access",
+        "exp": datetime.utcnow() + timedelta(minutes=30),
+    }
+
+
+def rate(operation, seconds: float) -> float:
+    """Calls per second of operation over at least the given time"""
+    calls, started = 0, time.perf_counter()
+    while True:
+        for _ in range(50):
+            operation()
+        calls += 50
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return round(calls / elapsed)
+
+
+def measure(sign, verify, seconds: float) -> dict:
+    token = sign()
+    return {
+        "signed_per_second": rate(sign, seconds),
+        "verified_per_second": rate(lambda: verify(token), seconds),
+        "token_bytes": len(token),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    keys = {"HS256": SigningKey.from_secret(SECRET)}
+    pems = {}
+    for algorithm in ("RS256", "EdDSA"):
+        pems[algorithm] = generate_private_key_pem(algorithm)
+        keys[algorithm] = SigningKey.from_pem(pems[algorithm])
+
+    results = {}
+    for algorithm, key in keys.items():
+        ring = KeyRing(key)
+        results[f"{algorithm}-keyring"] = measure(
+            lambda: ring.sign(claims()), ring.verify, args.seconds
+        )
+
+    if jose_jwt is not None:
+        rsa_public = (
+            keys["RS256"]
+            .public.public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+            .decode()
+        )
+        jose_keys = {
+            "HS256": (SECRET, SECRET),
+            "RS256": (pems["RS256"].decode(), rsa_public),
+        }
+        for algorithm, (signing, verifying) in jose_keys.items():
+            results[f"{algorithm}-jose"] = measure(
+                lambda: jose_jwt.encode(claims(), signing, algorithm=algorithm),
+                lambda token: jose_jwt.decode(token, verifying, algorithms=[algorithm]),
+                args.seconds,
+            )
+    else:
+        print("python-jose not installed, skipping jose baseline", file=sys.stderr)
+
+    print(json.dumps({"seconds": args.seconds, "results": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark open order event streams: memory per connection and event fan-out.
+
+Run from the backend directory (no database queries are made):
+
+    python benchmarks/order_event_streams.py
+    python benchmarks/order_event_streams.py --connections 1000 10000 50000
+
+For each connection count, that many OrderEventBroadcaster.stream
+generators are opened and drained by tasks, as StreamingResponse does for
+real SSE clients (socket writes are not included). The report has the
+memory held per open stream, events published per second while they are
+open, and the time for one heartbeat round to reach every stream.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath("."))
+
+from app.services.order_events import HEARTBEAT_FRAME, OrderEventBroadcaster
+
+
+class Totals:
+    events = 0
+    heartbeats = 0
+
+
+async def read(frames, totals: Totals) -> None:
+    heartbeat_seen = False
+    async for frame in frames:
+        if frame == HEARTBEAT_FRAME:
+            if not heartbeat_seen:
+                heartbeat_seen = True
+                totals.heartbeats += 1
+        elif frame.startswith("id: "):
+            totals.events += 1
+
+
+async def wait_for(condition, timeout: float) -> float:
+    started = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - started > timeout:
+            break
+        await asyncio.sleep(0.001)
+    return time.perf_counter() - started
+
+
+async def measure(connections: int, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    users = max(2, connections // args.streams_per_user)
+    broadcaster = OrderEventBroadcaster(
+        buffer_size=args.buffer_size,
+        queue_size=args.queue_size,
+        heartbeat=3600,  # Sent by hand below
+    )
+    await broadcaster.start()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    totals = Totals()
+    tasks = []
+    for i in range(connections):
+        frames = broadcaster.stream(i % users + 1)
+        tasks.append(asyncio.create_task(read(frames, totals)))
+    await wait_for(lambda: broadcaster.connection_count == connections, 60)
+    per_stream = (tracemalloc.get_traced_memory()[0] - before) / connections
+    tracemalloc.stop()
+
+    events = [
+        {
+            "order_id": order_id,
+            "status": "paid",
+            "previous_status": "pending",
+            "buyer_id": rng.randint(1, users),
+            "seller_id": rng.randint(1, users),
+            "lot_id": order_id,
+        }
+        for order_id in range(args.events)
+    ]
+    streams_of = {}
+    for i in range(connections):
+        streams_of[i % users + 1] = streams_of.get(i % users + 1, 0) + 1
+    expected = sum(
+        sum(streams_of.get(user, 0) for user in {e["buyer_id"], e["seller_id"]})
+        for e in events
+    )
+
+    started = time.perf_counter()
+    for offset in range(0, len(events), args.batch):
+        await broadcaster.dispatch({"events": events[offset : offset + args.batch]})
+        await asyncio.sleep(0)  # Let readers drain, as the event loop would
+    await wait_for(lambda: totals.events >= expected, args.timeout)
+    publish_seconds = time.perf_counter() - started
+
+    broadcaster.send_heartbeat()
+    heartbeat_seconds = await wait_for(
+        lambda: totals.heartbeats == connections, args.timeout
+    )
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await broadcaster.stop()
+
+    return {
+        "connections": connections,
+        "users": users,
+        "bytes_per_stream": round(per_stream),
+        "events": args.events,
+        "frames_delivered": totals.events,
+        "frames_expected": expected,
+        "events_per_second": round(args.events / publish_seconds),
+        "frames_per_second": round(totals.events / publish_seconds),
+        "heartbeat_round_seconds": round(heartbeat_seconds, 3),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--connections", type=int, nargs="+", default=[1000, 10000, 50000]
+    )
+    parser.add_argument("--streams-per-user", type=int, default=2)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--buffer-size", type=int, default=1000)
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    report = []
+    for connections in args.connections:
+        print(f"{connections} connections...", file=sys.stderr)
+        report.append(asyncio.run(measure(connections, args)))
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
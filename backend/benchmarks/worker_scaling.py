@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Measure how throughput scales with the number of serve.py workers.
+
+Run from the backend directory against a seeded database (seed_data.py) in
+DATABASE_URL:
+
+    python benchmarks/worker_scaling.py                     # 1, 2, 4... CPUs
+    python benchmarks/worker_scaling.py --workers 1,2,4,8 --clients 4
+    python benchmarks/worker_scaling.py --loop asyncio --http h11
+
+For each worker count the production server (serve.py) is started on a free
+port and loaded by --clients http_load.py processes at once, sharing
+--concurrency virtual users, for --duration seconds after a --warmup. One
+Python load generator tops out at a few thousand requests per second, so
+use more clients for many workers, and keep CPUs free for them: with
+workers + clients above the CPU count, the server and the load compete and
+the curve flattens early.
+
+The JSON report has per worker count the RPS summed over the clients, the
+mean of their p50 and the worst of their p95 latencies, errors, the speedup
+over the first worker count and the efficiency (speedup per added worker,
+1.0 is linear scaling).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import List
+
+sys.path.insert(0, os.path.abspath("."))
+
+from benchmarks.http_load import MIXES, start_server
+
+
+def default_workers() -> List[int]:
+    cpus = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cpus:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cpus:
+        counts.append(cpus)
+    return counts
+
+
+def parse_counts(value: str) -> List[int]:
+    try:
+        counts = sorted({int(count) for count in value.split(",")})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Not a list of worker counts: {value}")
+    if counts[0] < 1:
+        raise argparse.ArgumentTypeError("Worker counts start at 1")
+    return counts
+
+
+def load(url: str, args: argparse.Namespace) -> dict:
+    """Run the http_load.py clients against url and merge their reports"""
+    clients = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "benchmarks/http_load.py",
+                "--url",
+                url,
+                "--mix",
+                args.mix,
+                "--concurrency",
+                str(max(1, args.concurrency // args.clients)),
+                "--duration",
+                str(args.duration),
+                "--warmup",
+                str(args.warmup),
+                "--seed",
+                str(args.seed + number),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        for number in range(args.clients)
+    ]
+    totals = []
+    for client in clients:
+        output, _ = client.communicate()
+        if client.returncode != 0:
+            raise SystemExit(f"http_load.py exited with status {client.returncode}")
+        totals.append(json.loads(output)["total"])
+
+    return {
+        "requests": sum(total["requests"] for total in totals),
+        "errors": sum(total["errors"] for total in totals),
+        "rps": round(sum(total["rps"] for total in totals), 1),
+        "p50_ms": round(sum(total["p50_ms"] for total in totals) / len(totals), 2),
+        "p95_ms": max(total["p95_ms"] for total in totals),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--workers",
+        type=parse_counts,
+        default=default_workers(),
+        help="Comma-separated worker counts (default: powers of 2 up to CPUs)",
+    )
+    parser.add_argument("--clients", type=int, default=1, help="Load processes")
+    parser.add_argument(
+        "--mix", default="browse", help=f"One of {', '.join(MIXES)} or weights"
+    )
+    parser.add_argument("--concurrency", type=int, default=64, help="In total")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--loop", default="auto", help="serve.py --loop")
+    parser.add_argument("--http", default="auto", help="serve.py --http")
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        print(f"{workers} workers...", file=sys.stderr)
+        server, url = start_server(workers, "--loop", args.loop, "--http", args.http)
+        try:
+            result = {"workers": workers, **load(url, args)}
+        finally:
+            server.terminate()
+            server.wait()
+
+        first = results[0] if results else result
+        speedup = result["rps"] / first["rps"] if first["rps"] else 0.0
+        result["speedup"] = round(speedup, 2)
+        result["efficiency"] = round(speedup / (workers / first["workers"]), 2)
+        results.append(result)
+
+    report = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "mix": args.mix,
+        "concurrency": args.concurrency,
+        "clients": args.clients,
+        "loop": args.loop,
+        "http": args.http,
+        "duration": args.duration,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for denormalized data.
+
+Run from the backend directory, e.g. from cron:
+
+    python maintenance.py reconcile-reputation --batch-size 1000
+    python maintenance.py repair-lot-counters
+    python maintenance.py repair-unread-counters
+    python maintenance.py rebuild-category-tree
+    python maintenance.py gc-media --recount
+    python maintenance.py precompress-static
+    python maintenance.py purge-tokens
+    python maintenance.py generate-jwt-key --algorithm EdDSA --out jwt-2024-06.pem
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath("."))
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.jwt_keys import SigningKey, generate_private_key_pem
+from app.core.logging import setup_logging
+from app.core.static_files import precompress_directory
+from app.services.category_tree import rebuild_closure
+from app.services.lot_counters import recount_lot_counters
+from app.services.media_store import collect_garbage, recount_references
+from app.services.refresh_tokens import purge_expired_tokens
+from app.services.reputation import reconcile_user_stats
+from app.services.unread_counters import recount_unread_counters
+
+
+def reconcile_reputation(args: argparse.Namespace) -> dict:
+    """Recompute seller ratings and sale/purchase counters"""
+    db = next(get_db())
+    try:
+        return reconcile_user_stats(
+            db, batch_size=args.batch_size, fix=not args.dry_run
+        )
+    finally:
+        db.close()
+
+
+def repair_lot_counters(args: argparse.Namespace) -> dict:
+    """Recompute active lot counters of games and categories"""
+    db = next(get_db())
+    try:
+        return recount_lot_counters(db)
+    finally:
+        db.close()
+
+
+def repair_unread_counters(args: argparse.Namespace) -> dict:
+    """Recompute unread message counters of users"""
+    db = next(get_db())
+    try:
+        return recount_unread_counters(db)
+    finally:
+        db.close()
+
+
+def rebuild_category_tree(args: argparse.Namespace) -> dict:
+    """Rebuild the category closure table from parent_id links"""
+    db = next(get_db())
+    try:
+        return {"closure_rows": rebuild_closure(db)}
+    finally:
+        db.close()
+
+
+def gc_media(args: argparse.Namespace) -> dict:
+    """Delete unreferenced media blobs and orphaned upload files"""
+    db = next(get_db())
+    try:
+        report = {}
+        if args.recount:
+            report["recount"] = recount_references(db)
+        report["gc"] = collect_garbage(
+            db, grace_hours=args.grace_hours, dry_run=args.dry_run
+        )
+        return report
+    finally:
+        db.close()
+
+
+def precompress_static(args: argparse.Namespace) -> dict:
+    """Write .gz/.br siblings for compressible static files"""
+    return precompress_directory(
+        args.directory or settings.UPLOAD_DIR, min_size=args.min_size
+    )
+
+
+def purge_tokens(args: argparse.Namespace) -> dict:
+    """Delete refresh token and revocation rows of expired tokens"""
+    db = next(get_db())
+    try:
+        report = purge_expired_tokens(db)
+        db.commit()
+        return report
+    finally:
+        db.close()
+
+
+def generate_jwt_key(args: argparse.Namespace) -> dict:
+    """Write a new RS256/EdDSA private key for JWT_PRIVATE_KEY_FILE"""
+    pem = generate_private_key_pem(args.algorithm)
+    # Private keys must not be readable by other users
+    fd = os.open(args.out, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as key_file:
+        key_file.write(pem)
+    return {
+        "file": args.out,
+        "algorithm": args.algorithm,
+        "kid": SigningKey.from_pem(pem).kid,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reputation = commands.add_parser(
+        "reconcile-reputation", help=reconcile_reputation.__doc__
+    )
+    reputation.add_argument("--batch-size", type=int, default=500)
+    reputation.add_argument(
+        "--dry-run", action="store_true", help="Report drift without fixing it"
+    )
+    reputation.set_defaults(handler=reconcile_reputation)
+
+    lot_counters = commands.add_parser(
+        "repair-lot-counters", help=repair_lot_counters.__doc__
+    )
+    lot_counters.set_defaults(handler=repair_lot_counters)
+
+    unread_counters = commands.add_parser(
+        "repair-unread-counters", help=repair_unread_counters.__doc__
+    )
+    unread_counters.set_defaults(handler=repair_unread_counters)
+
+    category_tree = commands.add_parser(
+        "rebuild-category-tree", help=rebuild_category_tree.__doc__
+    )
+    category_tree.set_defaults(handler=rebuild_category_tree)
+
+    media = commands.add_parser("gc-media", help=gc_media.__doc__)
+    media.add_argument(
+        "--grace-hours", type=int, help="Minimum age (default MEDIA_GC_GRACE_HOURS)"
+    )
+    media.add_argument(
+        "--recount", action="store_true", help="Repair reference counts first"
+    )
+    media.add_argument("--dry-run", action="store_true", help="Report without deleting")
+    media.set_defaults(handler=gc_media)
+
+    precompress = commands.add_parser(
+        "precompress-static", help=precompress_static.__doc__
+    )
+    precompress.add_argument("--directory", help="Default: UPLOAD_DIR")
+    precompress.add_argument("--min-size", type=int, default=1024)
+    precompress.set_defaults(handler=precompress_static)
+
+    tokens = commands.add_parser("purge-tokens", help=purge_tokens.__doc__)
+    tokens.set_defaults(handler=purge_tokens)
+
+    jwt_key = commands.add_parser("generate-jwt-key", help=generate_jwt_key.__doc__)
+    jwt_key.add_argument("--algorithm", choices=["RS256", "EdDSA"], default="EdDSA")
+    jwt_key.add_argument("--out", required=True, help="Key file to create")
+    jwt_key.set_defaults(handler=generate_jwt_key)
+
+    args = parser.parse_args()
+    setup_logging()
+
+    report = args.handler(args)
+    print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
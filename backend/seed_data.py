@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+"""
+Seed a database with large, realistically skewed synthetic data.
+
+Run from the backend directory against the database in DATABASE_URL:
+
+    python seed_data.py --scale 0.01               # ~20k lots, quick local run
+    python seed_data.py --scale 1 --workers 8      # ~2M lots, 3M messages
+    python seed_data.py --lots 5000000 --orders 0 --messages 0
+
+Rows are generated in chunks by parallel worker processes and written with
+COPY on PostgreSQL (executemany elsewhere; SQLite uses one worker because
+it has a single writer). Distributions are skewed like production traffic:
+a few games hold most lots, a few power sellers list most of them and
+popular lots get most orders. Every value is a function of --seed and the
+row id, so the same arguments produce the same data whatever --workers is.
+
+Denormalized data (category closure, lot counters, reputation, unread
+counters) is rebuilt afterwards with the maintenance services, so the
+seeded tables look like ones the API wrote.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+sys.path.insert(0, os.path.abspath("."))
+
+from sqlalchemy import func, select, text
+
+from app.core.auth import get_password_hash
+from app.core.database import Base, SessionLocal, engine
+from app.models import (
+    Category,
+    Game,
+    Lot,
+    LotStatus,
+    Message,
+    Order,
+    OrderStatus,
+    Review,
+    User,
+    UserRole,
+)
+from app.services.category_tree import rebuild_closure
+from app.services.lot_counters import recount_lot_counters
+from app.services.reputation import reconcile_user_stats
+from app.services.table_versions import bump_table_versions
+from app.services.unread_counters import recount_unread_counters
+
+# Row counts at --scale 1
+DEFAULT_COUNTS = {
+    "users": 200_000,
+    "games": 300,
+    "lots": 2_000_000,
+    "orders": 1_000_000,
+    "messages": 3_000_000,
+}
+
+SELLER_FRACTION = 0.05
+REVIEW_FRACTION = 0.6  # Completed orders that get a review
+HISTORY_DAYS = 730
+
+GAME_NAMES = [
+    "World of Warcraft", "Counter-Strike 2", "Dota 2", "Valorant", "Fortnite",
+    "League of Legends", "Genshin Impact", "Path of Exile", "EVE Online",
+    "Rust", "Apex Legends", "Old School RuneScape", "Lost Ark", "Diablo IV",
+]  # fmt: skip
+CATEGORY_NAMES = ["Accounts", "Gold", "Items", "Skins", "Boosting", "Keys"]
+ATTRIBUTE_SCHEMA = {"server": "string", "level": "integer", "rank": "string"}
+SERVERS = ["EU-West", "EU-East", "US-East", "US-West", "Asia", "OCE", "SA", "RU"]
+SERVER_WEIGHTS = [40, 15, 20, 10, 8, 3, 2, 2]
+LOT_STATUSES = [
+    (LotStatus.ACTIVE, 80),
+    (LotStatus.SOLD, 10),
+    (LotStatus.MODERATION, 5),
+    (LotStatus.INACTIVE, 5),
+]
+RANKS = ["bronze", "silver", "gold", "platinum", "diamond", "master"]
+ADJECTIVES = ["Rare", "Cheap", "Instant", "Stacked", "Fresh", "Max level", "Legacy"]
+ORDER_STATUSES = [
+    (OrderStatus.COMPLETED, 60),
+    (OrderStatus.CANCELLED, 10),
+    (OrderStatus.PENDING, 10),
+    (OrderStatus.PAID, 8),
+    (OrderStatus.IN_PROGRESS, 7),
+    (OrderStatus.DISPUTED, 5),
+]
+RATINGS = [(5, 60), (4, 25), (3, 8), (2, 4), (1, 3)]
+MESSAGE_TEMPLATES = [
+    "Hi, is this still available?",
+    "Can you deliver today?",
+    "Sent the payment, please check.",
+    "Delivered, please confirm the order.",
+    "Which server is the account on?",
+    "Thanks, everything works!",
+    "Could you do a discount for two?",
+]
+
+MASK = (1 << 64) - 1
+
+
+def _mix(value: int) -> int:
+    """splitmix64 finalizer: a well-spread 64-bit hash of an integer"""
+    value = (value + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+def _cumulative(weighted: Sequence[Tuple[Any, int]]) -> Tuple[List[Any], List[int]]:
+    values, totals, total = [], [], 0
+    for value, weight in weighted:
+        total += weight
+        values.append(value)
+        totals.append(total)
+    return values, totals
+
+
+@dataclass
+class Plan:
+    """Everything a worker needs to generate any row (picklable)"""
+
+    seed: int
+    counts: Dict[str, int]
+    user_offset: int
+    lot_offset: int
+    order_offset: int
+    game_ids: List[int]
+    categories: List[List[Tuple[int, str]]]  # (id, name) per game, as game_ids
+    password_hash: str
+    started_at: datetime
+    chunk_size: int
+
+    def uniform(self, stream: str, row: int) -> float:
+        """Deterministic uniform [0, 1) for a (stream, row) pair"""
+        key = zlib.crc32(stream.encode())
+        return _mix((self.seed << 96) + (key << 40) + row) / 2**64
+
+    def skewed(self, stream: str, row: int, n: int, skew: float) -> int:
+        """Index in [0, n): low indices are far more likely for skew > 1"""
+        return min(n - 1, int(n * self.uniform(stream, row) ** skew))
+
+    def choice(self, stream: str, row: int, values: Sequence[Any]) -> Any:
+        return values[int(self.uniform(stream, row) * len(values))]
+
+    def when(self, position: float) -> datetime:
+        """Timestamp at a fraction of the seeded history"""
+        return self.started_at + timedelta(days=HISTORY_DAYS * position)
+
+    # Attributes other tables refer to, recomputable from the row number
+
+    def lot_seller(self, lot: int) -> int:
+        sellers = max(1, int(self.counts["users"] * SELLER_FRACTION))
+        return self.user_offset + 1 + self.skewed("lot_seller", lot, sellers, 3.0)
+
+    def lot_game(self, lot: int) -> int:
+        return self.skewed("lot_game", lot, len(self.game_ids), 2.5)
+
+    def lot_price(self, lot: int) -> float:
+        # Log-uniform between 0.50 and 2000
+        return round(0.5 * 4000 ** self.uniform("lot_price", lot), 2)
+
+    def order_lot(self, order: int) -> int:
+        return self.skewed("order_lot", order, self.counts["lots"], 2.0)
+
+    def order_buyer(self, order: int) -> int:
+        buyer = (
+            self.user_offset
+            + 1
+            + int(self.counts["users"] * self.uniform("order_buyer", order))
+        )
+        if buyer == self.lot_seller(self.order_lot(order)):
+            buyer = (
+                self.user_offset + 1 + (buyer - self.user_offset) % self.counts["users"]
+            )
+        return buyer
+
+
+def _pick(plan: Plan, stream: str, row: int, table: Tuple[List, List]) -> Any:
+    values, totals = table
+    target = plan.uniform(stream, row) * totals[-1]
+    for value, total in zip(values, totals):
+        if target < total:
+            return value
+    return values[-1]
+
+
+_SERVERS = _cumulative(list(zip(SERVERS, SERVER_WEIGHTS)))
+_LOT_STATUSES = _cumulative(LOT_STATUSES)
+_ORDER_STATUSES = _cumulative(ORDER_STATUSES)
+_RATINGS = _cumulative(RATINGS)
+
+
+def user_rows(plan: Plan, start: int, stop: int) -> Iterator[Dict[str, Any]]:
+    sellers = max(1, int(plan.counts["users"] * SELLER_FRACTION))
+    for row in range(start, stop):
+        is_seller = row < sellers
+        yield {
+            "id": plan.user_offset + 1 + row,
+            "username": f"user{plan.user_offset + 1 + row}",
+            "email": f"user{plan.user_offset + 1 + row}@example.com",
+            "hashed_password": plan.password_hash,
+            "display_name": f"{'Seller' if is_seller else 'Player'} {row + 1}",
+            "is_active": plan.uniform("user_active", row) < 0.98,
+            "is_verified": is_seller and plan.uniform("user_verified", row) < 0.7,
+            "role": UserRole.SELLER if is_seller else UserRole.USER,
+            "created_at": plan.when(row / plan.counts["users"] * 0.8),
+        }
+
+
+def lot_rows(plan: Plan, start: int, stop: int) -> Iterator[Dict[str, Any]]:
+    for row in range(start, stop):
+        game = plan.lot_game(row)
+        category_id, category = plan.choice("lot_category", row, plan.categories[game])
+        yield {
+            "id": plan.lot_offset + 1 + row,
+            "title": f"{plan.choice('lot_adjective', row, ADJECTIVES)} "
+            f"{GAME_NAMES[game % len(GAME_NAMES)]} {category.lower()} #{row + 1}",
+            "description": "Seeded lot. Fast delivery, warranty included.",
+            "price": plan.lot_price(row),
+            "seller_id": plan.lot_seller(row),
+            "game_id": plan.game_ids[game],
+            "category_id": category_id,
+            "item_details": {
+                "server": _pick(plan, "lot_server", row, _SERVERS),
+                "level": 1 + int(100 * plan.uniform("lot_level", row)),
+                "rank": plan.choice("lot_rank", row, RANKS),
+            },
+            "images": [],
+            "status": _pick(plan, "lot_status", row, _LOT_STATUSES),
+            "is_auto_delivery": plan.uniform("lot_auto_delivery", row) < 0.3,
+            "views": int(5000 * plan.uniform("lot_views", row) ** 4),
+            "created_at": plan.when(0.1 + 0.9 * row / plan.counts["lots"]),
+        }
+
+
+def order_rows(
+    plan: Plan, start: int, stop: int
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Orders and the reviews of completed ones"""
+    orders, reviews = [], []
+    for row in range(start, stop):
+        lot = plan.order_lot(row)
+        order_id = plan.order_offset + 1 + row
+        status = _pick(plan, "order_status", row, _ORDER_STATUSES)
+        created_at = plan.when(0.2 + 0.8 * row / plan.counts["orders"])
+        completed_at = (
+            created_at + timedelta(hours=1 + 47 * plan.uniform("order_done", row))
+            if status == OrderStatus.COMPLETED
+            else None
+        )
+        orders.append(
+            {
+                "id": order_id,
+                "order_number": f"SEED-{order_id:010d}",
+                "buyer_id": plan.order_buyer(row),
+                "seller_id": plan.lot_seller(lot),
+                "lot_id": plan.lot_offset + 1 + lot,
+                "price": plan.lot_price(lot),
+                "status": status,
+                "created_at": created_at,
+                "completed_at": completed_at,
+            }
+        )
+        if completed_at and plan.uniform("review", row) < REVIEW_FRACTION:
+            reviews.append(
+                {
+                    "rating": _pick(plan, "review_rating", row, _RATINGS),
+                    "comment": "Smooth deal, recommended.",
+                    "reviewer_id": orders[-1]["buyer_id"],
+                    "reviewed_id": orders[-1]["seller_id"],
+                    "order_id": order_id,
+                    "is_visible": True,
+                    "created_at": completed_at,
+                }
+            )
+    return orders, reviews
+
+
+def message_rows(plan: Plan, start: int, stop: int) -> Iterator[Dict[str, Any]]:
+    total = plan.counts["messages"]
+    for row in range(start, stop):
+        # Conversations hang off orders; recent orders are the busiest
+        order = (
+            plan.counts["orders"]
+            - 1
+            - plan.skewed("message_order", row, plan.counts["orders"], 1.5)
+        )
+        buyer = plan.order_buyer(order)
+        seller = plan.lot_seller(plan.order_lot(order))
+        from_buyer = plan.uniform("message_sender", row) < 0.55
+        # Older messages have been read; a few recent ones are still unread
+        unread_chance = 0.7 if row > total * 0.98 else 0.02
+        yield {
+            "content": plan.choice("message_text", row, MESSAGE_TEMPLATES),
+            "sender_id": buyer if from_buyer else seller,
+            "receiver_id": seller if from_buyer else buyer,
+            "order_id": plan.order_offset + 1 + order,
+            "is_read": plan.uniform("message_read", row) >= unread_chance,
+            "is_system": False,
+            "created_at": plan.when(0.2 + 0.8 * row / total),
+        }
+
+
+def _defaults(table: Any, columns: Sequence[str]) -> Dict[str, Any]:
+    """Python-side column defaults, which COPY would otherwise leave NULL"""
+    return {
+        column.name: column.default.arg
+        for column in table.columns
+        if column.name not in columns
+        and column.default is not None
+        and column.default.is_scalar
+    }
+
+
+def _copy_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.name  # SQLEnum stores member names
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def write_rows(conn: Any, model: Any, rows: List[Dict[str, Any]]) -> int:
+    """Insert rows with COPY (PostgreSQL) or one executemany"""
+    if not rows:
+        return 0
+    table = model.__table__
+    defaults = _defaults(table, rows[0].keys())
+    columns = [*rows[0].keys(), *defaults.keys()]
+
+    if conn.dialect.name != "postgresql":
+        conn.execute(table.insert(), [{**row, **defaults} for row in rows])
+        return len(rows)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    tail = [_copy_value(value) for value in defaults.values()]
+    for row in rows:
+        writer.writerow([*(_copy_value(value) for value in row.values()), *tail])
+    buffer.seek(0)
+
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def load_chunk(plan: Plan, kind: str, start: int, stop: int) -> Dict[str, int]:
+    """Generate and write one chunk of a table; rows written per table"""
+    with engine.begin() as conn:
+        if kind == "users":
+            return {"users": write_rows(conn, User, list(user_rows(plan, start, stop)))}
+        if kind == "lots":
+            return {"lots": write_rows(conn, Lot, list(lot_rows(plan, start, stop)))}
+        if kind == "orders":
+            orders, reviews = order_rows(plan, start, stop)
+            return {
+                "orders": write_rows(conn, Order, orders),
+                "reviews": write_rows(conn, Review, reviews),
+            }
+        rows = list(message_rows(plan, start, stop))
+        return {"messages": write_rows(conn, Message, rows)}
+
+
+def _init_worker() -> None:
+    # Connections inherited from the parent must not be shared
+    engine.dispose(close=False)
+
+
+def _max_id(conn: Any, model: Any) -> int:
+    return conn.execute(select(func.coalesce(func.max(model.id), 0))).scalar()
+
+
+def create_plan(args: argparse.Namespace, counts: Dict[str, int]) -> Plan:
+    """Insert games and categories and fix the id ranges of the other tables"""
+    rng = random.Random(f"{args.seed}:catalog")
+    with engine.begin() as conn:
+        offsets = {model: _max_id(conn, model) for model in (User, Lot, Order, Game)}
+        game_ids, categories = [], []
+        for index in range(counts["games"]):
+            base = GAME_NAMES[index % len(GAME_NAMES)]
+            suffix = (
+                f" {index // len(GAME_NAMES) + 1}" if index >= len(GAME_NAMES) else ""
+            )
+            game_id = offsets[Game] + 1 + index
+            conn.execute(
+                Game.__table__.insert().values(
+                    id=game_id,
+                    name=f"{base}{suffix}",
+                    slug=f"seed-{args.seed}-{game_id}",
+                    description=f"Seeded game {index + 1}",
+                    is_popular=index < 10,
+                    is_active=True,
+                    total_lots=0,
+                )
+            )
+            game_ids.append(game_id)
+
+            names = rng.sample(CATEGORY_NAMES, rng.randint(3, len(CATEGORY_NAMES)))
+            categories.append([])
+            for position, name in enumerate(names):
+                category_id = conn.execute(
+                    Category.__table__.insert().values(
+                        name=name,
+                        slug=name.lower(),
+                        game_id=game_id,
+                        attribute_schema=ATTRIBUTE_SCHEMA,
+                        is_active=True,
+                        total_lots=0,
+                        sort_order=position,
+                    )
+                ).inserted_primary_key[0]
+                categories[-1].append((category_id, name))
+
+    return Plan(
+        seed=args.seed,
+        counts=counts,
+        user_offset=offsets[User],
+        lot_offset=offsets[Lot],
+        order_offset=offsets[Order],
+        game_ids=game_ids,
+        categories=categories,
+        # bcrypt once, not once per user
+        password_hash=get_password_hash(args.password),
+        started_at=datetime.now(timezone.utc) - timedelta(days=HISTORY_DAYS),
+        chunk_size=args.chunk_size,
+    )
+
+
+def run_phase(plan: Plan, kind: str, workers: int) -> Dict[str, Any]:
+    total = plan.counts[kind]
+    chunks = [
+        (start, min(start + plan.chunk_size, total))
+        for start in range(0, total, plan.chunk_size)
+    ]
+    written: Dict[str, int] = {}
+    started = time.perf_counter()
+
+    def record(result: Dict[str, int]) -> None:
+        for name, rows in result.items():
+            written[name] = written.get(name, 0) + rows
+        print(f"{kind}: {written.get(kind, 0)}/{total}", file=sys.stderr)
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(load_chunk, plan, kind, start, stop)
+                for start, stop in chunks
+            ]
+            for future in futures:
+                record(future.result())
+    else:
+        for start, stop in chunks:
+            record(load_chunk(plan, kind, start, stop))
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows": written,
+        "seconds": round(seconds, 2),
+        "rows_per_second": round(sum(written.values()) / seconds) if seconds else None,
+    }
+
+
+def finish(dialect: str) -> Dict[str, Any]:
+    """Sync sequences and rebuild denormalized data like the API keeps it"""
+    if dialect == "postgresql":
+        with engine.begin() as conn:
+            for model in (User, Game, Category, Lot, Order):
+                table = model.__tablename__
+                conn.execute(
+                    text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"(SELECT max(id) FROM {table}))"
+                    )
+                )
+
+    db = SessionLocal()
+    try:
+        report = {
+            "category_closure_rows": rebuild_closure(db),
+            "lot_counters": recount_lot_counters(db),
+            "reputation": reconcile_user_stats(db, batch_size=5000),
+            "unread_counters": recount_unread_counters(db),
+        }
+        report["reputation"].pop("samples", None)
+        bump_table_versions(db, ["games", "categories", "lots", "users"])
+        db.commit()
+    finally:
+        db.close()
+
+    if dialect == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplies counts")
+    for name, count in DEFAULT_COUNTS.items():
+        parser.add_argument(f"--{name}", type=int, help=f"Default {count:,} x scale")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--password", default="password123", help="Of every user")
+    args = parser.parse_args()
+
+    counts = {
+        name: getattr(args, name)
+        if getattr(args, name) is not None
+        else max(1, int(count * args.scale))
+        for name, count in DEFAULT_COUNTS.items()
+    }
+    counts["users"] = max(counts["users"], 2)  # Orders need a buyer and a seller
+    if counts["orders"] == 0:
+        counts["messages"] = 0  # Conversations hang off orders
+    if counts["lots"] == 0:
+        counts["orders"] = counts["messages"] = 0
+
+    dialect = engine.dialect.name
+    workers = args.workers if dialect == "postgresql" else 1  # Single writer
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    plan = create_plan(args, counts)
+    report: Dict[str, Any] = {"dialect": dialect, "workers": workers, "phases": {}}
+    for kind in ("users", "lots", "orders", "messages"):
+        if counts[kind]:
+            report["phases"][kind] = run_phase(plan, kind, workers)
+    report["repair"] = finish(dialect)
+    report["seconds"] = round(time.perf_counter() - started, 2)
+
+    print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Production server: pre-forked uvicorn workers sharing one listening socket.
+
+Run from the backend directory (defaults come from the SERVER_* settings):
+
+    python serve.py
+    python serve.py --workers 8 --port 8000
+    python serve.py --no-preload --loop asyncio --http h11
+
+The master imports the application once (--preload), moves everything it
+allocated out of the garbage collector's reach (gc.freeze) so the workers
+keep sharing those pages instead of copying them, closes the database
+connections opened at import, binds the socket with --backlog and forks
+--workers processes that each run a uvicorn server on it. The kernel spreads
+new connections over the workers. --loop/--http pick uvloop and httptools
+when installed (auto); idle keep-alive connections are closed after
+--keepalive seconds.
+
+On SIGTERM or SIGINT the workers stop accepting, let in-flight requests
+finish for up to --graceful-timeout seconds, run the shutdown hooks and exit;
+the master then kills what is left and exits. A worker that dies otherwise
+is replaced. Needs os.fork (Linux, macOS).
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.abspath("."))
+
+import uvicorn
+
+from app.core.config import settings
+
+logger = logging.getLogger("serve")
+
+# Workers dying sooner than this after start are restarted with a delay
+MIN_WORKER_LIFETIME = 1.0
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def load_app() -> Any:
+    """Import the application in the master, to be shared by the workers"""
+    from sqlalchemy.orm import configure_mappers
+
+    from app.core.database import engine
+    from app.main import app
+
+    configure_mappers()  # Otherwise done by every worker on its first query
+    # Connections opened at import must not be shared across processes
+    engine.dispose()
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def run_worker(sock: socket.socket, args: argparse.Namespace, app: Any) -> None:
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)  # uvicorn installs its own
+
+    config = uvicorn.Config(
+        app if app is not None else "app.main:app",
+        loop=args.loop,
+        http=args.http,
+        backlog=args.backlog,
+        timeout_keep_alive=args.keepalive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        forwarded_allow_ips=args.forwarded_allow_ips,
+        access_log=False,  # RequestLoggingMiddleware logs every request
+        log_config=None,  # Records go through the application's handlers
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(sock: socket.socket, args: argparse.Namespace, app: Any) -> int:
+    pid = os.fork()
+    if pid == 0:
+        status = 0
+        try:
+            run_worker(sock, args, app)
+        except BaseException:
+            logger.exception("Worker failed")
+            status = 1
+        finally:
+            os._exit(status)
+    return pid
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.SERVER_WORKERS or os.cpu_count() or 1,
+        help="Default: SERVER_WORKERS, or one per CPU",
+    )
+    parser.add_argument(
+        "--loop", choices=["auto", "asyncio", "uvloop"], default=settings.SERVER_LOOP
+    )
+    parser.add_argument(
+        "--http", choices=["auto", "h11", "httptools"], default=settings.SERVER_HTTP
+    )
+    parser.add_argument("--backlog", type=int, default=settings.SERVER_BACKLOG)
+    parser.add_argument(
+        "--keepalive", type=int, default=settings.SERVER_KEEPALIVE_SECONDS
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+    )
+    parser.add_argument(
+        "--forwarded-allow-ips",
+        default=settings.SERVER_FORWARDED_ALLOW_IPS,
+        help="Proxies trusted for X-Forwarded-For/Proto",
+    )
+    parser.add_argument(
+        "--preload",
+        action=argparse.BooleanOptionalAction,
+        default=settings.SERVER_PRELOAD,
+        help="Import the app before forking (shared memory, faster restarts)",
+    )
+    args = parser.parse_args()
+
+    app = load_app() if args.preload else None
+    if not logging.getLogger().handlers:  # Not preloaded: no app logging yet
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    logger.info(
+        f"Serving on {args.host}:{args.port} with {args.workers} workers "
+        f"(pid {os.getpid()})"
+    )
+
+    workers: Dict[int, float] = {}  # pid -> start time
+    stopping = False
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        if not stopping:
+            stopping = True
+            logger.info(f"Draining workers ({signal.Signals(signum).name})")
+            for pid in list(workers):
+                os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        if not stopping:
+            workers[spawn(sock, args, app)] = time.monotonic()
+
+    deadline = None
+    while workers:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if stopping:
+                if deadline is None:
+                    deadline = time.monotonic() + args.graceful_timeout + 5
+                elif time.monotonic() > deadline:
+                    logger.warning(f"Killing {len(workers)} workers still running")
+                    for pid in list(workers):
+                        os.kill(pid, signal.SIGKILL)
+                    deadline = float("inf")
+            time.sleep(0.1)
+            continue
+
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        logger.warning(f"Worker {pid} exited with status {code}, restarting")
+        if time.monotonic() - started < MIN_WORKER_LIFETIME:
+            time.sleep(MIN_WORKER_LIFETIME)  # Do not spin on a worker that cannot start
+        workers[spawn(sock, args, app)] = time.monotonic()
+
+    sock.close()
+    logger.info("Stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,7 @@
 import os
 import sys
 import tempfile
-from typing import Generator, Dict, Any
+from typing import Callable, Generator, Dict, Any
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -14,6 +14,9 @@ from pytest import MonkeyPatch
 # Добавляем путь к модулю app
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# The suite sends far more requests per minute than a client may
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
 from app.main import app  # noqa: E402
 from app.core.database import Base, get_db  # noqa: E402
 from app.core.auth import create_access_token  # noqa: E402
@@ -153,6 +156,17 @@ def test_admin_headers(test_admin_user: User) -> Dict[str, str]:
     return {"Authorization": f"Bearer {access_token}"}
 
 
+@pytest.fixture
+def auth_headers() -> Callable[..., Dict[str, str]]:
+    """Build authentication headers (plus any extra ones) for a user."""
+
+    def build(user: User, **extra: str) -> Dict[str, str]:
+        token = create_access_token({"sub": user.username, "user_id": user.id})
+        return {"Authorization": f"Bearer {token}", **extra}
+
+    return build
+
+
 @pytest.fixture
 def test_game_data() -> Dict[str, Any]:
     """Test game data."""
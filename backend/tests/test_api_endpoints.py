@@ -5,7 +5,7 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from app.models import User
+from app.models import Lot, User
 
 
 @pytest.mark.api
@@ -184,3 +184,38 @@ def test_data_persistence(client: TestClient, db_session: Session):
         assert str(user.display_name) == user_data["display_name"]
     else:
         pytest.skip("User registration not implemented")
+
+
+@pytest.mark.api
+def test_create_order(
+    client: TestClient, db_session: Session, test_lot: Lot, auth_headers
+):
+    """Test placing an order for another seller's active lot."""
+    buyer = User(
+        username="buyer", email="buyer@example.com", hashed_password="mock_hash"
+    )
+    db_session.add(buyer)
+    # The response embeds the lot, which needs these filled in
+    test_lot.item_details, test_lot.images = {}, []
+    test_lot.category.slug = "test-category"
+    db_session.commit()
+    response = client.post(
+        "/api/v1/orders/",
+        json={"lot_id": test_lot.id, "buyer_message": "Hi"},
+        headers=auth_headers(buyer),
+    )
+
+    assert response.status_code == 201
+    data = response.json()
+    assert data["buyer_id"] == buyer.id
+    assert data["seller_id"] == test_lot.seller_id
+    assert data["status"] == "pending"
+    assert float(data["price"]) == float(test_lot.price)
+
+    # Sellers cannot buy their own lots
+    response = client.post(
+        "/api/v1/orders/",
+        json={"lot_id": test_lot.id},
+        headers=auth_headers(test_lot.seller),
+    )
+    assert response.status_code == 400
@@ -0,0 +1,98 @@
+"""Test typed item_details attribute filters."""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.core.validators import ValidationError
+from app.models import Category, CategoryClosure, Game, Lot, LotStatus, User
+from app.services.attribute_filters import (
+    compile_attribute_filters,
+    parse_attribute_filters,
+)
+
+SCHEMA = {"server": "string", "level": "integer", "ranked": "boolean"}
+
+
+@pytest.fixture
+def attribute_category(db_session: Session, test_game: Game) -> Category:
+    """Category with an attribute schema and closure rows."""
+    category = Category(
+        name="Accounts", slug="accounts", game_id=test_game.id, attribute_schema=SCHEMA
+    )
+    db_session.add(category)
+    db_session.flush()
+    db_session.add(
+        CategoryClosure(ancestor_id=category.id, descendant_id=category.id, depth=0)
+    )
+    db_session.commit()
+    return category
+
+
+def test_parse_rejects_invalid_filters():
+    """Unknown attributes, bad types and string ranges are rejected."""
+    with pytest.raises(ValidationError):
+        parse_attribute_filters(["rank:eq:gold"], SCHEMA)
+    with pytest.raises(ValidationError):
+        parse_attribute_filters(["level:gte:high"], SCHEMA)
+    with pytest.raises(ValidationError):
+        parse_attribute_filters(["server:gt:EU"], SCHEMA)
+    with pytest.raises(ValidationError):
+        parse_attribute_filters(["level=60"], SCHEMA)
+
+
+def test_postgres_equality_uses_containment():
+    """Equality and IN compile to JSONB @> for the GIN index."""
+    filters = parse_attribute_filters(["server:in:EU,US", "level:gte:60"], SCHEMA)
+    criteria = compile_attribute_filters(filters, "postgresql")
+    sql = [str(c.compile(dialect=postgresql.dialect())) for c in criteria]
+
+    assert sql[0].count("lots.item_details @>") == 2
+    assert "->>" in sql[1]
+    # Non-numeric values are skipped rather than failing the cast
+    assert sql[1].startswith("CASE WHEN (jsonb_typeof((lots.item_details ->")
+    # Integer ranges cast as float so non-integral numbers cannot fail
+    assert "AS FLOAT" in sql[1]
+    assert "AS INTEGER" not in sql[1]
+
+
+def test_get_lots_attribute_filters(
+    client: TestClient,
+    db_session: Session,
+    test_user: User,
+    attribute_category: Category,
+):
+    """get_lots filters item_details by typed attributes."""
+    for server, level in (("EU", 70), ("EU", 20), ("US", 80), ("US", 2.5)):
+        db_session.add(
+            Lot(
+                title=f"{server} {level}",
+                description="Account",
+                price=10,
+                seller_id=test_user.id,
+                game_id=attribute_category.game_id,
+                category_id=attribute_category.id,
+                status=LotStatus.ACTIVE,
+                item_details={"server": server, "level": level},
+                images=[],
+            )
+        )
+    db_session.commit()
+
+    url = f"/api/v1/lots/?category_id={attribute_category.id}"
+    response = client.get(url + "&attr=server:eq:EU&attr=level:gte:50")
+    assert response.status_code == 200
+    assert [lot["title"] for lot in response.json()["items"]] == ["EU 70"]
+
+    response = client.get(url + "&attr=server:in:EU,US&attr=level:lt:75")
+    assert response.json()["total"] == 3
+
+    response = client.get(url + "&attr=level:gt:2")
+    assert response.json()["total"] == 4
+
+    response = client.get(url + "&attr=color:eq:red")
+    assert response.status_code == 400
+
+    response = client.get("/api/v1/lots/?attr=server:eq:EU")
+    assert response.status_code == 400
@@ -0,0 +1,175 @@
+"""Tests for the tiered cache shared by worker processes."""
+
+import json
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app.core.cache import (
+    RedisCache,
+    SharedMemoryCache,
+    TieredCache,
+    create_cache,
+    redis,
+)
+
+
+def shared_pair(path: Path, **geometry: int):
+    """Two caches named alike on one segment, as in two workers"""
+    first = TieredCache("facets", SharedMemoryCache(str(path), **geometry), ttl=30)
+    second = TieredCache("facets", SharedMemoryCache(str(path), **geometry), ttl=30)
+    return first, second
+
+
+def test_local_only_cache():
+    cache = create_cache("test", maxsize=2, ttl=30)
+    assert cache.shared is None
+
+    cache.set("a", {"count": 1})
+    cache.set("b", 2, ttl=0.01)
+    assert cache.get("a") == {"count": 1}
+    time.sleep(0.02)
+    assert cache.get("b", "expired") == "expired"
+
+    cache.delete("a")
+    assert cache.get("a") is None
+
+
+def test_shared_memory_entries_are_seen_by_other_workers(tmp_path: Path):
+    first, second = shared_pair(tmp_path / "cache", slots=64, slot_size=256)
+
+    first.set("lots:1", [1, 2, 3])
+    assert second.get("lots:1") == [1, 2, 3]
+    assert len(second.local) == 1  # Kept for CACHE_LOCAL_TTL
+
+    # Other names do not collide
+    other = TieredCache("orders", second.shared)
+    assert other.get("lots:1") is None
+
+
+def test_shared_memory_updates_invalidate_local_copies(tmp_path: Path):
+    first, second = shared_pair(tmp_path / "cache", slots=64, slot_size=256)
+    first.set("key", "old")
+    assert second.get("key") == "old"
+
+    first.set("key", "new")
+    assert second.get("key") == "new"
+
+    second.delete("key")
+    assert first.get("key") is None
+
+
+def test_invalidation_log_overrun_drops_local_copies(tmp_path: Path):
+    first, second = shared_pair(tmp_path / "cache", slots=64, slot_size=256, log_size=4)
+    second.set("kept", 1)
+    for number in range(10):
+        first.set(f"key{number}", number)
+
+    assert len(second.local) == 1
+    second.get("key0")  # Replays the log: more changes than it holds
+    assert second.local.get(second._digest("kept")) is None
+    assert second.get("kept") == 1  # Still shared
+
+
+def test_values_too_large_for_a_slot_stay_local(tmp_path: Path):
+    first, second = shared_pair(tmp_path / "cache", slots=64, slot_size=256)
+
+    first.set("big", "x" * 1000)
+    assert first.get("big") == "x" * 1000
+    assert second.get("big") is None
+
+
+def test_shared_memory_file_must_be_private(tmp_path: Path):
+    """Files others could write (or redirect) are refused: entries unpickle."""
+    shared = tmp_path / "shared"
+    shared.write_bytes(b"")
+    shared.chmod(0o666)
+    with pytest.raises(RuntimeError):
+        SharedMemoryCache(str(shared), slots=64, slot_size=256)
+
+    link = tmp_path / "link"
+    link.symlink_to(tmp_path / "target")
+    with pytest.raises(OSError):
+        SharedMemoryCache(str(link), slots=64, slot_size=256)
+    assert not (tmp_path / "target").exists()
+
+
+def test_other_geometry_replaces_the_file(tmp_path: Path):
+    """Processes still on the old file keep working during a restart."""
+    path = tmp_path / "cache"
+    old = TieredCache("facets", SharedMemoryCache(str(path), slots=64, slot_size=256))
+    old.set("key", "old")
+    old_inode = path.stat().st_ino
+
+    new = TieredCache("facets", SharedMemoryCache(str(path), slots=32, slot_size=512))
+
+    assert path.stat().st_ino != old_inode
+    assert oct(path.stat().st_mode & 0o777) == "0o600"
+    assert new.get("key") is None
+    old.local.clear()
+    assert old.get("key") == "old"  # Its unlinked file is still mapped
+    assert sorted(item.name for item in tmp_path.iterdir()) == ["cache"]
+
+
+def _set_in_child(path: str) -> None:
+    cache = TieredCache("facets", SharedMemoryCache(path, slots=64, slot_size=256))
+    cache.set("from_child", os.getpid())
+
+
+def test_shared_memory_across_processes(tmp_path: Path):
+    path = str(tmp_path / "cache")
+    cache = TieredCache("facets", SharedMemoryCache(path, slots=64, slot_size=256))
+    assert cache.get("from_child") is None
+
+    child = multiprocessing.get_context("fork").Process(
+        target=_set_in_child, args=(path,)
+    )
+    child.start()
+    child.join(10)
+
+    assert child.exitcode == 0
+    assert cache.get("from_child") == child.pid
+
+
+def test_unsupported_cache_url(monkeypatch: pytest.MonkeyPatch):
+    from app.core import cache as cache_module
+
+    monkeypatch.setattr(cache_module.settings, "CACHE_URL", "memcached://localhost")
+    with pytest.raises(ValueError):
+        create_cache("test")
+
+
+@pytest.mark.skipif(redis is None, reason="redis package not installed")
+def test_redis_entries_are_seen_by_other_workers():
+    url = os.getenv("TEST_REDIS_URL", "redis://localhost:6379/15")
+    try:
+        shared = [RedisCache(url, prefix="test_cache:") for _ in range(2)]
+        shared[0]._client.ping()
+    except redis.RedisError:
+        pytest.skip(f"No Redis server at {url}")
+    first, second = (TieredCache("facets", cache, ttl=30) for cache in shared)
+    try:
+        first.set("key", "old")
+        assert second.get("key") == "old"
+
+        first.set("key", "new")
+        deadline = time.monotonic() + 5
+        while second.get("key") != "new" and time.monotonic() < deadline:
+            time.sleep(0.05)  # Delivered by the listener thread
+        assert second.get("key") == "new"
+
+        # Stored as JSON, which any client may write without running code
+        facets = {"total": 2, "facets": {"game": [{"value": 1, "count": 2}]}}
+        first.set("facets", facets)
+        raw = shared[0]._client.get(shared[0].prefix + first._digest("facets"))
+        assert json.loads(raw)[1] == facets
+        second.local.clear()
+        assert second.get("facets") == facets
+    finally:
+        first.delete("facets")
+        first.delete("key")
+        for cache in shared:
+            cache.close()
@@ -0,0 +1,140 @@
+"""Test the category closure table and subtree queries."""
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models import Category, CategoryClosure, Game, Lot, LotStatus, User
+from app.services.category_tree import (
+    add_category_node,
+    move_category_node,
+    rebuild_closure,
+)
+
+
+def _add_category(
+    db_session: Session, game: Game, name: str, parent: Category = None
+) -> Category:
+    category = Category(
+        name=name,
+        slug=name.lower(),
+        game_id=game.id,
+        parent_id=parent.id if parent else None,
+    )
+    db_session.add(category)
+    db_session.flush()
+    add_category_node(db_session, category)
+    db_session.commit()
+    return category
+
+
+def _descendants(db_session: Session, category: Category):
+    return {
+        row.descendant_id: row.depth
+        for row in db_session.query(CategoryClosure).filter(
+            CategoryClosure.ancestor_id == category.id
+        )
+    }
+
+
+def test_closure_rows_follow_moves(db_session: Session, test_game: Game):
+    """Adding and moving categories keeps every ancestor path."""
+    items = _add_category(db_session, test_game, "Items")
+    weapons = _add_category(db_session, test_game, "Weapons", items)
+    swords = _add_category(db_session, test_game, "Swords", weapons)
+    accounts = _add_category(db_session, test_game, "Accounts")
+
+    assert _descendants(db_session, items) == {items.id: 0, weapons.id: 1, swords.id: 2}
+
+    move_category_node(db_session, weapons.id, accounts.id)
+    db_session.commit()
+
+    assert _descendants(db_session, items) == {items.id: 0}
+    assert _descendants(db_session, accounts) == {
+        accounts.id: 0,
+        weapons.id: 1,
+        swords.id: 2,
+    }
+
+    closure_rows = db_session.query(CategoryClosure).count()
+    weapons.parent_id = accounts.id
+    db_session.commit()
+    assert rebuild_closure(db_session) == closure_rows
+
+
+def test_lots_filtered_by_category_subtree(
+    client: TestClient, db_session: Session, test_user: User, test_game: Game
+):
+    """get_lots category filter includes lots of subcategories."""
+    items = _add_category(db_session, test_game, "Items")
+    weapons = _add_category(db_session, test_game, "Weapons", items)
+    other = _add_category(db_session, test_game, "Other")
+
+    for category in (items, weapons, other):
+        db_session.add(
+            Lot(
+                title=f"{category.name} lot",
+                description="Subtree lot",
+                price=5,
+                seller_id=test_user.id,
+                game_id=test_game.id,
+                category_id=category.id,
+                status=LotStatus.ACTIVE,
+                item_details={},
+                images=[],
+            )
+        )
+    db_session.commit()
+
+    response = client.get(f"/api/v1/lots/?category_id={items.id}")
+    assert response.status_code == 200
+    titles = {lot["title"] for lot in response.json()["items"]}
+    assert titles == {"Items lot", "Weapons lot"}
+
+    response = client.get(f"/api/v1/lots/?category_id={weapons.id}")
+    assert response.json()["total"] == 1
+
+
+def test_category_tree_endpoint(
+    client: TestClient, db_session: Session, test_game: Game
+):
+    """Full tree is returned nested in one response."""
+    items = _add_category(db_session, test_game, "Items")
+    weapons = _add_category(db_session, test_game, "Weapons", items)
+    _add_category(db_session, test_game, "Swords", weapons)
+
+    response = client.get(f"/api/v1/games/categories/tree?game_id={test_game.id}")
+    assert response.status_code == 200
+
+    (root,) = response.json()
+    assert root["name"] == "Items"
+    assert root["children"][0]["name"] == "Weapons"
+    assert root["children"][0]["children"][0]["name"] == "Swords"
+
+
+def test_delete_category_endpoint_removes_closure_rows(
+    client: TestClient,
+    db_session: Session,
+    test_admin_user: User,
+    test_game: Game,
+    auth_headers,
+):
+    """Deleting a leaf category through the API drops its closure rows."""
+    items = _add_category(db_session, test_game, "Items")
+    weapons = _add_category(db_session, test_game, "Weapons", items)
+    headers = auth_headers(test_admin_user)
+
+    response = client.delete(f"/api/v1/games/categories/{items.id}", headers=headers)
+    assert response.status_code == 400
+
+    response = client.delete(f"/api/v1/games/categories/{weapons.id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"message": "Category deleted successfully"}
+
+    db_session.expire_all()
+    assert _descendants(db_session, items) == {items.id: 0}
+    assert (
+        db_session.query(CategoryClosure)
+        .filter(CategoryClosure.descendant_id == weapons.id)
+        .count()
+        == 0
+    )
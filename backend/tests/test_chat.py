@@ -0,0 +1,141 @@
+"""Test the realtime chat hub and socket."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.websockets import WebSocketDisconnect, WebSocketState
+
+from app.core.auth import create_access_token
+from app.main import app
+from app.models import Message, User
+from app.services.chat import ChatConnection, ChatHub, MessageWriter, get_chat_hub
+
+
+class FakeSocket:
+    """Collects frames; a blocked socket never finishes sending"""
+
+    def __init__(self, blocked: bool = False):
+        self.frames = []
+        self.closed_with = None
+        self.blocked = blocked
+        self.application_state = WebSocketState.CONNECTED
+
+    async def send_text(self, text: str) -> None:
+        if self.blocked:
+            await asyncio.Event().wait()
+        self.frames.append(text)
+
+    async def close(self, code: int) -> None:
+        self.closed_with = code
+
+
+def _token(user: User) -> str:
+    return create_access_token({"sub": user.username, "user_id": user.id})
+
+
+@pytest.fixture
+def other_user(db_session: Session) -> User:
+    user = User(
+        username="buyer2",
+        email="buyer2@example.com",
+        hashed_password="mock_hash",
+        is_active=True,
+    )
+    db_session.add(user)
+    db_session.commit()
+    return user
+
+
+def test_slow_client_is_dropped():
+    """A full send queue closes the socket instead of growing."""
+
+    async def scenario():
+        socket = FakeSocket(blocked=True)
+        connection = ChatConnection(socket, user_id=1, queue_size=3)
+        connection.start()
+
+        results = [connection.push(f"frame {i}") for i in range(4)]
+        await asyncio.sleep(0)
+        return results, connection, socket
+
+    results, connection, socket = asyncio.run(scenario())
+    assert results == [True, True, True, False]
+    assert connection.dropped
+    assert socket.closed_with == 1013
+
+
+def test_deliver_fans_out_to_every_socket():
+    """Each recipient socket gets the message once; others get nothing."""
+
+    async def scenario():
+        hub = ChatHub(MessageWriter(session_factory=None))
+        sockets = {name: FakeSocket() for name in ("a1", "a2", "b", "c")}
+        for name, socket in sockets.items():
+            user_id = {"a": 1, "b": 2, "c": 3}[name[0]]
+            connection = ChatConnection(socket, user_id, queue_size=10)
+            connection.start()
+            hub._connections.setdefault(user_id, set()).add(connection)
+
+        await hub.deliver(
+            {"deliveries": [{"recipients": [1, 2], "payload": {"type": "message"}}]}
+        )
+        await asyncio.sleep(0.01)
+        await hub.stop()
+        return sockets
+
+    sockets = asyncio.run(scenario())
+    assert [len(sockets[name].frames) for name in ("a1", "a2", "b", "c")] == [
+        1,
+        1,
+        1,
+        0,
+    ]
+
+
+def test_chat_socket_round_trip(
+    client: TestClient, db_session: Session, test_user: User, other_user: User
+):
+    """A message is saved once and pushed to both parties."""
+    hub = ChatHub(
+        MessageWriter(sessionmaker(bind=db_session.get_bind()), interval=0.001)
+    )
+    app.dependency_overrides[get_chat_hub] = lambda: hub
+
+    url = "/api/v1/messages/ws?token="
+    with client.websocket_connect(url + _token(test_user)) as sender:
+        with client.websocket_connect(url + _token(other_user)) as receiver:
+            sender.send_text(
+                json.dumps(
+                    {
+                        "type": "message",
+                        "receiver_id": other_user.id,
+                        "content": "Is the account still available?",
+                        "client_id": "c-1",
+                    }
+                )
+            )
+            ack = sender.receive_json()
+            pushed = receiver.receive_json()
+
+            sender.send_text(json.dumps({"type": "message", "receiver_id": 999999}))
+            invalid = sender.receive_json()
+
+    client.portal.call(hub.stop)
+
+    assert ack["client_id"] == "c-1"
+    assert ack["message"] == pushed["message"]
+    assert pushed["message"]["sender_id"] == test_user.id
+    assert invalid == {"type": "error", "detail": "Message is empty"}
+
+    saved = db_session.get(Message, ack["message"]["id"])
+    assert saved.content == "Is the account still available?"
+    assert saved.receiver_id == other_user.id
+
+
+def test_chat_socket_requires_token(client: TestClient):
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/v1/messages/ws?token=invalid"):
+            pass
@@ -0,0 +1,88 @@
+"""Test response compression."""
+
+import gzip
+import zlib
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.middleware import CompressionMiddleware, negotiate_encoding
+
+PAYLOAD = {"items": [{"seller": {"username": "seller"}, "price": 10}] * 200}
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/large")
+    def large():
+        return JSONResponse(PAYLOAD)
+
+    @app.get("/small")
+    def small():
+        return JSONResponse({"ok": True})
+
+    @app.get("/binary")
+    def binary():
+        return PlainTextResponse(b"\0" * 4096, media_type="image/png")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(
+            (b"line %d\n" % i for i in range(500)), media_type="text/plain"
+        )
+
+    app.add_middleware(CompressionMiddleware, minimum_size=500, gzip_level=5)
+    return TestClient(app)
+
+
+def test_negotiate_encoding():
+    """Quality values decide, unavailable brotli falls back to gzip."""
+    assert negotiate_encoding("gzip, deflate, br", True) == "br"
+    assert negotiate_encoding("gzip, deflate, br", False) == "gzip"
+    assert negotiate_encoding("br;q=0.5, gzip", True) == "gzip"
+    assert negotiate_encoding("gzip;q=0, identity", True) is None
+    assert negotiate_encoding("*", False) == "gzip"
+    assert negotiate_encoding("", True) is None
+
+
+def test_large_json_is_compressed():
+    """Bodies over the threshold are gzipped with a correct length."""
+    response = _client().get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == PAYLOAD
+    assert int(response.headers["content-length"]) < len(response.content) / 10
+
+
+def test_small_binary_and_unaccepted_pass_through():
+    """Small bodies, binary types and identity clients are untouched."""
+    client = _client()
+    for path, encoding in (
+        ("/small", "gzip"),
+        ("/binary", "gzip"),
+        ("/large", "identity"),
+    ):
+        response = client.get(path, headers={"Accept-Encoding": encoding})
+        assert "content-encoding" not in response.headers
+
+
+def test_streaming_response_is_compressed_incrementally():
+    """Streams are compressed chunk by chunk without a content-length."""
+    client = _client()
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as r:
+        assert r.headers["content-encoding"] == "gzip"
+        assert "content-length" not in r.headers
+        raw = b"".join(r.iter_raw())
+
+    assert gzip.decompress(raw).startswith(b"line 0\nline 1\n")
+    assert zlib.decompress(raw, 31).endswith(b"line 499\n")
+
+
+def test_api_responses_are_compressed(client: TestClient):
+    """The application stack compresses large JSON responses."""
+    response = client.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "paths" in response.json()
@@ -0,0 +1,105 @@
+"""Test ETag / Last-Modified conditional catalog responses."""
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models import Game, Lot, TableVersion
+from app.services.table_versions import get_table_versions
+
+
+def test_get_games_revalidation(client: TestClient, db_session: Session, test_game):
+    """Unchanged listings answer 304; a new game changes the ETag."""
+    first = client.get("/api/v1/games/")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert first.headers["cache-control"] == "no-cache"
+
+    cached = client.get("/api/v1/games/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+
+    other_query = client.get("/api/v1/games/?limit=5", headers={"If-None-Match": etag})
+    assert other_query.status_code == 200
+
+    db_session.add(Game(name="Another Game", slug="another-game", is_active=True))
+    db_session.commit()
+
+    changed = client.get("/api/v1/games/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_get_lot_revalidation(client: TestClient, db_session: Session, test_lot: Lot):
+    """Views do not change the lot ETag, edits do."""
+    test_lot.item_details, test_lot.images = {}, []
+    test_lot.category.slug = "test-category"
+    db_session.commit()
+
+    first = client.get(f"/api/v1/lots/{test_lot.id}")
+    assert first.status_code == 200
+    assert first.json()["views"] == 1
+    etag = first.headers["etag"]
+
+    # The view counted above did not invalidate the representation
+    second = client.get(f"/api/v1/lots/{test_lot.id}")
+    assert second.headers["etag"] == etag
+
+    cached = client.get(f"/api/v1/lots/{test_lot.id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    since = client.get(
+        f"/api/v1/lots/{test_lot.id}",
+        headers={"If-Modified-Since": first.headers["last-modified"]},
+    )
+    assert since.status_code == 304
+
+    test_lot.price = 10
+    db_session.commit()
+    changed = client.get(f"/api/v1/lots/{test_lot.id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+
+
+def test_lot_etag_follows_seller_profile(
+    client: TestClient, db_session: Session, test_lot: Lot
+):
+    """Lots embed their seller: public profile edits change the ETag."""
+    test_lot.item_details, test_lot.images = {}, []
+    test_lot.category.slug = "test-category"
+    db_session.commit()
+    etag = client.get(f"/api/v1/lots/{test_lot.id}").headers["etag"]
+
+    test_lot.seller.hashed_password = "rotated"
+    db_session.commit()
+    cached = client.get(f"/api/v1/lots/{test_lot.id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    test_lot.seller.display_name = "Renamed Seller"
+    db_session.commit()
+    changed = client.get(f"/api/v1/lots/{test_lot.id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["seller"]["display_name"] == "Renamed Seller"
+
+
+def test_versions_bump_once_per_transaction(
+    db_session: Session, test_game: Game, test_lot: Lot
+):
+    """Several writes in one transaction bump each table once."""
+    before = get_table_versions(db_session, ["games", "lots"])
+
+    test_lot.title = "Renamed"
+    test_lot.description = "Changed"
+    test_game.description = "Changed"
+    db_session.flush()
+    test_lot.price = 5
+    db_session.commit()
+
+    after = get_table_versions(db_session, ["games", "lots"])
+    assert after["lots"][0] == before["lots"][0] + 1
+    assert after["games"][0] == before["games"][0] + 1
+
+    test_lot.views = (test_lot.views or 0) + 1
+    db_session.commit()
+    assert get_table_versions(db_session, ["lots"])["lots"][0] == after["lots"][0]
+    assert db_session.get(TableVersion, "lots").updated_at is not None
@@ -0,0 +1,105 @@
+"""Test JWT signing keys and the JWKS endpoint."""
+
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from jose import jwt as jose_jwt
+
+from app.core.jwt_keys import (
+    KeyRing,
+    SigningKey,
+    TokenError,
+    _b64decode,
+    _b64encode,
+    generate_private_key_pem,
+)
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {
+        algorithm: SigningKey.from_pem(generate_private_key_pem(algorithm))
+        for algorithm in ("RS256", "EdDSA")
+    }
+
+
+@pytest.mark.parametrize("algorithm", ["HS256", "RS256", "EdDSA"])
+def test_sign_and_verify(keys, algorithm):
+    """Tokens round-trip; asymmetric tokens name their key."""
+    key = keys.get(algorithm) or SigningKey.from_secret("secret")
+    ring = KeyRing(key)
+    token = ring.sign({"sub": "buyer", "exp": int(time.time()) + 60})
+
+    assert ring.verify(token)["sub"] == "buyer"
+    header = jose_jwt.get_unverified_header(token)
+    assert header["alg"] == algorithm
+    assert header.get("kid") == key.kid
+
+    header, _, signature = token.split(".")
+    tampered = _b64encode(b'{"sub":"admin"}')
+    with pytest.raises(TokenError):
+        ring.verify(f"{header}.{tampered}.{signature}")
+
+
+def test_expired_and_malformed_tokens_are_rejected():
+    ring = KeyRing(SigningKey.from_secret("secret"))
+    with pytest.raises(TokenError):
+        ring.verify(ring.sign({"exp": int(time.time()) - 1}))
+    for token in ("", "a.b", "a.b.c", "...."):
+        with pytest.raises(TokenError):
+            ring.verify(token)
+
+
+def test_existing_hs256_tokens_stay_valid():
+    """Tokens python-jose signed before the switch still verify."""
+    token = jose_jwt.encode({"sub": "buyer"}, "secret", algorithm="HS256")
+    assert KeyRing(SigningKey.from_secret("secret")).verify(token) == {"sub": "buyer"}
+
+
+def test_key_rotation(keys):
+    """The previous key still verifies, an unknown kid does not."""
+    old = keys["RS256"]
+    new = keys["EdDSA"]
+    token = KeyRing(old).sign({"sub": "buyer"})
+
+    public_only = SigningKey(algorithm=old.algorithm, kid=old.kid, public=old.public)
+    assert KeyRing(new, [public_only]).verify(token)["sub"] == "buyer"
+    with pytest.raises(TokenError):
+        KeyRing(new).verify(token)
+    with pytest.raises(TokenError):
+        KeyRing(public_only).sign({"sub": "buyer"})
+
+
+def test_algorithm_confusion_is_rejected(keys):
+    """An HS256 token keyed with the public key does not pass as RS256."""
+    key = keys["RS256"]
+    public_pem = key.public.public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    forged = SigningKey(algorithm="HS256", kid=key.kid, secret=public_pem)
+    token = KeyRing(forged).sign({"sub": "admin"})
+    with pytest.raises(TokenError):
+        KeyRing(key).verify(token)
+
+
+def test_jwks_publishes_public_keys_only(keys):
+    ring = KeyRing(keys["EdDSA"], [keys["RS256"]])
+    published = {jwk["kid"]: jwk for jwk in ring.jwks()["keys"]}
+
+    okp = published[keys["EdDSA"].kid]
+    assert okp["kty"] == "OKP" and okp["crv"] == "Ed25519"
+    assert len(_b64decode(okp["x"])) == 32
+    rsa = published[keys["RS256"].kid]
+    assert rsa["kty"] == "RSA" and rsa["alg"] == "RS256"
+    assert all("d" not in jwk for jwk in published.values())
+
+    assert KeyRing(SigningKey.from_secret("secret")).jwks() == {"keys": []}
+
+
+def test_jwks_endpoint(client):
+    response = client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert "keys" in response.json()
+    assert "max-age" in response.headers["cache-control"]
@@ -0,0 +1,93 @@
+"""Test batched lot lookup."""
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.constants import MAX_LOT_BATCH_SIZE
+from app.models import Lot, LotStatus, User
+
+
+def _lots(db_session: Session, test_lot: Lot) -> tuple:
+    """The fixture lot plus a hidden (inactive) lot of the same seller"""
+    test_lot.item_details, test_lot.images = {}, []
+    test_lot.category.slug = "test-category"
+    hidden = Lot(
+        title="Hidden lot",
+        description="Deactivated by the seller",
+        price=5,
+        seller_id=test_lot.seller_id,
+        game_id=test_lot.game_id,
+        category_id=test_lot.category_id,
+        item_details={},
+        images=[],
+        status=LotStatus.INACTIVE,
+    )
+    db_session.add(hidden)
+    db_session.commit()
+    return test_lot, hidden
+
+
+def test_batch_keeps_request_order(
+    client: TestClient, db_session: Session, test_lot: Lot
+):
+    """Items follow the request, duplicates included; hidden lots are missing."""
+    lot, hidden = _lots(db_session, test_lot)
+    ids = [999999, lot.id, hidden.id, lot.id]
+
+    response = client.get("/api/v1/lots/batch", params={"ids": ",".join(map(str, ids))})
+    assert response.status_code == 200
+    items = response.json()["items"]
+
+    assert [item["id"] for item in items] == ids
+    assert [item["found"] for item in items] == [False, True, False, True]
+    assert items[0]["lot"] is None and items[2]["lot"] is None
+    assert items[1]["lot"]["title"] == lot.title
+    assert items[1]["lot"]["category"]["slug"] == "test-category"
+
+    # Batches do not count views
+    db_session.refresh(lot)
+    assert lot.views == 0
+
+
+def test_batch_post_and_revalidation(
+    client: TestClient, db_session: Session, test_lot: Lot
+):
+    """POST takes a JSON list; GET answers 304 while the catalog is unchanged."""
+    lot, _ = _lots(db_session, test_lot)
+
+    posted = client.post("/api/v1/lots/batch", json={"ids": [lot.id]})
+    assert posted.status_code == 200
+    assert posted.json()["items"][0]["found"] is True
+
+    first = client.get(f"/api/v1/lots/batch?ids={lot.id}")
+    cached = client.get(
+        f"/api/v1/lots/batch?ids={lot.id}",
+        headers={"If-None-Match": first.headers["etag"]},
+    )
+    assert cached.status_code == 304
+
+
+def test_batch_shows_hidden_lots_to_moderators(
+    client: TestClient,
+    db_session: Session,
+    test_lot: Lot,
+    test_admin_user: User,
+    auth_headers,
+):
+    """Moderators and admins also see lots hidden from the public."""
+    lot, hidden = _lots(db_session, test_lot)
+    url = f"/api/v1/lots/batch?ids={lot.id},{hidden.id}"
+
+    public = client.get(url)
+    admin = client.get(url, headers=auth_headers(test_admin_user))
+
+    assert [item["found"] for item in public.json()["items"]] == [True, False]
+    assert [item["found"] for item in admin.json()["items"]] == [True, True]
+    assert admin.headers["etag"] != public.headers["etag"]
+
+
+def test_batch_rejects_bad_ids(client: TestClient):
+    assert client.get("/api/v1/lots/batch?ids=1,a").status_code == 400
+    assert client.get("/api/v1/lots/batch?ids=").status_code == 400
+    too_many = list(range(1, MAX_LOT_BATCH_SIZE + 2))
+    assert client.post("/api/v1/lots/batch", json={"ids": too_many}).status_code == 400
@@ -0,0 +1,131 @@
+"""Test denormalized total_lots counters on games and categories."""
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models import Category, Game, Lot, LotStatus, Order, OrderStatus, User
+from app.services.lot_counters import recount_lot_counters
+
+
+def _counters(db_session: Session, game: Game, category: Category):
+    db_session.refresh(game)
+    db_session.refresh(category)
+    return game.total_lots, category.total_lots
+
+
+def _make_lot(db_session: Session, seller: User, category: Category, **kwargs) -> Lot:
+    lot = Lot(
+        title="Counter Lot",
+        description="Lot for counter tests",
+        price=10,
+        seller_id=seller.id,
+        game_id=category.game_id,
+        category_id=category.id,
+        **kwargs,
+    )
+    db_session.add(lot)
+    return lot
+
+
+def test_counters_follow_lot_lifecycle(
+    db_session: Session, test_user: User, test_game: Game, test_category: Category
+):
+    """Create, status changes and delete adjust active lot counters."""
+    lot = _make_lot(db_session, test_user, test_category, status=LotStatus.ACTIVE)
+    _make_lot(db_session, test_user, test_category)  # moderation, not counted
+    db_session.commit()
+    assert _counters(db_session, test_game, test_category) == (1, 1)
+
+    lot.status = LotStatus.INACTIVE
+    db_session.commit()
+    assert _counters(db_session, test_game, test_category) == (0, 0)
+
+    lot.status = LotStatus.ACTIVE
+    db_session.commit()
+    assert _counters(db_session, test_game, test_category) == (1, 1)
+
+    db_session.delete(lot)
+    db_session.commit()
+    assert _counters(db_session, test_game, test_category) == (0, 0)
+
+
+def test_counters_batched_per_transaction(
+    db_session: Session, test_user: User, test_game: Game, test_category: Category
+):
+    """Deltas from several flushes are applied once at commit."""
+    for _ in range(3):
+        _make_lot(db_session, test_user, test_category, status=LotStatus.ACTIVE)
+        db_session.flush()
+    db_session.commit()
+    assert _counters(db_session, test_game, test_category) == (3, 3)
+
+
+def test_recount_repairs_counters(db_session: Session, test_lot: Lot):
+    """Repair recomputes counters from a single grouped query."""
+    game = db_session.get(Game, test_lot.game_id)
+    category = db_session.get(Category, test_lot.category_id)
+    game.total_lots = 17
+    category.total_lots = 0
+    db_session.commit()
+
+    report = recount_lot_counters(db_session)
+
+    assert report["games"]["fixed"] == 1
+    assert report["categories"]["fixed"] == 1
+    assert _counters(db_session, game, category) == (1, 1)
+
+
+def test_counters_follow_lot_endpoints(
+    client: TestClient,
+    db_session: Session,
+    test_user: User,
+    test_lot: Lot,
+    auth_headers,
+):
+    """Deactivate, activate and delete through the API adjust counters."""
+    game = db_session.get(Game, test_lot.game_id)
+    category = db_session.get(Category, test_lot.category_id)
+    headers = auth_headers(test_user)
+    assert _counters(db_session, game, category) == (1, 1)
+
+    response = client.post(f"/api/v1/lots/{test_lot.id}/deactivate", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"message": "Lot deactivated successfully"}
+    assert _counters(db_session, game, category) == (0, 0)
+
+    response = client.post(f"/api/v1/lots/{test_lot.id}/activate", headers=headers)
+    assert response.status_code == 200
+    assert _counters(db_session, game, category) == (1, 1)
+
+    response = client.delete(f"/api/v1/lots/{test_lot.id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"message": "Lot deleted successfully"}
+    assert _counters(db_session, game, category) == (0, 0)
+
+
+def test_delete_lot_with_active_order_keeps_counters(
+    client: TestClient,
+    db_session: Session,
+    test_admin_user: User,
+    test_lot: Lot,
+    auth_headers,
+):
+    """An open order blocks deletion, even by a moderator."""
+    order = Order(
+        buyer_id=test_admin_user.id,
+        seller_id=test_lot.seller_id,
+        lot_id=test_lot.id,
+        price=test_lot.price,
+        status=OrderStatus.PAID,
+    )
+    db_session.add(order)
+    db_session.commit()
+
+    response = client.delete(
+        f"/api/v1/lots/{test_lot.id}", headers=auth_headers(test_admin_user)
+    )
+
+    assert response.status_code == 400
+    game = db_session.get(Game, test_lot.game_id)
+    category = db_session.get(Category, test_lot.category_id)
+    assert _counters(db_session, game, category) == (1, 1)
@@ -0,0 +1,89 @@
+"""Test faceted lot counts."""
+
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.models import Category, Game, Lot, LotStatus, User
+from app.services.lot_facets import compute_facets, facet_cache
+
+
+def _add_lots(db_session: Session, user: User, game: Game, category: Category):
+    for price, auto in [(50, True), (150, True), (150, False), (7000, False)]:
+        db_session.add(
+            Lot(
+                title="Facet lot",
+                description="Lot used by facet tests",
+                price=price,
+                seller_id=user.id,
+                game_id=game.id,
+                category_id=category.id,
+                is_auto_delivery=auto,
+                status=LotStatus.ACTIVE,
+            )
+        )
+    db_session.add(
+        Lot(
+            title="Hidden lot",
+            description="Inactive lots are not counted",
+            price=10,
+            seller_id=user.id,
+            game_id=game.id,
+            category_id=category.id,
+            status=LotStatus.INACTIVE,
+        )
+    )
+    db_session.commit()
+
+
+def test_get_lot_facets(
+    client: TestClient,
+    db_session: Session,
+    test_user: User,
+    test_game: Game,
+    test_category: Category,
+):
+    """Counts every facet for the filtered active lots."""
+    facet_cache.clear()
+    _add_lots(db_session, test_user, test_game, test_category)
+
+    response = client.get(f"/api/v1/lots/facets?game_id={test_game.id}")
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["total"] == 4
+    assert data["facets"]["game"] == [
+        {"value": test_game.id, "count": 4, "min": None, "max": None}
+    ]
+    prices = {bucket["value"]: bucket["count"] for bucket in data["facets"]["price"]}
+    assert prices == {"0-100": 1, "100-500": 2, "5000-10000": 1}
+    auto = {b["value"]: b["count"] for b in data["facets"]["is_auto_delivery"]}
+    assert auto == {True: 2, False: 2}
+
+    response = client.get(
+        f"/api/v1/lots/facets?game_id={test_game.id}&min_price=100&facets=price"
+    )
+    data = response.json()
+    assert data["total"] == 3
+    assert list(data["facets"]) == ["price"]
+
+    assert client.get("/api/v1/lots/facets?facets=color").status_code == 400
+
+
+def test_postgres_facets_use_grouping_sets(db_session: Session):
+    """PostgreSQL counts all facets in one GROUPING SETS statement."""
+    statements = []
+
+    class Recorder:
+        def execute(self, statement):
+            statements.append(statement)
+            return []
+
+    query = db_session.query(Lot).filter(Lot.status == LotStatus.ACTIVE)
+    query.session = Recorder()
+    result = compute_facets(query, ["game", "price"], "postgresql")
+
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+    assert len(statements) == 1
+    assert "GROUPING SETS" in sql
+    assert result == {"total": 0, "facets": {"game": [], "price": []}}
@@ -0,0 +1,113 @@
+"""Test the content-addressed media store."""
+
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Lot, MediaBlob, User
+from app.services import media_store
+from app.services.uploads import save_image_upload
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """Temporary UPLOAD_DIR with inline image rendering."""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "IMAGE_WORKERS", 0)
+    return tmp_path
+
+
+def _upload(color, kind: str = "lot_images"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(buffer, "PNG")
+    buffer.seek(0)
+    return save_image_upload(UploadFile(file=buffer, filename="shot.png"), kind)
+
+
+def _ref_count(db_session: Session, upload) -> int:
+    blob = db_session.get(MediaBlob, (upload.kind, upload.digest))
+    db_session.refresh(blob)
+    return blob.ref_count
+
+
+def test_identical_uploads_are_deduplicated(upload_dir):
+    """The same bytes map to one set of files and one URL."""
+    first = _upload((10, 20, 30))
+    second = _upload((10, 20, 30))
+
+    assert second.digest == first.digest
+    assert second.deduplicated and not first.deduplicated
+    assert second.urls == first.urls
+    assert media_store.parse_blob_url(first.url) == ("lot_images", first.digest)
+    assert media_store.parse_blob_url("/static/avatars/legacy.png") is None
+
+
+def test_reference_counts_follow_lots_and_users(
+    upload_dir, db_session: Session, test_user: User, test_lot: Lot
+):
+    """Assigning, replacing and deleting references adjust ref_count."""
+    shot = _upload((1, 2, 3))
+    other = _upload((4, 5, 6))
+    avatar = _upload((1, 2, 3), "avatars")
+    for upload in (shot, other, avatar):
+        media_store.register_blob(db_session, upload.kind, upload.digest, upload.size)
+
+    test_lot.images = [shot.url, shot.url, "/static/legacy.jpg"]
+    test_user.avatar_url = avatar.url
+    db_session.commit()
+    assert _ref_count(db_session, shot) == 2
+    assert _ref_count(db_session, avatar) == 1
+
+    test_lot.images = [other.url]
+    test_user.avatar_url = None
+    db_session.commit()
+    assert _ref_count(db_session, shot) == 0
+    assert _ref_count(db_session, other) == 1
+    assert _ref_count(db_session, avatar) == 0
+
+    db_session.delete(test_lot)
+    db_session.commit()
+    assert _ref_count(db_session, other) == 0
+
+
+def test_recount_and_collect_garbage(
+    upload_dir, db_session: Session, test_lot: Lot
+):
+    """GC removes stale unreferenced blobs and orphans, keeps the rest."""
+    kept = _upload((7, 7, 7))
+    dropped = _upload((8, 8, 8))
+    for upload in (kept, dropped):
+        media_store.register_blob(db_session, upload.kind, upload.digest, upload.size)
+    test_lot.images = [kept.url]
+    db_session.commit()
+
+    # Drift on the kept blob is repaired before collection
+    db_session.get(MediaBlob, ("lot_images", kept.digest)).ref_count = 0
+    db_session.query(MediaBlob).update(
+        {MediaBlob.uploaded_at: datetime.utcnow() - timedelta(days=2)},
+        synchronize_session=False,
+    )
+    db_session.commit()
+    assert media_store.recount_references(db_session) == {"checked": 2, "fixed": 1}
+
+    orphan = os.path.join(media_store.blob_dir("lot_images", "f" * 64), "f" * 64)
+    os.makedirs(os.path.dirname(orphan), exist_ok=True)
+    open(orphan + "_320.webp", "wb").close()
+    os.utime(orphan + "_320.webp", (0, 0))
+
+    dry = media_store.collect_garbage(db_session, grace_hours=1, dry_run=True)
+    assert dry["blobs"] == 1 and dry["orphan_files"] == 1
+    assert db_session.query(MediaBlob).count() == 2
+
+    report = media_store.collect_garbage(db_session, grace_hours=1)
+    assert report["blobs"] == 1 and report["orphan_files"] == 1
+    assert report["bytes_freed"] > 0
+    assert db_session.get(MediaBlob, ("lot_images", dropped.digest)) is None
+    assert not os.path.exists(media_store.blob_dir("lot_images", dropped.digest))
+    assert len(os.listdir(media_store.blob_dir("lot_images", kept.digest))) == 3
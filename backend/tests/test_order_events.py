@@ -0,0 +1,268 @@
+"""Test order status events and their SSE stream."""
+
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.main import app
+from app.models import Lot, Order, OrderStatus, User
+from app.services import order_events
+from app.services.order_events import (
+    HEARTBEAT_FRAME,
+    RESYNC_FRAME,
+    OrderEventBroadcaster,
+    get_order_events,
+)
+
+
+def _event(order_id: int, buyer_id: int = 1, seller_id: int = 2) -> dict:
+    return {
+        "order_id": order_id,
+        "status": "paid",
+        "previous_status": "pending",
+        "buyer_id": buyer_id,
+        "seller_id": seller_id,
+        "lot_id": 1,
+    }
+
+
+def test_replay_after_last_event_id():
+    """Missed events of the user are replayed; lost ones force a resync."""
+
+    async def scenario():
+        broadcaster = OrderEventBroadcaster(buffer_size=3)
+        await broadcaster.start()
+        await broadcaster.dispatch(
+            {"events": [_event(1), _event(2, buyer_id=3), _event(3)]}
+        )
+        epoch = broadcaster.epoch
+
+        replayed = broadcaster.replay(1, f"{epoch}-1")
+        up_to_date = broadcaster.replay(1, f"{epoch}-3")
+
+        await broadcaster.dispatch({"events": [_event(4), _event(5)]})
+        evicted = broadcaster.replay(1, f"{epoch}-1")
+        other_process = broadcaster.replay(1, "deadbeef-4")
+        return replayed, up_to_date, evicted, other_process
+
+    replayed, up_to_date, evicted, other_process = asyncio.run(scenario())
+    assert len(replayed) == 1 and '"order_id": 3' in replayed[0]
+    assert up_to_date == []
+    assert evicted is None
+    assert other_process is None
+
+
+def test_events_during_replay_are_sent_once():
+    """An event published while the stream starts is not also replayed."""
+
+    async def scenario():
+        broadcaster = OrderEventBroadcaster()
+        await broadcaster.dispatch({"events": [_event(1), _event(2)]})
+        frames = broadcaster.stream(1, f"{broadcaster.epoch}-1")
+        received = [await frames.__anext__()]
+        await broadcaster.dispatch({"events": [_event(3)]})
+        received += [await frames.__anext__(), await frames.__anext__()]
+        stream = next(iter(broadcaster._streams[1]))
+        pending = stream.queue.qsize()
+        await frames.aclose()
+        return received, pending
+
+    received, pending = asyncio.run(scenario())
+    assert received[0] == "retry: 3000\n\n"
+    assert '"order_id": 2' in received[1]
+    assert '"order_id": 3' in received[2]
+    assert pending == 0
+
+
+def test_slow_stream_is_closed():
+    """A stream that falls behind ends instead of buffering without bound."""
+
+    async def scenario():
+        broadcaster = OrderEventBroadcaster(queue_size=2)
+        stream = broadcaster.subscribe(1)
+        await broadcaster.dispatch({"events": [_event(i) for i in range(3)]})
+        return stream
+
+    stream = asyncio.run(scenario())
+    assert stream.closed
+    assert stream.queue.qsize() == 2
+
+
+def test_heartbeat_reaches_idle_streams():
+    async def scenario():
+        broadcaster = OrderEventBroadcaster(heartbeat=0.01)
+        await broadcaster.start()
+        frames = broadcaster.stream(1)
+        first = await frames.__anext__()
+        heartbeat = await asyncio.wait_for(frames.__anext__(), 1)
+        await frames.aclose()
+        await broadcaster.stop()
+        return first, heartbeat, broadcaster.connection_count
+
+    assert asyncio.run(scenario()) == ("retry: 3000\n\n", HEARTBEAT_FRAME, 0)
+
+
+def test_status_change_is_published_after_commit(
+    db_session: Session, test_lot: Lot, monkeypatch
+):
+    buyer = User(
+        username="buyer", email="buyer@example.com", hashed_password="mock_hash"
+    )
+    db_session.add(buyer)
+    db_session.commit()
+
+    async def scenario():
+        broadcaster = OrderEventBroadcaster()
+        monkeypatch.setattr(order_events, "_broadcaster", broadcaster)
+        await broadcaster.start()
+        stream = broadcaster.subscribe(test_lot.seller_id)
+
+        order = Order(
+            buyer_id=buyer.id,
+            seller_id=test_lot.seller_id,
+            lot_id=test_lot.id,
+            price=test_lot.price,
+        )
+        db_session.add(order)
+        db_session.commit()
+
+        order.status = OrderStatus.CANCELLED
+        db_session.commit()
+        order.buyer_message = "Changed my mind"  # Not a status change
+        db_session.commit()
+        await asyncio.sleep(0.01)
+
+        frames = []
+        while not stream.queue.empty():
+            frames.append(stream.queue.get_nowait())
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert len(frames) == 2
+    assert '"status": "pending", "previous_status": null' in frames[0]
+    assert '"status": "cancelled", "previous_status": "pending"' in frames[1]
+
+
+def _read_stream(
+    client: TestClient, broadcaster, url: str, headers: dict, events=()
+) -> str:
+    """Body of an event stream that is stopped once events are pushed"""
+
+    def publish_then_stop():
+        while broadcaster.connection_count == 0:
+            time.sleep(0.01)
+        if events:
+            client.portal.call(broadcaster.dispatch, {"events": list(events)})
+        client.portal.call(broadcaster.stop)
+
+    thread = threading.Thread(target=publish_then_stop)
+    thread.start()
+    response = client.get(url, headers=headers)
+    thread.join()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return response.text
+
+
+def test_event_stream_endpoint(client: TestClient, test_user: User, auth_headers):
+    broadcaster = OrderEventBroadcaster()
+    app.dependency_overrides[get_order_events] = lambda: broadcaster
+    client.portal.call(broadcaster.start)
+    client.portal.call(
+        broadcaster.dispatch, {"events": [_event(1, buyer_id=test_user.id)] * 2}
+    )
+    user_id = test_user.id
+    headers = auth_headers(test_user)
+
+    body = _read_stream(
+        client,
+        broadcaster,
+        "/api/v1/orders/events",
+        {**headers, "Last-Event-ID": f"{broadcaster.epoch}-1"},
+        events=[_event(7, buyer_id=user_id), _event(8, buyer_id=999)],
+    )
+    frames = body.split("\n\n")
+    assert frames[0] == "retry: 3000"
+    assert frames[1].startswith(f"id: {broadcaster.epoch}-2\nevent: order_status")
+    assert frames[2].startswith(f"id: {broadcaster.epoch}-3\n")
+    assert '"order_id": 7' in frames[2]
+    assert frames[3:] == [""]
+
+    # EventSource cannot send headers, so the token may be a query parameter
+    body = _read_stream(
+        client,
+        broadcaster,
+        "/api/v1/orders/events?token="
+        + headers["Authorization"].removeprefix("Bearer "),
+        {"Last-Event-ID": "old-1"},
+    )
+    assert body.endswith(RESYNC_FRAME)
+
+
+def test_event_stream_requires_auth(client: TestClient):
+    assert client.get("/api/v1/orders/events").status_code == 401
+
+
+def test_order_actions_publish_events(
+    client: TestClient,
+    db_session: Session,
+    test_lot: Lot,
+    test_user: User,
+    auth_headers,
+    monkeypatch,
+):
+    """confirm, cancel and dispute change the status and emit an event each."""
+    buyer = User(
+        username="buyer", email="buyer@example.com", hashed_password="mock_hash"
+    )
+    db_session.add(buyer)
+    db_session.commit()
+    orders = [
+        Order(
+            buyer_id=buyer.id,
+            seller_id=test_lot.seller_id,
+            lot_id=test_lot.id,
+            price=test_lot.price,
+            status=order_status,
+        )
+        for order_status in (OrderStatus.PAID, OrderStatus.PENDING)
+    ]
+    db_session.add_all(orders)
+    db_session.commit()
+    paid, pending = (order.id for order in orders)
+
+    broadcaster = OrderEventBroadcaster()
+    monkeypatch.setattr(order_events, "_broadcaster", broadcaster)
+    client.portal.call(broadcaster.start)
+    seller_headers, buyer_headers = auth_headers(test_user), auth_headers(buyer)
+
+    # Only paid orders can be confirmed
+    response = client.post(f"/api/v1/orders/{pending}/confirm", headers=seller_headers)
+    assert response.status_code == 400
+    actions = [
+        (f"/api/v1/orders/{paid}/confirm", seller_headers),
+        (f"/api/v1/orders/{paid}/dispute", buyer_headers),
+        (f"/api/v1/orders/{pending}/cancel", buyer_headers),
+    ]
+    for url, headers in actions:
+        response = client.post(url, headers=headers)
+        assert response.status_code == 200, response.text
+
+    frames = []
+    for _ in range(100):
+        frames = client.portal.call(
+            broadcaster.replay, buyer.id, f"{broadcaster.epoch}-0"
+        )
+        if len(frames) == 3:
+            break
+        time.sleep(0.01)
+    client.portal.call(broadcaster.stop)
+
+    assert [frame.split("\n")[1] for frame in frames] == ["event: order_status"] * 3
+    assert '"status": "in_progress", "previous_status": "paid"' in frames[0]
+    assert '"status": "disputed", "previous_status": "in_progress"' in frames[1]
+    assert '"status": "cancelled", "previous_status": "pending"' in frames[2]
@@ -0,0 +1,151 @@
+"""Tests for the sampling profiler and the admin profiler endpoints."""
+
+import threading
+from typing import Dict, Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.profiling import SamplingProfiler
+from app.main import app
+from app.models import User
+
+SLOW_PATH = "/_test/profiled/{item_id}"
+
+
+@pytest.fixture
+def slow_routes() -> Iterator[Dict[str, threading.Event]]:
+    """A sync and an async endpoint that block until released"""
+    events = {"entered": threading.Event(), "release": threading.Event()}
+
+    def wait_in_worker(item_id: int) -> Dict[str, int]:
+        events["entered"].set()
+        events["release"].wait(5)
+        return {"item_id": item_id}
+
+    async def wait_in_loop(item_id: int) -> Dict[str, int]:
+        events["entered"].set()
+        events["release"].wait(5)  # Blocks the event loop on purpose
+        return {"item_id": item_id}
+
+    routes = list(app.router.routes)
+    app.router.add_api_route(SLOW_PATH, wait_in_worker, methods=["GET"])
+    app.router.add_api_route(SLOW_PATH, wait_in_loop, methods=["POST"])
+    yield events
+    app.router.routes[:] = routes
+
+
+def _sample_during(
+    client: TestClient, method: str, events: Dict[str, threading.Event]
+) -> SamplingProfiler:
+    profiler = SamplingProfiler(interval=0.01)
+    request = threading.Thread(
+        target=client.request, args=(method, SLOW_PATH.format(item_id=7))
+    )
+    request.start()
+    try:
+        assert events["entered"].wait(5)
+        for _ in range(3):
+            profiler.sample()
+    finally:
+        events["release"].set()
+        request.join()
+    return profiler
+
+
+@pytest.mark.parametrize(
+    "method, function", [("GET", "wait_in_worker"), ("POST", "wait_in_loop")]
+)
+def test_samples_are_counted_under_route_template(
+    client: TestClient, slow_routes, method: str, function: str
+):
+    profiler = _sample_during(client, method, slow_routes)
+
+    route = f"{method} {SLOW_PATH}"
+    assert profiler.routes() == [{"route": route, "samples": 3, "seconds": 0.03}]
+    lines = profiler.collapsed(route).splitlines()
+    assert len(lines) == 1
+    stack, count = lines[0].rsplit(" ", 1)
+    assert count == "3"
+    assert f".{function} (tests/test_profiling.py);" in stack
+    assert stack.split(";")[-2:] == [
+        "Event.wait (threading.py)",
+        "Condition.wait (threading.py)",
+    ]
+    assert all(
+        line.startswith(route + ";") for line in profiler.collapsed().splitlines()
+    )
+
+
+def test_idle_threads_are_not_sampled(client: TestClient):
+    client.get("/health")
+    profiler = SamplingProfiler()
+
+    assert profiler.sample() == 0
+    assert profiler.routes() == []
+    assert profiler.collapsed() == ""
+
+
+def test_windows_expire():
+    profiler = SamplingProfiler(window_seconds=60, windows=2)
+    for started in (0, 60, 120):
+        profiler.sample(now=started)
+
+    assert len(profiler._windows) == 2
+    assert [started for started, _ in profiler._windows] == [60, 120]
+
+
+def test_profile_header_requires_admin(
+    client: TestClient, test_user: User, test_admin_user: User, auth_headers
+):
+    assert client.get("/health", headers={"X-Profile": "1"}).status_code == 401
+    response = client.get(
+        "/health", headers=auth_headers(test_user, **{"X-Profile": "1"})
+    )
+    assert response.status_code == 403
+
+    response = client.get("/health", headers=auth_headers(test_admin_user))
+    assert response.json() == {"status": "healthy"}
+
+
+def test_profile_header_returns_collapsed_stacks(
+    client: TestClient, slow_routes, test_admin_user: User, auth_headers
+):
+    slow_routes["release"] = release = threading.Event()
+    threading.Timer(0.05, release.set).start()
+
+    response = client.get(
+        SLOW_PATH.format(item_id=3),
+        headers=auth_headers(test_admin_user, **{"X-Profile": "1"}),
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["x-profile-status"] == "200"
+    assert int(response.headers["x-profile-samples"]) > 0
+    assert float(response.headers["x-profile-duration-ms"]) > 0
+    lines = response.text.splitlines()
+    assert lines
+    assert all(line.startswith(f"GET {SLOW_PATH};") for line in lines)
+    assert any(".wait_in_worker (" in line for line in lines)
+
+
+def test_profiler_endpoints_are_admin_only(
+    client: TestClient, test_user: User, test_admin_user: User, auth_headers
+):
+    for path in ("/api/v1/admin/profiler/routes", "/api/v1/admin/profiler/stacks"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers=auth_headers(test_user)).status_code == 403
+
+    response = client.get(
+        "/api/v1/admin/profiler/routes", headers=auth_headers(test_admin_user)
+    )
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+    response = client.get(
+        "/api/v1/admin/profiler/stacks",
+        params={"route": "GET /api/v1/lots/", "minutes": 5},
+        headers=auth_headers(test_admin_user),
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
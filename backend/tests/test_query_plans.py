@@ -0,0 +1,338 @@
+"""Query plan regression tests for the catalog and order endpoints.
+
+The SQL an endpoint runs is captured while it serves a request and then
+EXPLAINed on data from seed_data.py, so a change that turns an index lookup
+into a scan or adds a sort fails here. Set QUERY_PLAN_DATABASE_URL to a
+PostgreSQL database to check real plans (it is seeded when it has no lots);
+otherwise an in-memory SQLite database and EXPLAIN QUERY PLAN are used,
+which have no row estimates.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional, Tuple
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, func, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import seed_data
+from app.core.database import Base, get_db
+from app.main import app
+from app.models import Game, Lot, LotStatus, Order, User
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAN_DATABASE_URL = os.getenv("QUERY_PLAN_DATABASE_URL")
+
+# Small enough to seed in a second, large enough for the planner to care
+SQLITE_COUNTS = {"users": 400, "games": 30, "lots": 6000, "orders": 3000, "messages": 0}
+POSTGRES_SEED_ARGS = ["--scale", "0.01", "--games", "300", "--messages", "0"]
+
+POSTGRES_OPERATIONS = {
+    "Seq Scan": "scan",
+    "Index Scan": "index",
+    "Index Only Scan": "index",
+    "Bitmap Heap Scan": "index",
+    "Bitmap Index Scan": "index",
+    "Sort": "sort",
+    "Incremental Sort": "sort",
+}
+SQLITE_ACCESS = re.compile(r"^(SCAN|SEARCH) (\w+)(?: AS \w+)?(.*)$")
+
+
+@dataclass
+class PlanNode:
+    """One step of a plan: "scan", "index", "sort" or the database's own name"""
+
+    operation: str
+    table: Optional[str] = None
+    index: Optional[str] = None
+    rows: Optional[float] = None  # Estimate (PostgreSQL only)
+    detail: str = ""
+
+
+def _postgres_nodes(node: dict) -> Iterator[PlanNode]:
+    yield PlanNode(
+        operation=POSTGRES_OPERATIONS.get(node["Node Type"], node["Node Type"]),
+        table=node.get("Relation Name"),
+        index=node.get("Index Name"),
+        rows=node.get("Plan Rows"),
+        detail=node["Node Type"],
+    )
+    for child in node.get("Plans", ()):
+        yield from _postgres_nodes(child)
+
+
+def _sqlite_node(detail: str) -> PlanNode:
+    match = SQLITE_ACCESS.match(detail)
+    if match is None:
+        operation = "sort" if detail.startswith("USE TEMP B-TREE") else detail
+        return PlanNode(operation, detail=detail)
+
+    _, table, access = match.groups()
+    index = re.search(r"INDEX (\w+)", access)
+    # An automatic index is built by scanning the whole table, per query
+    uses_index = "USING" in access and "AUTOMATIC" not in access
+    return PlanNode(
+        operation="index" if uses_index else "scan",
+        table=table,
+        index=index.group(1) if index else None,
+        detail=detail,
+    )
+
+
+def explain(conn: Connection, statement: str, parameters: Any) -> List[PlanNode]:
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return list(_postgres_nodes(plan[0]["Plan"]))
+
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    return [_sqlite_node(row[3]) for row in rows]
+
+
+def explain_request(
+    client: TestClient, engine: Engine, url: str, **kwargs: Any
+) -> List[Tuple[str, List[PlanNode]]]:
+    """Plans of the SELECTs a GET request runs"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200, response.text
+
+    with engine.connect() as conn:
+        return [
+            (statement, explain(conn, statement, parameters))
+            for statement, parameters in statements
+        ]
+
+
+def plan_of(plans: List[Tuple[str, List[PlanNode]]], *fragments: str) -> List[PlanNode]:
+    """Plan of the one captured statement containing all fragments"""
+    matches = [
+        nodes
+        for statement, nodes in plans
+        if all(fragment in statement for fragment in fragments)
+    ]
+    assert len(matches) == 1, f"{len(matches)} statements contain {fragments}"
+    return matches[0]
+
+
+def describe(nodes: List[PlanNode]) -> str:
+    return "\n".join(
+        f"  {node.detail}"
+        + (f" on {node.table}" if node.table else "")
+        + (f" using {node.index}" if node.index else "")
+        + (f" ({node.rows:g} rows)" if node.rows is not None else "")
+        for node in nodes
+    )
+
+
+def assert_uses_index(nodes: List[PlanNode], table: str) -> None:
+    reads = [node for node in nodes if node.table == table]
+    assert reads, f"{table} is not read:\n{describe(nodes)}"
+    assert all(
+        node.operation == "index" for node in reads
+    ), f"{table} is scanned:\n{describe(nodes)}"
+
+
+def assert_no_sort(nodes: List[PlanNode]) -> None:
+    assert not any(
+        node.operation == "sort" for node in nodes
+    ), f"Rows are sorted:\n{describe(nodes)}"
+
+
+def assert_rows_below(nodes: List[PlanNode], limit: float) -> None:
+    """Estimated rows of the result (skipped without estimates)"""
+    if nodes[0].rows is not None:
+        assert nodes[0].rows < limit, f"Over {limit} rows:\n{describe(nodes)}"
+
+
+@pytest.fixture(scope="module")
+def plan_engine() -> Iterator[Engine]:
+    """Database with representative data to EXPLAIN on"""
+    if PLAN_DATABASE_URL:
+        engine = create_engine(PLAN_DATABASE_URL)
+        with engine.connect() as conn:
+            seeded = (
+                inspect(conn).has_table("lots")
+                and conn.execute(select(func.count()).select_from(Lot)).scalar()
+            )
+        if not seeded:
+            subprocess.run(
+                [sys.executable, "seed_data.py", *POSTGRES_SEED_ARGS],
+                cwd=BACKEND_DIR,
+                env={**os.environ, "DATABASE_URL": PLAN_DATABASE_URL},
+                check=True,
+            )
+        yield engine
+        engine.dispose()
+        return
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(seed_data, "engine", engine)
+        patch.setattr(seed_data, "get_password_hash", lambda password: "mock_hash")
+        args = argparse.Namespace(seed=42, password="", chunk_size=10_000)
+        plan = seed_data.create_plan(args, SQLITE_COUNTS)
+        for kind in ("users", "lots", "orders"):
+            seed_data.run_phase(plan, kind, workers=1)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def plan_client(plan_engine: Engine) -> Iterator[TestClient]:
+    session_factory = sessionmaker(bind=plan_engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture(scope="module")
+def typical_game_id(plan_engine: Engine) -> int:
+    """A game of median popularity, not the one holding most lots"""
+    with plan_engine.connect() as conn:
+        game_ids = conn.scalars(
+            select(Game.id)
+            .join(Lot, Lot.game_id == Game.id)
+            .group_by(Game.id)
+            .order_by(func.count(Lot.id).desc(), Game.id)
+        ).all()
+    return game_ids[len(game_ids) // 2]
+
+
+def test_game_lot_page_reads_index_in_order(
+    plan_client: TestClient, plan_engine: Engine, typical_game_id: int
+):
+    plans = explain_request(
+        plan_client, plan_engine, f"/api/v1/lots/?game_id={typical_game_id}&limit=20"
+    )
+
+    page = plan_of(plans, "FROM lots", "LIMIT")
+    assert_uses_index(page, "lots")
+    assert_no_sort(page)
+    assert_rows_below(page, 21)
+    assert_uses_index(plan_of(plans, "count(*)", "FROM lots"), "lots")
+
+
+def test_game_lot_page_by_price_reads_index_in_order(
+    plan_client: TestClient, plan_engine: Engine, typical_game_id: int
+):
+    plans = explain_request(
+        plan_client,
+        plan_engine,
+        f"/api/v1/lots/?game_id={typical_game_id}&sort_by=price&sort_order=asc",
+    )
+
+    page = plan_of(plans, "FROM lots", "LIMIT")
+    assert_uses_index(page, "lots")
+    assert_no_sort(page)
+
+
+def test_newest_lots_page_is_not_sorted(plan_client: TestClient, plan_engine: Engine):
+    plans = explain_request(plan_client, plan_engine, "/api/v1/lots/?limit=20")
+
+    page = plan_of(plans, "FROM lots", "LIMIT")
+    assert_uses_index(page, "lots")
+    assert_no_sort(page)
+    assert_rows_below(page, 21)
+
+
+def test_seller_lot_page_reads_index_in_order(
+    plan_client: TestClient, plan_engine: Engine
+):
+    with plan_engine.connect() as conn:
+        seller_id = conn.scalar(
+            select(Lot.seller_id).where(Lot.status == LotStatus.ACTIVE).limit(1)
+        )
+    plans = explain_request(plan_client, plan_engine, f"/api/v1/lots/user/{seller_id}")
+
+    page = plan_of(plans, "FROM lots", "LIMIT")
+    assert_uses_index(page, "lots")
+    assert_no_sort(page)
+    assert_uses_index(plan_of(plans, "count(*)", "FROM lots"), "lots")
+
+
+def test_lot_detail_reads_one_row(plan_client: TestClient, plan_engine: Engine):
+    with plan_engine.connect() as conn:
+        lot_id = conn.scalar(
+            select(Lot.id).where(Lot.status == LotStatus.ACTIVE).limit(1)
+        )
+    plans = explain_request(plan_client, plan_engine, f"/api/v1/lots/{lot_id}")
+
+    # Revalidation stamp, the lot with its relations and its reload after commit
+    lot_plans = [nodes for statement, nodes in plans if "FROM lots" in statement]
+    assert lot_plans
+    for nodes in lot_plans:
+        assert_uses_index(nodes, "lots")
+        assert_rows_below(nodes, 2)
+
+
+def test_order_list_reads_indexes(
+    plan_client: TestClient, plan_engine: Engine, auth_headers
+):
+    with plan_engine.connect() as conn:
+        buyer = conn.execute(
+            select(User.id, User.username)
+            .join(Order, Order.buyer_id == User.id)
+            .where(User.is_active.is_(True))
+            .limit(1)
+        ).one()
+    plans = explain_request(
+        plan_client,
+        plan_engine,
+        "/api/v1/orders/?limit=20",
+        headers=auth_headers(buyer),
+    )
+
+    # Orders of either party: one index per side, merged
+    page = plan_of(plans, "FROM orders", "LIMIT")
+    assert_uses_index(page, "orders")
+    assert_rows_below(page, 21)
+    assert_uses_index(plan_of(plans, "count(*)", "FROM orders"), "orders")
+
+
+def test_game_list_page_is_small(plan_client: TestClient, plan_engine: Engine):
+    plans = explain_request(plan_client, plan_engine, "/api/v1/games/?limit=50")
+
+    page = plan_of(plans, "FROM games", "LIMIT")
+    assert_rows_below(page, 51)
+    if plan_engine.dialect.name == "sqlite":
+        # No row estimates here: the page must stop early in name order
+        # instead (PostgreSQL may sort a few hundred games just as well)
+        assert_uses_index(page, "games")
+        assert_no_sort(page)
@@ -0,0 +1,128 @@
+"""Test token bucket rate limiting."""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.auth import create_access_token
+from app.core.rate_limit import (
+    MemoryBucketStore,
+    RateLimitMiddleware,
+    create_bucket_store,
+    route_cost,
+)
+
+COSTS = (
+    ("GET", "/lots", "search", 5),
+    ("POST", "/login", None, 3),
+)
+
+
+def _client(limit: int = 10) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/lots")
+    def lots():
+        return {"items": []}
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    app.add_middleware(
+        RateLimitMiddleware,
+        limit_per_minute=limit,
+        store=MemoryBucketStore(shards=4),
+        costs=COSTS,
+        exempt_paths=("/health",),
+    )
+    return TestClient(app)
+
+
+def test_route_cost():
+    """Rules match method, path and a non-empty query parameter."""
+    assert route_cost("GET", "/lots/", b"search=sword&skip=0", COSTS) == 5
+    assert route_cost("GET", "/lots", b"search=", COSTS) == 1
+    assert route_cost("GET", "/lots", b"", COSTS) == 1
+    assert route_cost("POST", "/login", b"", COSTS) == 3
+    assert route_cost("GET", "/login", b"", COSTS) == 1
+
+
+def test_bucket_refills_over_time():
+    """Tokens come back at limit / 60 per second."""
+    store = MemoryBucketStore(shards=2)
+    result = asyncio.run(store.take("ip:1", 10, capacity=10, rate=1000.0))
+    assert result.allowed and result.remaining == 0
+
+    denied = asyncio.run(store.take("ip:1", 10, capacity=10, rate=0.001))
+    assert not denied.allowed
+    assert denied.retry_after > 0
+
+    other = asyncio.run(store.take("ip:2", 1, capacity=10, rate=0.001))
+    assert other.allowed and other.remaining == 9
+
+
+def test_shard_evicts_least_recent_keys():
+    """A shard never holds more than max_keys buckets."""
+    store = MemoryBucketStore(shards=1, max_keys=3)
+    for i in range(5):
+        asyncio.run(store.take(f"ip:{i}", 1, capacity=10, rate=1.0))
+    assert list(store._shards[0]) == ["ip:2", "ip:3", "ip:4"]
+
+
+def test_headers_and_429():
+    """Allowed responses carry RateLimit headers, exhausted buckets get 429."""
+    client = _client(limit=10)
+
+    response = client.get("/lots")
+    assert response.status_code == 200
+    assert response.headers["ratelimit-limit"] == "10"
+    assert response.headers["ratelimit-remaining"] == "9"
+    assert response.headers["ratelimit-policy"] == "10;w=60"
+
+    # Searches cost 5 tokens: 9 left allow one more
+    assert client.get("/lots", params={"search": "a"}).status_code == 200
+    response = client.get("/lots", params={"search": "a"})
+    assert response.status_code == 429
+    assert response.json() == {"error": "Too many requests"}
+    assert int(response.headers["retry-after"]) >= 1
+    assert response.headers["ratelimit-remaining"] == "4"
+
+    # Cheap requests still fit in what is left
+    assert client.get("/lots").status_code == 200
+
+
+def test_exempt_paths_and_separate_clients():
+    """Exempt paths are never charged; IPs and users have their own buckets."""
+    client = _client(limit=1)
+
+    assert client.get("/lots").status_code == 200
+    assert client.get("/lots").status_code == 429
+    for _ in range(3):
+        response = client.get("/health")
+        assert response.status_code == 200
+        assert "ratelimit-limit" not in response.headers
+
+    # Forwarded-for headers from the client itself do not open new buckets
+    for address in ("203.0.113.7", "203.0.113.8, 10.0.0.1"):
+        forwarded = {"X-Forwarded-For": address, "X-Real-IP": address}
+        assert client.get("/lots", headers=forwarded).status_code == 429
+
+    token = create_access_token({"sub": "buyer", "user_id": 42})
+    auth = {"Authorization": f"Bearer {token}"}
+    assert client.get("/lots", headers=auth).status_code == 200
+    assert client.get("/lots", headers=auth).status_code == 429
+
+    # An invalid token is charged to the IP, which is already exhausted
+    invalid = {"Authorization": "Bearer not-a-token"}
+    assert client.get("/lots", headers=invalid).status_code == 429
+
+
+def test_create_bucket_store():
+    """Memory by default, unknown schemes are rejected."""
+    assert isinstance(create_bucket_store(None, shards=2), MemoryBucketStore)
+    assert isinstance(create_bucket_store("memory://"), MemoryBucketStore)
+    with pytest.raises(ValueError):
+        create_bucket_store("memcached://localhost")
@@ -0,0 +1,130 @@
+"""Test refresh token rotation and access token revocation."""
+
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.auth import create_access_token, verify_token
+from app.core.revocation import BloomFilter, RevocationList, revoked_tokens
+from app.models import RefreshToken, RevokedToken
+from app.services import refresh_tokens
+from app.services.refresh_tokens import RefreshTokenReused
+
+
+@pytest.fixture(autouse=True)
+def clear_revocations():
+    revoked_tokens.clear()
+    yield
+    revoked_tokens.clear()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Every added item is found; unseen items rarely are."""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    added = [uuid.uuid4().hex for _ in range(1000)]
+    for item in added:
+        bloom.add(item)
+
+    assert all(item in bloom for item in added)
+    false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+    assert false_positives < 300
+
+
+def test_revocation_list_expires_entries():
+    """Entries count until their expiry and grow the filter past capacity."""
+    revocations = RevocationList(capacity=2)
+    revocations.add("live", time.time() + 60)
+    revocations.add("expiring", time.time() + 0.05)
+    revocations.add("expired", time.time() - 1)
+    for i in range(5):
+        revocations.add(f"extra-{i}", time.time() + 60)
+
+    assert revocations.is_revoked("live")
+    assert revocations.is_revoked("expiring")
+    assert not revocations.is_revoked("expired")
+    assert revocations.is_revoked("extra-4")
+    assert not revocations.is_revoked("unknown")
+
+    time.sleep(0.1)
+    assert not revocations.is_revoked("expiring")
+    assert revocations.purge() == 1
+    assert len(revocations) == 6
+
+
+def test_refresh_rotates_within_family(client, db_session, test_user):
+    """Refreshing returns a new pair and marks the old token used."""
+    tokens = refresh_tokens.issue_tokens(db_session, test_user)
+    db_session.commit()
+
+    response = client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert verify_token(rotated["access_token"]).user_id == test_user.id
+
+    family = db_session.query(RefreshToken).filter_by(user_id=test_user.id).all()
+    assert len(family) == 2
+    assert len({token.family_id for token in family}) == 1
+    assert sum(token.used_at is not None for token in family) == 1
+
+
+def test_reuse_revokes_family(client, db_session, test_user):
+    """Presenting a rotated token again revokes every token of its family."""
+    first = refresh_tokens.issue_tokens(db_session, test_user)
+    db_session.commit()
+    second = refresh_tokens.rotate_refresh_token(db_session, first["refresh_token"])
+    db_session.commit()
+
+    response = client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": first["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+    # The live token of the family and both access tokens are dead too
+    with pytest.raises(RefreshTokenReused):
+        refresh_tokens.rotate_refresh_token(db_session, second["refresh_token"])
+    assert verify_token(first["access_token"]) is None
+    assert verify_token(second["access_token"]) is None
+    assert db_session.query(RevokedToken).count() == 2
+
+
+def test_logout_revokes_tokens(client, db_session, test_user):
+    """Logout denies the access token and ends the refresh token family."""
+    tokens = refresh_tokens.issue_tokens(db_session, test_user)
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    response = client.post(
+        "/api/v1/auth/logout",
+        headers=headers,
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+    assert response.status_code == 200
+
+    assert client.get("/api/v1/auth/me", headers=headers).status_code == 401
+    response = client.post(
+        "/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+
+def test_revocations_sync_from_database(db_session, test_user):
+    """Revocations committed by another worker are loaded by sync."""
+    jti = uuid.uuid4().hex
+    token = create_access_token(
+        {"sub": test_user.username, "user_id": test_user.id, "jti": jti}
+    )
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=1)
+    refresh_tokens.revoke_access_token(db_session, jti, expires_at)
+    db_session.commit()
+    assert verify_token(token) is None
+
+    # A worker that did not commit the revocation itself
+    revoked_tokens.clear()
+    assert verify_token(token) is not None
+    revoked_tokens.sync(db_session)
+    assert verify_token(token) is None
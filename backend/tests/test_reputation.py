@@ -0,0 +1,167 @@
+"""Test incremental seller reputation aggregates."""
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models import User, Lot, Order, OrderStatus, Review
+from app.services.reputation import (
+    record_order_completed,
+    record_review,
+    reconcile_user_stats,
+)
+
+
+def _make_buyer(db_session: Session) -> User:
+    buyer = User(
+        username="buyer",
+        email="buyer@example.com",
+        hashed_password="mock_hash_buyer",
+        is_active=True,
+    )
+    db_session.add(buyer)
+    db_session.commit()
+    return buyer
+
+
+def _complete_order(db_session: Session, lot: Lot, buyer: User) -> Order:
+    order = Order(
+        buyer_id=buyer.id,
+        seller_id=lot.seller_id,
+        lot_id=lot.id,
+        price=lot.price,
+        status=OrderStatus.COMPLETED,
+    )
+    db_session.add(order)
+    db_session.flush()
+    record_order_completed(db_session, order)
+    db_session.commit()
+    return order
+
+
+def test_review_updates_running_average(db_session: Session, test_lot: Lot):
+    """Each review updates sum, count and average in one statement."""
+    buyer = _make_buyer(db_session)
+
+    for rating in (5, 4, 4):
+        order = _complete_order(db_session, test_lot, buyer)
+        review = Review(
+            rating=rating,
+            reviewer_id=buyer.id,
+            reviewed_id=test_lot.seller_id,
+            order_id=order.id,
+        )
+        db_session.add(review)
+        db_session.flush()
+        record_review(db_session, review)
+        db_session.commit()
+
+    seller = db_session.get(User, test_lot.seller_id)
+    db_session.refresh(seller)
+    db_session.refresh(buyer)
+
+    assert seller.rating_sum == 13
+    assert seller.total_reviews == 3
+    assert float(seller.rating) == 4.33
+    assert seller.total_sales == 3
+    assert buyer.total_purchases == 3
+
+
+def test_reconcile_repairs_drift(db_session: Session, test_lot: Lot):
+    """Reconciliation recomputes counters and reports drifted users."""
+    buyer = _make_buyer(db_session)
+    _complete_order(db_session, test_lot, buyer)
+
+    seller = db_session.get(User, test_lot.seller_id)
+    seller.total_sales = 42
+    seller.rating = 3.5
+    db_session.commit()
+
+    report = reconcile_user_stats(db_session, batch_size=1)
+
+    assert report["checked"] >= 2
+    assert report["drifted"] == 1
+    assert report["fixed"] == 1
+    assert report["samples"][0]["user_id"] == seller.id
+
+    db_session.refresh(seller)
+    assert seller.total_sales == 1
+    assert float(seller.rating) == 0.0
+
+    assert reconcile_user_stats(db_session)["drifted"] == 0
+
+
+def test_order_completed_and_reviewed_through_the_api(
+    client: TestClient,
+    db_session: Session,
+    test_lot: Lot,
+    test_user: User,
+    auth_headers,
+):
+    """Status updates walk the real statuses and feed the counters."""
+    buyer = _make_buyer(db_session)
+    # Fill what the fixture leaves out and OrderResponse requires
+    test_lot.item_details, test_lot.images = {}, []
+    test_lot.category.slug = "accounts"
+    db_session.commit()
+    response = client.post(
+        "/api/v1/orders/", json={"lot_id": test_lot.id}, headers=auth_headers(buyer)
+    )
+    assert response.status_code == 201
+    order_id = response.json()["id"]
+
+    for user, new_status in (
+        (buyer, "paid"),
+        (test_user, "in_progress"),
+        (buyer, "completed"),
+    ):
+        response = client.put(
+            f"/api/v1/orders/{order_id}",
+            json={"status": new_status},
+            headers=auth_headers(user),
+        )
+        assert response.status_code == 200, response.text
+        assert response.json()["status"] == new_status
+
+    response = client.put(
+        f"/api/v1/orders/{order_id}",
+        json={"status": "cancelled"},
+        headers=auth_headers(buyer),
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        f"/api/v1/orders/{order_id}/review",
+        json={"rating": 4, "comment": "Fast delivery"},
+        headers=auth_headers(buyer),
+    )
+    assert response.status_code == 201, response.text
+
+    seller = db_session.get(User, test_user.id)
+    db_session.refresh(seller)
+    db_session.refresh(buyer)
+    assert seller.total_sales == 1
+    assert seller.total_reviews == 1
+    assert float(seller.rating) == 4.0
+    assert buyer.total_purchases == 1
+
+
+def test_only_the_seller_starts_delivery(
+    client: TestClient, db_session: Session, test_lot: Lot, auth_headers
+):
+    buyer = _make_buyer(db_session)
+    order = Order(
+        buyer_id=buyer.id,
+        seller_id=test_lot.seller_id,
+        lot_id=test_lot.id,
+        price=test_lot.price,
+        status=OrderStatus.PAID,
+    )
+    db_session.add(order)
+    db_session.commit()
+
+    response = client.put(
+        f"/api/v1/orders/{order.id}",
+        json={"status": "in_progress"},
+        headers=auth_headers(buyer),
+    )
+    assert response.status_code == 400
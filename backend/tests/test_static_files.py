@@ -0,0 +1,145 @@
+"""Test static file serving."""
+
+import gzip
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.static_files import _HASHED_NAME, StaticAssets, precompress_directory
+
+DIGEST = "3fa9" * 16
+BODY = b"body { color: red; }\n" * 100
+
+
+@pytest.fixture
+def assets(tmp_path) -> TestClient:
+    """Client for a StaticAssets app over a temporary directory."""
+    (tmp_path / "site.css").write_bytes(BODY)
+    (tmp_path / f"{DIGEST}_640.webp").write_bytes(b"RIFF....WEBP")
+    precompress_directory(str(tmp_path))
+    return TestClient(StaticAssets(str(tmp_path), max_age=60))
+
+
+def test_serves_precompressed_variant(assets: TestClient):
+    """gzip clients get the .gz sibling, others the file itself."""
+    response = assets.get("/site.css", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == BODY  # Decoded by the client
+
+    identity = assets.get("/site.css", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] != response.headers["etag"]
+    assert identity.headers["cache-control"] == "public, max-age=60"
+
+
+def test_hashed_names_are_immutable(assets: TestClient):
+    """Content-addressed files are cacheable forever."""
+    response = assets.get(f"/{DIGEST}_640.webp")
+    assert response.headers["cache-control"].endswith("immutable")
+    assert response.headers["content-type"] == "image/webp"
+
+
+def test_hash_pattern_matches_media_store_names_only():
+    for name in (f"{DIGEST}_640.webp", f"{DIGEST}_64.webp"):
+        assert _HASHED_NAME.search(name)
+    for name in ("decade01-banner.png", f"{DIGEST}.png", f"x{DIGEST}_640.webp"):
+        assert not _HASHED_NAME.search(name)
+
+
+def test_stale_precompressed_variant_is_skipped(tmp_path):
+    """A sibling older than its file is not served."""
+    css = tmp_path / "site.css"
+    css.write_bytes(BODY)
+    precompress_directory(str(tmp_path))
+    updated = b"body { color: blue; }\n" * 100
+    css.write_bytes(updated)
+    sibling_mtime = os.path.getmtime(str(css) + ".gz")
+    os.utime(css, (sibling_mtime + 10, sibling_mtime + 10))
+
+    client = TestClient(StaticAssets(str(tmp_path)))
+    response = client.get("/site.css", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.content == updated
+
+
+def test_conditional_requests(assets: TestClient):
+    """Matching ETag or Last-Modified answers 304 without a body."""
+    first = assets.get("/site.css", headers={"Accept-Encoding": "identity"})
+
+    cached = assets.get(
+        "/site.css",
+        headers={"Accept-Encoding": "identity", "If-None-Match": first.headers["etag"]},
+    )
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    cached = assets.get(
+        "/site.css",
+        headers={
+            "Accept-Encoding": "identity",
+            "If-Modified-Since": first.headers["last-modified"],
+        },
+    )
+    assert cached.status_code == 304
+
+
+def test_range_requests(assets: TestClient):
+    """Single ranges are served as 206, unsatisfiable ones as 416."""
+    response = assets.get("/site.css", headers={"Range": "bytes=5-9"})
+    assert response.status_code == 206
+    assert response.content == BODY[5:10]
+    assert response.headers["content-range"] == f"bytes 5-9/{len(BODY)}"
+    assert "content-encoding" not in response.headers
+
+    suffix = assets.get("/site.css", headers={"Range": "bytes=-4"})
+    assert suffix.content == BODY[-4:]
+
+    stale = assets.get("/site.css", headers={"Range": "bytes=0-1", "If-Range": '"x"'})
+    assert stale.status_code == 200
+
+    invalid = assets.get("/site.css", headers={"Range": f"bytes={len(BODY)}-"})
+    assert invalid.status_code == 416
+    assert invalid.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+def test_missing_and_outside_paths(assets: TestClient):
+    """Unknown files, directories and traversal are 404; writes are 405."""
+    assert assets.get("/missing.css").status_code == 404
+    assert assets.get("/../secret").status_code == 404
+    assert assets.get("/%2e%2e/secret").status_code == 404
+    assert assets.post("/site.css").status_code == 405
+
+
+def test_precompress_skips_up_to_date_files(tmp_path):
+    """Existing siblings newer than the source are not rewritten."""
+    (tmp_path / "data.json").write_bytes(b'{"key": "value"}' * 200)
+    (tmp_path / "photo.jpg").write_bytes(b"\xff" * 4096)
+
+    first = precompress_directory(str(tmp_path))
+    assert first["files"] == 1 and first["written"] >= 1
+    assert gzip.decompress((tmp_path / "data.json.gz").read_bytes()).startswith(b"{")
+    assert not (tmp_path / "photo.jpg.gz").exists()
+
+    assert precompress_directory(str(tmp_path))["written"] == 0
+
+
+def test_static_requests_bypass_middleware(client: TestClient):
+    """/static is answered before the security-header middleware runs."""
+    path = os.path.join(settings.UPLOAD_DIR, "bypass-test.txt")
+    with open(path, "wb") as file:
+        file.write(b"static")
+    try:
+        response = client.get("/static/bypass-test.txt")
+    finally:
+        os.unlink(path)
+
+    assert response.status_code == 200
+    assert response.content == b"static"
+    assert "x-frame-options" not in response.headers
+    assert "x-request-id" not in response.headers
+    assert client.get("/health").headers["x-frame-options"] == "DENY"
@@ -0,0 +1,176 @@
+"""Tests for request tracing spans and W3C trace context propagation."""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.tracing import (
+    SERVER,
+    SpanExporter,
+    Tracer,
+    install_tracing,
+    parse_traceparent,
+    start_span,
+)
+from app.main import app
+from app.models import User
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def tracer(tmp_path: Path) -> Iterator[Tracer]:
+    """The app traced into a file, without sampling new traces"""
+    middleware = list(app.user_middleware)
+    app.middleware_stack = None
+    tracer = Tracer(SpanExporter(path=str(tmp_path / "traces.jsonl")), sample_rate=0)
+    install_tracing(app, tracer)
+    yield tracer
+    tracer.exporter.shutdown()
+    app.user_middleware[:] = middleware
+    app.middleware_stack = None
+
+
+def exported_spans(tracer: Tracer) -> List[Dict[str, Any]]:
+    tracer.exporter.flush()
+    path = Path(tracer.exporter.path)
+    if not path.exists():
+        return []
+    return [
+        span
+        for line in path.read_text().splitlines()
+        for resource in json.loads(line)["resourceSpans"]
+        for scope in resource["scopeSpans"]
+        for span in scope["spans"]
+    ]
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (
+        TRACE_ID,
+        PARENT_ID,
+        True,
+    )
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00")[2] is False
+    # Later versions may carry more fields
+    assert parse_traceparent(f"01-{TRACE_ID}-{PARENT_ID}-01-extra") is not None
+
+    for invalid in (
+        f"00-{TRACE_ID}-{PARENT_ID}-01-extra",
+        f"ff-{TRACE_ID}-{PARENT_ID}-01",
+        f"00-{'0' * 32}-{PARENT_ID}-01",
+        f"00-{TRACE_ID}-{'0' * 16}-01",
+        f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+        "garbage",
+    ):
+        assert parse_traceparent(invalid) is None
+
+
+def test_no_spans_outside_sampled_requests():
+    with start_span("outside") as span:
+        assert span is None
+
+
+def test_sampled_request_is_traced_through_all_phases(
+    tracer: Tracer, client: TestClient, test_user: User, auth_headers
+):
+    response = client.get(
+        "/api/v1/orders/",
+        headers=auth_headers(test_user, traceparent=f"00-{TRACE_ID}-{PARENT_ID}-01"),
+    )
+    assert response.status_code == 200
+
+    spans = exported_spans(tracer)
+    assert {span["traceId"] for span in spans} == {TRACE_ID}
+    (root,) = [span for span in spans if span["kind"] == SERVER]
+    assert root["name"] == "GET /api/v1/orders/"
+    assert root["parentSpanId"] == PARENT_ID
+    attributes = {item["key"]: item["value"] for item in root["attributes"]}
+    assert attributes["http.route"] == {"stringValue": "/api/v1/orders/"}
+    assert attributes["http.response.status_code"] == {"intValue": "200"}
+    assert response.headers["traceresponse"] == f"00-{TRACE_ID}-{root['spanId']}-01"
+
+    names = {span["name"] for span in spans}
+    assert {
+        "middleware RequestLoggingMiddleware",
+        "middleware ErrorHandlingMiddleware",
+        "middleware ProfilingMiddleware",
+        "jwt.decode",
+        "auth.user_lookup",
+        "SQL SELECT",
+        "response.validate",
+        "response.render",
+    } <= names
+
+    # One tree under the server span, children within their parents
+    by_id = {span["spanId"]: span for span in spans}
+    for span in spans:
+        if span is root:
+            continue
+        parent = by_id[span["parentSpanId"]]
+        assert int(parent["startTimeUnixNano"]) <= int(span["startTimeUnixNano"])
+        assert int(span["endTimeUnixNano"]) <= int(parent["endTimeUnixNano"])
+    lookup = next(span for span in spans if span["name"] == "auth.user_lookup")
+    assert any(span.get("parentSpanId") == lookup["spanId"] for span in spans)
+
+
+def test_unsampled_requests_export_nothing(tracer: Tracer, client: TestClient):
+    client.get("/health")
+    response = client.get(
+        "/health", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"}
+    )
+
+    assert exported_spans(tracer) == []
+    # The trace id is still reported back, marked as not sampled
+    trace = parse_traceparent(response.headers["traceresponse"])
+    assert trace[0] == TRACE_ID and trace[2] is False
+
+
+def test_new_traces_are_sampled_at_the_configured_rate(
+    tracer: Tracer, client: TestClient
+):
+    tracer.sample_rate = 1.0
+    client.get("/health")
+    client.get("/api/v1/no-such-route")
+
+    roots = [span for span in exported_spans(tracer) if span["kind"] == SERVER]
+    assert [root["name"] for root in roots] == ["GET /health", "GET"]
+    assert all("parentSpanId" not in root for root in roots)
+    assert roots[0]["traceId"] != roots[1]["traceId"]
+
+
+def test_caller_sampling_is_rate_limited(tmp_path: Path):
+    """Clients cannot force tracing of every request with the header."""
+    tracer = Tracer(
+        SpanExporter(path=str(tmp_path / "traces.jsonl")),
+        sample_rate=0,
+        max_forced_per_second=3,
+    )
+    spans = [
+        tracer.start_request("GET", f"00-{TRACE_ID}-{PARENT_ID}-01") for _ in range(10)
+    ]
+
+    assert sum(span.sampled for span in spans) == 3
+    assert {span.trace_id for span in spans} == {TRACE_ID}
+
+
+def test_export_file_is_rotated(tmp_path: Path):
+    path = tmp_path / "traces.jsonl"
+    exporter = SpanExporter(path=str(path), max_bytes=1, backups=2)
+    tracer = Tracer(exporter)
+    for number in range(4):
+        span = tracer.start_request("GET", None)
+        span.name = f"GET /{number}"
+        exporter.write([span])
+
+    assert sorted(item.name for item in tmp_path.iterdir()) == [
+        "traces.jsonl",
+        "traces.jsonl.1",
+        "traces.jsonl.2",
+    ]
+    assert '"GET /3"' in path.read_text()
+    assert '"GET /2"' in (tmp_path / "traces.jsonl.1").read_text()
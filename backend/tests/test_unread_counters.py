@@ -0,0 +1,133 @@
+"""Test maintained unread message counters and the inbox."""
+
+from typing import List
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import Message, User
+from app.services.chat import ChatConnection, MessageWriter, PendingMessage
+from app.services.unread_counters import recount_unread_counters
+
+
+@pytest.fixture
+def sellers(db_session: Session) -> List[User]:
+    users = [
+        User(
+            username=f"seller{i}",
+            email=f"seller{i}@example.com",
+            hashed_password="mock_hash",
+            is_active=True,
+        )
+        for i in range(2)
+    ]
+    db_session.add_all(users)
+    db_session.commit()
+    return users
+
+
+def _send(db: Session, sender: User, receiver: User, content: str) -> Message:
+    message = Message(sender_id=sender.id, receiver_id=receiver.id, content=content)
+    db.add(message)
+    db.commit()
+    return message
+
+
+def test_counter_follows_orm_and_batch_writes(
+    db_session: Session, test_user: User, sellers: List[User]
+):
+    _send(db_session, sellers[0], test_user, "Hello")
+    first = _send(db_session, sellers[1], test_user, "Still interested?")
+    db_session.refresh(test_user)
+    assert test_user.unread_messages == 2
+
+    first.is_read = True
+    db_session.commit()
+    db_session.refresh(test_user)
+    assert test_user.unread_messages == 1
+
+    # The chat writer inserts with one Core statement, outside the ORM
+    writer = MessageWriter(sessionmaker(bind=db_session.get_bind()))
+    sender = ChatConnection(None, user_id=sellers[0].id, queue_size=1)
+    saved, rejected = writer.save(
+        [PendingMessage(sender, test_user.id, f"Offer {i}") for i in range(3)]
+    )
+    assert len(saved) == 3 and not rejected
+
+    db_session.expire_all()
+    assert db_session.get(User, test_user.id).unread_messages == 4
+
+
+def test_mark_read_updates_counter(
+    client: TestClient,
+    db_session: Session,
+    test_user: User,
+    sellers: List[User],
+    auth_headers,
+):
+    messages = [_send(db_session, sellers[0], test_user, f"m{i}") for i in range(3)]
+    _send(db_session, sellers[1], test_user, "other conversation")
+    headers = auth_headers(test_user)
+
+    assert client.get("/api/v1/messages/unread-count", headers=headers).json() == {
+        "unread": 4
+    }
+
+    response = client.post(
+        "/api/v1/messages/read",
+        json={"sender_id": sellers[0].id, "up_to_id": messages[1].id},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json() == {"marked_read": 2, "unread": 2}
+
+    response = client.post("/api/v1/messages/read", json={}, headers=headers)
+    assert response.json() == {"marked_read": 2, "unread": 0}
+    assert (
+        db_session.query(Message)
+        .filter(Message.receiver_id == test_user.id, Message.is_read.is_(False))
+        .count()
+        == 0
+    )
+
+
+def test_inbox_returns_latest_message_per_conversation(
+    client: TestClient,
+    db_session: Session,
+    test_user: User,
+    sellers: List[User],
+    auth_headers,
+):
+    _send(db_session, sellers[0], test_user, "first")
+    _send(db_session, test_user, sellers[1], "hi there")
+    _send(db_session, sellers[0], test_user, "second")
+    _send(db_session, sellers[1], test_user, "reply")
+    _send(db_session, test_user, sellers[0], "latest")
+
+    response = client.get("/api/v1/messages/inbox", headers=auth_headers(test_user))
+    assert response.status_code == 200
+    inbox = response.json()
+
+    assert [entry["user"]["id"] for entry in inbox] == [sellers[0].id, sellers[1].id]
+    assert [entry["last_message"]["content"] for entry in inbox] == [
+        "latest",
+        "reply",
+    ]
+    assert [entry["unread"] for entry in inbox] == [2, 1]
+
+
+def test_recount_repairs_drift(
+    db_session: Session, test_user: User, sellers: List[User]
+):
+    _send(db_session, sellers[0], test_user, "Hello")
+    test_user.unread_messages = 7
+    sellers[0].unread_messages = 3
+    db_session.commit()
+
+    report = recount_unread_counters(db_session)
+
+    assert report["fixed"] == 2
+    db_session.refresh(test_user)
+    db_session.refresh(sellers[0])
+    assert (test_user.unread_messages, sellers[0].unread_messages) == (1, 0)
@@ -0,0 +1,109 @@
+"""Test streaming image uploads and thumbnail rendering."""
+
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+
+from app.core.config import settings
+from app.core.validators import ValidationError
+from app.services import uploads
+from app.services.images import ImageProcessingError, render_thumbnails
+from app.models import User
+from app.services.media_store import blob_dir
+
+
+def _png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 40, 40)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """Point UPLOAD_DIR at a temporary directory."""
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_render_thumbnails(tmp_path):
+    """Every size is written as WebP bounded by its longest edge."""
+    source = tmp_path / "source.png"
+    source.write_bytes(_png(1000, 500))
+
+    names = render_thumbnails(str(source), str(tmp_path), "x", (64, 256), 10**7)
+
+    assert names == {64: "x_64.webp", 256: "x_256.webp"}
+    with Image.open(tmp_path / "x_256.webp") as image:
+        assert image.format == "WEBP"
+        assert image.size == (256, 128)
+
+
+def test_render_rejects_non_images(tmp_path):
+    """Undecodable files raise ImageProcessingError."""
+    source = tmp_path / "fake.png"
+    source.write_bytes(b"not an image")
+
+    with pytest.raises(ImageProcessingError):
+        render_thumbnails(str(source), str(tmp_path), "x", (64,), 10**7)
+
+
+def test_stream_to_file_enforces_size():
+    """The limit is checked while reading, not from the declared size."""
+    target = io.BytesIO()
+    assert uploads.stream_to_file(io.BytesIO(b"a" * 100), target, 100) == 100
+
+    with pytest.raises(ValidationError):
+        uploads.stream_to_file(io.BytesIO(b"a" * 101), io.BytesIO(), 100)
+
+
+def test_save_image_upload_in_process_pool(upload_dir):
+    """Uploads are rendered by the worker pool and the temp file removed."""
+    file = UploadFile(file=io.BytesIO(_png(400, 400)), filename="avatar.png")
+    try:
+        upload = uploads.save_image_upload(file, "avatars")
+    finally:
+        uploads.shutdown_image_executor()
+
+    assert sorted(upload.urls) == [64, 128, 256]
+    assert upload.url == (
+        f"/static/avatars/{upload.digest[:2]}/{upload.digest[2:4]}/"
+        f"{upload.digest}_256.webp"
+    )
+    assert len(os.listdir(blob_dir("avatars", upload.digest))) == 3
+    assert os.listdir(upload_dir / "tmp") == []
+
+
+def test_save_image_upload_rejects_bad_files(upload_dir, monkeypatch):
+    """Wrong extensions and corrupt images are validation errors."""
+    monkeypatch.setattr(settings, "IMAGE_WORKERS", 0)
+
+    with pytest.raises(ValidationError):
+        uploads.save_image_upload(
+            UploadFile(file=io.BytesIO(b"data"), filename="script.exe"), "avatars"
+        )
+    with pytest.raises(ValidationError):
+        uploads.save_image_upload(
+            UploadFile(file=io.BytesIO(b"data"), filename="broken.png"), "lot_images"
+        )
+    assert os.listdir(upload_dir / "tmp") == []
+
+
+def test_upload_avatar_endpoint(
+    upload_dir, monkeypatch, client, db_session, test_user: User, auth_headers
+):
+    """The avatar is stored, linked to the user and acknowledged."""
+    monkeypatch.setattr(settings, "IMAGE_WORKERS", 0)
+
+    response = client.post(
+        "/api/v1/users/upload-avatar",
+        files={"file": ("avatar.png", _png(300, 300), "image/png")},
+        headers=auth_headers(test_user),
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json() == {"message": "Avatar uploaded successfully"}
+    db_session.refresh(test_user)
+    assert test_user.avatar_url.endswith("_256.webp")
@@ -1,5 +1,5 @@
 import { apiClient } from './api';
-import { Lot } from '../types';
+import { Lot, LotBatchResponse } from '../types';
 
 export const lotsService = {
   async getLots(params?: {
@@ -19,6 +19,18 @@ export const lotsService = {
     return response.data;
   },
 
+  // One request for a cart or watchlist; null where a lot is gone or hidden
+  async getLotsByIds(ids: number[]): Promise<(Lot | null)[]> {
+    if (ids.length === 0) {
+      return [];
+    }
+    const response: { data: LotBatchResponse } =
+      ids.length <= 50
+        ? await apiClient.get('/lots/batch', { params: { ids: ids.join(',') } })
+        : await apiClient.post('/lots/batch', { ids });
+    return response.data.items.map((item) => item.lot);
+  },
+
   async createLot(lotData: {
     title: string;
     description: string;
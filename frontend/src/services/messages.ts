@@ -0,0 +1,34 @@
+import { apiClient } from './api';
+import { InboxEntry, Message } from '../types';
+
+export const messagesService = {
+  // Maintained counter: cheap enough for the header on every page load
+  async getUnreadCount(): Promise<number> {
+    const response = await apiClient.get('/messages/unread-count');
+    return response.data.unread;
+  },
+
+  async getInbox(params?: { skip?: number; limit?: number }): Promise<InboxEntry[]> {
+    const response = await apiClient.get('/messages/inbox', { params });
+    return response.data;
+  },
+
+  async getConversation(
+    userId: number,
+    params?: { before_id?: number; limit?: number }
+  ): Promise<Message[]> {
+    const response = await apiClient.get(`/messages/conversation/${userId}`, {
+      params,
+    });
+    return response.data;
+  },
+
+  // Pass the newest rendered message id so later arrivals stay unread
+  async markRead(params: {
+    sender_id?: number;
+    up_to_id?: number;
+  }): Promise<{ marked_read: number; unread: number }> {
+    const response = await apiClient.post('/messages/read', params);
+    return response.data;
+  },
+};
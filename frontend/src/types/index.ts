@@ -135,6 +135,22 @@ export interface PaginatedResponse<T> {
   limit: number;
 }
 
+export interface LotBatchItem {
+  id: number;
+  found: boolean;
+  lot: Lot | null;
+}
+
+export interface LotBatchResponse {
+  items: LotBatchItem[];
+}
+
+export interface InboxEntry {
+  user: User;
+  last_message: Message;
+  unread: number;
+}
+
 // Auth types
 export interface LoginRequest {
   email: string;